@@ -1,4 +1,4 @@
-from flask import Flask, render_template, redirect, url_for
+from flask import Flask, redirect, url_for
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, current_user
 from werkzeug.security import generate_password_hash
@@ -11,7 +11,7 @@ login_manager = LoginManager()
 login_manager.login_view = "auth.login"
 
 
-def create_app():
+def create_app(config: dict | None = None):
     app = Flask(__name__)
 
     # Basic config
@@ -23,12 +23,50 @@ def create_app():
         or f"sqlite:///{os.path.join(db_path, 'lavanderia.db')}"
     )
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    # Explicit overrides (tools that run the app against a scratch database)
+    if config:
+        app.config.update(config)
+
+    # SQLite storage profile (WAL, pragmas, pool); engine options must be set before init
+    from . import storage
+    storage.configure(app)
 
     # Init extensions
     db.init_app(app)
     login_manager.init_app(app)
-
-    from .models import User
+    storage.init_app(app)
+
+    # Cold archive file attached to every connection; online backups of both files;
+    # read-only copy the reports run on
+    from . import archive, backup, reporting
+    archive.init_app(app)
+    backup.init_app(app)
+    reporting.init_app(app)
+
+    # Recurring maintenance jobs (started by `serve`)
+    from . import scheduler
+    scheduler.init_app(app)
+
+    from . import instrumentation, changes, metrics, assets, responses, fragments, timeutil
+    instrumentation.init_app(app)
+    changes.init_app(app)
+    metrics.init_app(app)
+    assets.init_app(app)
+    responses.init_app(app)
+    fragments.init_app(app)
+    # Report cache; also registers the rollup builder of the reporting copy
+    from . import analytics
+    analytics.init_app(app)
+    # Audit journal of order/client/service/user changes (batched background writes)
+    from . import audit
+    audit.init_app(app)
+    # Live screens (production board, dashboard): updates from the change feed
+    from . import live, board, dashboard
+    live.init_app(app)
+    board.init_app(app)
+    dashboard.init_app(app)
+
+    from .models import User, Order, OrderItem, Payment
 
     # Blueprints
     from .auth import auth_bp
@@ -36,119 +74,31 @@ def create_app():
     from .clients import clients_bp
     from .services import services_bp
     from .orders import orders_bp
+    from .admin import admin_bp
+    from .reports import reports_bp
+    from .cash import cash_bp
+    from .board import board_bp
+    from .dashboard import dashboard_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(users_bp, url_prefix="/users")
     app.register_blueprint(clients_bp, url_prefix="/clients")
     app.register_blueprint(services_bp, url_prefix="/services")
     app.register_blueprint(orders_bp, url_prefix="/orders")
+    app.register_blueprint(admin_bp, url_prefix="/admin")
+    app.register_blueprint(reports_bp, url_prefix="/reports")
+    app.register_blueprint(cash_bp, url_prefix="/cash")
+    app.register_blueprint(board_bp, url_prefix="/board")
+    app.register_blueprint(dashboard_bp, url_prefix="/dashboard")
+
+    from . import cli
+    cli.register(app)
 
     @app.route("/")
     def index():
         if not current_user.is_authenticated:
             return redirect(url_for("auth.login"))
-        # Build dashboard context
-        try:
-            from sqlalchemy import func
-            from .models import Order, Payment, Client
-            # Timezone helpers
-            from datetime import datetime as _dt, timedelta as _td, timezone as _tz
-            try:
-                from zoneinfo import ZoneInfo
-                tz_sp = ZoneInfo("America/Sao_Paulo")
-            except Exception:
-                tz_sp = None
-            def to_utc_naive(dt_local_naive: _dt) -> _dt:
-                if tz_sp is not None:
-                    dt_local = dt_local_naive.replace(tzinfo=tz_sp)
-                else:
-                    dt_local = dt_local_naive.replace(tzinfo=_tz(_td(hours=-3)))
-                return dt_local.astimezone(_tz.utc).replace(tzinfo=None)
-            # Today boundaries in local Sao_Paulo
-            now_local = _dt.now()
-            today_local = _dt(year=now_local.year, month=now_local.month, day=now_local.day)
-            today_utc_start = to_utc_naive(today_local)
-            today_utc_end = to_utc_naive(today_local + _td(days=1))
-            # Orders created today (created_at in UTC-naive range)
-            today_orders = (
-                db.session.query(func.count(Order.id))
-                .filter(Order.created_at >= today_utc_start, Order.created_at < today_utc_end)
-                .scalar()
-            ) or 0
-            # Open orders by payment_status
-            open_orders = (db.session.query(func.count(Order.id)).filter(Order.payment_status == 'em_aberto').scalar()) or 0
-            # Deliveries today: compare by DATE only on delivery_date
-            sd = today_local.strftime("%Y-%m-%d")
-            deliveries_today = (
-                db.session.query(func.count(Order.id))
-                .filter(func.date(Order.delivery_date) == sd)
-                .scalar()
-            ) or 0
-            # Revenue last 7 days based on payments created_at within local range
-            start7_local = today_local - _td(days=6)  # include today and previous 6 days
-            start7_utc = to_utc_naive(start7_local)
-            end7_utc = today_utc_end
-            revenue_7d = (
-                db.session.query(func.coalesce(func.sum(Payment.amount), 0.0))
-                .filter(Payment.created_at >= start7_utc, Payment.created_at < end7_utc)
-                .scalar()
-            ) or 0.0
-            # Recent orders with client, latest 8
-            recent_orders = (
-                Order.query.join(Client).add_columns(Client.name)
-                .order_by(Order.id.desc()).limit(8).with_entities(Order).all()
-            )
-            # Paid today: distinct orders that are quitado and had any payment today
-            paid_today = (
-                db.session.query(func.count(func.distinct(Payment.order_id)))
-                .join(Order, Order.id == Payment.order_id)
-                .filter(Payment.created_at >= today_utc_start, Payment.created_at < today_utc_end)
-                .filter(Order.payment_status == 'quitado')
-                .scalar()
-            ) or 0
-            # New clients in last 7 days (local)
-            new_clients_7d = (
-                db.session.query(func.count(Client.id))
-                .filter(Client.created_at >= start7_utc, Client.created_at < end7_utc)
-                .scalar()
-            ) or 0
-            # Build 7-day trends for Orders created and Revenue by payment date
-            labels, orders_series, revenue_series = [], [], []
-            for i in range(6, -1, -1):
-                d_local = today_local - _td(days=i)
-                d_start_utc = to_utc_naive(_dt(d_local.year, d_local.month, d_local.day))
-                d_end_utc = to_utc_naive(_dt(d_local.year, d_local.month, d_local.day) + _td(days=1))
-                cnt = (
-                    db.session.query(func.count(Order.id))
-                    .filter(Order.created_at >= d_start_utc, Order.created_at < d_end_utc)
-                    .scalar()
-                ) or 0
-                rev = (
-                    db.session.query(func.coalesce(func.sum(Payment.amount), 0.0))
-                    .filter(Payment.created_at >= d_start_utc, Payment.created_at < d_end_utc)
-                    .scalar()
-                ) or 0.0
-                labels.append(d_local.strftime('%d/%m'))
-                orders_series.append(int(cnt))
-                revenue_series.append(float(rev))
-            metrics = {
-                'today_orders': int(today_orders),
-                'open_orders': int(open_orders),
-                'today_deliveries': int(deliveries_today),
-                'revenue_7d': float(revenue_7d),
-                'paid_today': int(paid_today),
-                'new_clients_7d': int(new_clients_7d),
-            }
-            trends = {
-                'labels': labels,
-                'orders': orders_series,
-                'revenue': revenue_series,
-            }
-        except Exception:
-            metrics = {'today_orders': 0, 'open_orders': 0, 'today_deliveries': 0, 'revenue_7d': 0.0, 'paid_today': 0, 'new_clients_7d': 0}
-            recent_orders = []
-            trends = {'labels': [], 'orders': [], 'revenue': []}
-        return render_template("dashboard.html", metrics=metrics, recent_orders=recent_orders, trends=trends)
+        return dashboard.page()
 
     @app.template_filter('phone_br')
     def phone_br(value):
@@ -195,27 +145,12 @@ def create_app():
                 return ""
 
     @app.template_filter('datetime_br')
-    def datetime_br(value, fmt: str = "%d/%m/%Y %H:%M"):
+    def datetime_br(value, fmt: str = timeutil.DEFAULT_FORMAT):
+        # Stored timestamps are UTC-naive; shown in Sao Paulo local time
         try:
-            from datetime import timezone
-            try:
-                from zoneinfo import ZoneInfo  # Python 3.9+
-                tz_sp = ZoneInfo("America/Sao_Paulo")
-            except Exception:
-                tz_sp = None
-            dt = value
-            if not dt:
+            if not value:
                 return ""
-            # Assume stored in UTC if naive
-            if dt.tzinfo is None:
-                dt = dt.replace(tzinfo=timezone.utc)
-            if tz_sp is not None:
-                dt = dt.astimezone(tz_sp)
-            else:
-                # Fallback: manual offset -03:00 (no DST handling)
-                from datetime import timedelta
-                dt = dt.astimezone(timezone(timedelta(hours=-3)))
-            return dt.strftime(fmt)
+            return timeutil.format_local(value, fmt)
         except Exception:
             try:
                 return value.strftime(fmt)
@@ -243,9 +178,36 @@ def create_app():
                 db.session.execute(text("ALTER TABLE 'order' ADD COLUMN delivery_date DATETIME"))
             if 'payment_status' not in col_names:
                 db.session.execute(text("ALTER TABLE 'order' ADD COLUMN payment_status VARCHAR(20) DEFAULT 'em_aberto'"))
+            if 'paid' not in col_names:
+                db.session.execute(text("ALTER TABLE 'order' ADD COLUMN paid FLOAT DEFAULT 0.0"))
+                db.session.execute(text(
+                    'UPDATE "order" SET paid = (SELECT coalesce(sum(amount), 0.0) FROM payment WHERE payment.order_id = "order".id)'
+                ))
+            # Per-order item/payment sums of the list pages (databases created before these indexes)
+            db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_order_item_order_id ON order_item (order_id)"))
+            db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_payment_order_id ON payment (order_id)"))
+            # Day-range payment scans (cash closing, dashboard revenue)
+            db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_payment_created_at ON payment (created_at)"))
+            # Open orders by client and age (receivables)
+            db.session.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_order_open ON 'order' (client_id, created_at) WHERE payment_status = 'em_aberto'"
+            ))
+            # Production board columns
+            db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_order_status ON 'order' (status, created_at)"))
             db.session.commit()
         except Exception:
             db.session.rollback()
+        # Order, item and payment ids never reused: AUTOINCREMENT (files created
+        # before it are rebuilt once) with the sequence above the archived ids
+        if storage.is_sqlite(app):
+            try:
+                for model in (Order, OrderItem, Payment):
+                    storage.ensure_autoincrement(db.engine, model.__table__)
+                if archive.enabled(app):
+                    archive.raise_id_floor()
+            except Exception:
+                db.session.rollback()
+                app.logger.exception("Could not secure order/item/payment id sequences")
         if not User.query.filter_by(username="admin").first():
             admin = User(
                 username="admin",
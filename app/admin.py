@@ -0,0 +1,116 @@
+import threading
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import Blueprint, render_template, redirect, url_for, flash, abort, current_app, request
+from flask_login import login_required, current_user
+from . import audit, scheduler, timeutil
+from .models import JobRun
+
+admin_bp = Blueprint("admin", __name__, template_folder="templates")
+
+
+def admin_required(view):
+    @wraps(view)
+    @login_required
+    def wrapped(*args, **kwargs):
+        if getattr(current_user, "role", None) != "admin":
+            abort(403)
+        return view(*args, **kwargs)
+    return wrapped
+
+
+@admin_bp.route("/perf")
+@admin_required
+def perf():
+    stats = current_app.extensions["perf"]
+    return render_template(
+        "admin/perf.html",
+        rows=stats.snapshot(),
+        since=stats.since,
+        enabled=current_app.config.get("PROFILING_ENABLED", False),
+        slow_ms=current_app.config.get("PROFILING_SLOW_MS"),
+        slow_log=current_app.config.get("PROFILING_SLOW_LOG"),
+        window=stats.window,
+        fragments=current_app.extensions["fragments"].stats(),
+        analytics=current_app.extensions["analytics"].stats(),
+    )
+
+
+@admin_bp.route("/perf/reset", methods=["POST"])
+@admin_required
+def perf_reset():
+    current_app.extensions["perf"].reset()
+    flash("Estatísticas zeradas", "info")
+    return redirect(url_for("admin.perf"))
+
+
+@admin_bp.route("/jobs")
+@admin_required
+def jobs():
+    app = current_app._get_current_object()
+    last = {}
+    for run in JobRun.query.order_by(JobRun.started_at.desc()).limit(200):
+        last.setdefault(run.job, run)
+    rows = []
+    for entry in scheduler.jobs():
+        interval = entry.interval(app)
+        run = last.get(entry.name)
+        rows.append({
+            "name": entry.name,
+            "title": entry.title,
+            "interval": interval,
+            "last": run,
+            "next": (run.started_at + timedelta(seconds=interval)) if run and interval else None,
+            "running": entry.lock.locked(),
+        })
+    history = JobRun.query.order_by(JobRun.started_at.desc()).limit(100).all()
+    return render_template(
+        "admin/jobs.html",
+        rows=rows,
+        history=history,
+        holder=scheduler.lease_holder(),
+        local=app.extensions.get("scheduler"),
+        now=datetime.utcnow(),
+    )
+
+
+@admin_bp.route("/jobs/<name>/run", methods=["POST"])
+@admin_required
+def run_job(name):
+    if scheduler.get(name) is None:
+        abort(404)
+    app = current_app._get_current_object()
+    # Backups and snapshots take a while: run outside the request, the history shows the outcome
+    threading.Thread(target=scheduler.run_job, args=(app, name, "manual"), daemon=True).start()
+    flash(f"Tarefa {name} iniciada", "info")
+    return redirect(url_for("admin.jobs"))
+
+
+@admin_bp.route("/audit")
+@admin_required
+def audit_log():
+    journal = current_app.extensions["audit"]
+    if journal is not None:
+        # Entries still in the buffer are part of the answer
+        journal.flush()
+    args = request.args
+    filters = {
+        "model": args.get("model") if args.get("model") in audit.MODELS else None,
+        "action": args.get("action") if args.get("action") in audit.ACTION_LABELS else None,
+        "user": (args.get("user") or "").strip() or None,
+        "order_id": args.get("order_id", type=int),
+        "object_id": args.get("object_id", type=int),
+        "start": timeutil.parse_day(args.get("start")),
+        "end": timeutil.parse_day(args.get("end")),
+        "q": (args.get("q") or "").strip() or None,
+    }
+    entries, next_before = audit.search(filters, before=args.get("before", type=int))
+    return render_template(
+        "admin/audit.html",
+        entries=entries,
+        next_before=next_before,
+        filters=filters,
+        models=audit.MODEL_LABELS,
+        actions=audit.ACTION_LABELS,
+        journal=journal,
+    )
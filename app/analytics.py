@@ -0,0 +1,276 @@
+import os
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import case, column, func, literal, select, table, union_all
+from . import archive, reporting, responses, timeutil
+from .fragments import LRUCache
+from .models import Order, OrderItem, Payment, Service
+
+# Revenue and service analytics over local-date ranges.
+#
+# Every figure is a grouped SQL aggregate. On the reporting snapshot the builder
+# below adds daily rollup tables (one row per local day and key), so a report
+# over a year sums a few hundred rows per key instead of scanning orders, items
+# and payments. Without rollups (live database, or a copy taken before they
+# existed) the same figures come from the base tables.
+#
+# Results are cached per (report, range, data token). The token is the snapshot
+# generation, or the data versions of the live tables, so a refresh or a write
+# makes the old entries unreachable.
+
+_has_rollups = {}
+_lock = threading.Lock()
+
+
+# ---- Rollups (built into each reporting copy) --------------------------------
+
+def _sources(with_archive: bool) -> dict:
+    def src(name, cols):
+        hot = f'SELECT {cols} FROM main."{name}"'
+        return f"({hot} UNION ALL SELECT {cols} FROM {archive.SCHEMA}.\"{name}\")" if with_archive else f"({hot})"
+    return {
+        "orders": src("order", "id, status, total, discount, surcharge, discount_percent, surcharge_percent, created_at"),
+        "items": src("order_item", "order_id, service_id, quantity, subtotal"),
+        "payments": src("payment", "amount, method, when_type, created_at"),
+    }
+
+
+@reporting.builder
+def build_rollups(conn, with_archive: bool):
+    src = _sources(with_archive)
+    hour = "strftime('%Y-%m-%d %H', created_at)"
+    # Local day of every UTC hour present; SQL joins on it instead of a fixed offset
+    hours = [h for (h,) in conn.execute(
+        f"SELECT DISTINCT {hour} FROM {src['orders']} UNION SELECT DISTINCT {hour} FROM {src['payments']}"
+    ) if h]
+    conn.execute("CREATE TEMP TABLE hour_day (hour TEXT PRIMARY KEY, day TEXT NOT NULL)")
+    conn.executemany("INSERT INTO hour_day VALUES (?, ?)", [
+        (h, timeutil.to_local_naive(datetime.strptime(h, "%Y-%m-%d %H")).date().isoformat()) for h in hours
+    ])
+    conn.execute(f"""
+        CREATE TABLE rollup_orders AS
+        SELECT hd.day AS day, o.status AS status, count(*) AS orders,
+               sum(coalesce(o.total, 0)) AS total,
+               sum(coalesce(i.amount, 0)) AS items_total,
+               sum(coalesce(o.discount, 0) + CASE WHEN coalesce(o.discount_percent, 0) > 0
+                   THEN coalesce(i.amount, 0) * o.discount_percent / 100.0 ELSE 0 END) AS discounts,
+               sum(coalesce(o.surcharge, 0) + CASE WHEN coalesce(o.surcharge_percent, 0) > 0
+                   THEN coalesce(i.amount, 0) * o.surcharge_percent / 100.0 ELSE 0 END) AS surcharges
+        FROM {src['orders']} o
+        JOIN hour_day hd ON hd.hour = strftime('%Y-%m-%d %H', o.created_at)
+        LEFT JOIN (SELECT order_id, sum(subtotal) AS amount FROM {src['items']} GROUP BY order_id) i
+               ON i.order_id = o.id
+        GROUP BY hd.day, o.status
+    """)
+    conn.execute(f"""
+        CREATE TABLE rollup_services AS
+        SELECT hd.day AS day, it.service_id AS service_id, count(*) AS lines,
+               sum(coalesce(it.quantity, 0)) AS units, sum(it.subtotal) AS subtotal
+        FROM {src['items']} it
+        JOIN {src['orders']} o ON o.id = it.order_id
+        JOIN hour_day hd ON hd.hour = strftime('%Y-%m-%d %H', o.created_at)
+        GROUP BY hd.day, it.service_id
+    """)
+    conn.execute(f"""
+        CREATE TABLE rollup_payments AS
+        SELECT hd.day AS day, p.method AS method, p.when_type AS when_type,
+               count(*) AS payments, sum(p.amount) AS amount
+        FROM {src['payments']} p
+        JOIN hour_day hd ON hd.hour = strftime('%Y-%m-%d %H', p.created_at)
+        GROUP BY hd.day, p.method, p.when_type
+    """)
+    for name in ("rollup_orders", "rollup_services", "rollup_payments"):
+        conn.execute(f"CREATE INDEX ix_{name}_day ON {name} (day)")
+    conn.execute("DROP TABLE hour_day")
+
+
+def _rollup(name: str, *cols: str):
+    return table(name, column("day"), *[column(c) for c in cols])
+
+
+rollup_orders = _rollup("rollup_orders", "status", "orders", "total", "items_total", "discounts", "surcharges")
+rollup_services = _rollup("rollup_services", "service_id", "lines", "units", "subtotal")
+rollup_payments = _rollup("rollup_payments", "method", "when_type", "payments", "amount")
+
+
+# ---- Base-table sources (no rollups) -------------------------------------------
+
+def _union(hot, cold, names, with_archive: bool):
+    parts = [select(*[hot.c[n] for n in names])]
+    if with_archive:
+        parts.append(select(*[cold.c[n] for n in names]))
+    return (union_all(*parts) if len(parts) > 1 else parts[0]).subquery()
+
+
+def _base_orders(with_archive, start, end):
+    names = ("id", "status", "total", "discount", "surcharge", "discount_percent", "surcharge_percent", "created_at")
+    o = _union(Order.__table__, archive.orders, names, with_archive)
+    return select(o).where(o.c.created_at >= start, o.c.created_at < end).subquery()
+
+
+def _base_items(with_archive):
+    return _union(OrderItem.__table__, archive.items, ("order_id", "service_id", "quantity", "subtotal"), with_archive)
+
+
+# ---- Reports -------------------------------------------------------------------
+
+def _orders_report(conn, first, last, with_archive, rollups) -> dict:
+    if rollups:
+        r = rollup_orders.c
+        rows = conn.execute(
+            select(r.status, func.sum(r.orders), func.sum(r.total), func.sum(r.items_total),
+                   func.sum(r.discounts), func.sum(r.surcharges))
+            .where(r.day.between(first.isoformat(), last.isoformat()))
+            .group_by(r.status)
+        ).all()
+    else:
+        start, end = timeutil.range_bounds(first, last)
+        o = _base_orders(with_archive, start, end)
+        it = _base_items(with_archive)
+        items = (
+            select(it.c.order_id, func.sum(it.c.subtotal).label("amount"))
+            .select_from(it.join(o, o.c.id == it.c.order_id))
+            .group_by(it.c.order_id)
+            .subquery()
+        )
+        amount = func.coalesce(items.c.amount, 0.0)
+
+        def adjustment(fixed, pct):
+            return func.coalesce(fixed, 0.0) + case((func.coalesce(pct, 0.0) > 0, amount * pct / 100.0), else_=0.0)
+
+        rows = conn.execute(
+            select(o.c.status, func.count(), func.sum(func.coalesce(o.c.total, 0.0)), func.sum(amount),
+                   func.sum(adjustment(o.c.discount, o.c.discount_percent)),
+                   func.sum(adjustment(o.c.surcharge, o.c.surcharge_percent)))
+            .select_from(o.outerjoin(items, items.c.order_id == o.c.id))
+            .group_by(o.c.status)
+        ).all()
+    by_status = sorted(
+        ({"status": s or "-", "orders": n, "total": float(t or 0)} for s, n, t, *_ in rows),
+        key=lambda r: -r["orders"],
+    )
+    count = sum(r[1] for r in rows)
+    total = sum(float(r[2] or 0) for r in rows)
+    return {
+        "orders": count,
+        "total": total,
+        "items_total": sum(float(r[3] or 0) for r in rows),
+        "discounts": sum(float(r[4] or 0) for r in rows),
+        "surcharges": sum(float(r[5] or 0) for r in rows),
+        "avg_ticket": total / count if count else 0.0,
+        "by_status": by_status,
+    }
+
+
+def _payments_report(conn, first, last, with_archive, rollups) -> dict:
+    if rollups:
+        r = rollup_payments.c
+        rows = conn.execute(
+            select(r.method, r.when_type, func.sum(r.payments), func.sum(r.amount))
+            .where(r.day.between(first.isoformat(), last.isoformat()))
+            .group_by(r.method, r.when_type)
+        ).all()
+    else:
+        start, end = timeutil.range_bounds(first, last)
+        p = _union(Payment.__table__, archive.payments, ("amount", "method", "when_type", "created_at"), with_archive)
+        rows = conn.execute(
+            select(p.c.method, p.c.when_type, func.count(), func.sum(p.c.amount))
+            .where(p.c.created_at >= start, p.c.created_at < end)
+            .group_by(p.c.method, p.c.when_type)
+        ).all()
+    by_method, by_when = {}, {}
+    for method, when_type, n, amount in rows:
+        for bucket, key in ((by_method, method or "-"), (by_when, when_type or "-")):
+            entry = bucket.setdefault(key, {"key": key, "payments": 0, "amount": 0.0})
+            entry["payments"] += n
+            entry["amount"] += float(amount or 0)
+    return {
+        "payments": sum(r[2] for r in rows),
+        "received": sum(float(r[3] or 0) for r in rows),
+        "by_method": sorted(by_method.values(), key=lambda e: -e["amount"]),
+        "by_when": sorted(by_when.values(), key=lambda e: -e["amount"]),
+    }
+
+
+def _services_report(conn, first, last, with_archive, rollups) -> dict:
+    if rollups:
+        r = rollup_services.c
+        grouped = (
+            select(r.service_id.label("service_id"), func.sum(r.lines).label("lines"),
+                   func.sum(r.units).label("units"), func.sum(r.subtotal).label("subtotal"))
+            .where(r.day.between(first.isoformat(), last.isoformat()))
+            .group_by(r.service_id)
+            .subquery()
+        )
+    else:
+        start, end = timeutil.range_bounds(first, last)
+        o = _base_orders(with_archive, start, end)
+        it = _base_items(with_archive)
+        grouped = (
+            select(it.c.service_id.label("service_id"), func.count().label("lines"),
+                   func.sum(func.coalesce(it.c.quantity, 0)).label("units"), func.sum(it.c.subtotal).label("subtotal"))
+            .select_from(it.join(o, o.c.id == it.c.order_id))
+            .group_by(it.c.service_id)
+            .subquery()
+        )
+    rows = conn.execute(
+        select(grouped.c.service_id, func.coalesce(Service.name, literal("(serviço excluído)")),
+               Service.unit, grouped.c.lines, grouped.c.units, grouped.c.subtotal)
+        .select_from(grouped.outerjoin(Service.__table__, Service.id == grouped.c.service_id))
+        .order_by(grouped.c.subtotal.desc())
+    ).all()
+    services = [
+        {"service_id": sid, "name": name, "unit": unit, "lines": lines, "units": int(units or 0),
+         "subtotal": float(subtotal or 0)}
+        for sid, name, unit, lines, units, subtotal in rows
+    ]
+    return {"services": services, "subtotal": sum(s["subtotal"] for s in services)}
+
+
+_REPORTS = {"orders": _orders_report, "payments": _payments_report, "services": _services_report}
+
+
+def _token(app) -> str:
+    generation = reporting.generation(app)
+    if generation is not None:
+        return generation
+    return responses.versions.stamp(("Order", "OrderItem", "Payment", "Service"))[0]
+
+
+def _rollups_available(conn, token: str) -> bool:
+    with _lock:
+        known = _has_rollups.get(token)
+    if known is not None:
+        return known
+    found = bool(conn.exec_driver_sql(
+        "SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name = 'rollup_orders'"
+    ).scalar())
+    with _lock:
+        # Another generation may be cached meanwhile: keep only the newest answer
+        _has_rollups.clear()
+        _has_rollups[token] = found
+    return found
+
+
+def report(app, name: str, first, last) -> dict:
+    """One report over local days first..last; cached per (report, range, data token)."""
+    token = _token(app)
+    key = (name, first, last, token)
+    cache = app.extensions["analytics"]
+    cached = cache.get(key)
+    if cached is not None:
+        return dict(cached, cached=True)
+    t0 = time.perf_counter()
+    with reporting.connection(app) as conn:
+        use_rollups = reporting.generation(app) == token and _rollups_available(conn, token)
+        data = _REPORTS[name](conn, first, last, reporting.has_archive(app), use_rollups)
+    data["source"] = "rollup" if use_rollups else "sql"
+    data["ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    cache.put(key, data)
+    return dict(data, cached=False)
+
+
+def init_app(app):
+    app.config.setdefault("ANALYTICS_CACHE_SIZE", int(os.environ.get("ANALYTICS_CACHE_SIZE", "128")))
+    app.extensions["analytics"] = LRUCache(app.config["ANALYTICS_CACHE_SIZE"])
@@ -0,0 +1,211 @@
+import os
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import Column, Index, MetaData, Table, event, exists, func, select, text
+from sqlalchemy.exc import IntegrityError
+from . import db, changes, storage
+from .models import Order, OrderItem, Payment
+
+# Cold storage for finished orders. Orders delivered and fully paid more than
+# ARCHIVE_AFTER_DAYS ago are moved, with their items and payments, into a
+# separate SQLite file attached to every connection as schema "archive". The
+# hot tables keep only live work, so list scans and the dashboard stay small;
+# list search and client statements read the archive only when asked.
+#
+# Each batch copies rows into the archive and then deletes them from the hot
+# tables. WAL does not make a transaction atomic across two files, so after a
+# crash a batch may exist in both; running the command again finishes it (rows
+# already archived unchanged are skipped). Any other id clash fails the batch:
+# the hot tables use AUTOINCREMENT, with the sequence raised to the archive's
+# highest ids, so an archived number is never handed out again.
+
+SCHEMA = "archive"
+DEFAULT_AFTER_DAYS = 180
+DEFAULT_BATCH_SIZE = 500
+
+metadata = MetaData()
+
+
+class ArchiveConflict(RuntimeError):
+    """A row to archive has the id of a different row already in the archive."""
+
+
+def _cold_copy(model, skip=()) -> Table:
+    # Same columns and keys, no foreign keys: the client table lives in the main file
+    source = model.__table__
+    columns = [
+        Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable)
+        for c in source.columns if c.name not in skip
+    ]
+    return Table(source.name, metadata, *columns, schema=SCHEMA)
+
+
+# Archived orders are settled, so the maintained paid balance is not carried over
+orders = _cold_copy(Order, skip=("paid",))
+items = _cold_copy(OrderItem)
+payments = _cold_copy(Payment)
+Index("ix_archive_order_client_id", orders.c.client_id)
+Index("ix_archive_order_item_order_id", items.c.order_id)
+Index("ix_archive_payment_order_id", payments.c.order_id)
+
+
+def archive_path(app) -> str | None:
+    """Archive file next to the main database (lavanderia.db -> lavanderia-archive.db)."""
+    if not storage.is_sqlite(app):
+        return None
+    if app.config.get("ARCHIVE_DATABASE"):
+        return app.config["ARCHIVE_DATABASE"]
+    main = db.engine.url.database
+    if not main or main == ":memory:":
+        return None
+    root, ext = os.path.splitext(main)
+    return f"{root}-archive{ext or '.db'}"
+
+
+def enabled(app=None) -> bool:
+    return (app or current_app).extensions.get("archive") is not None
+
+
+def _eligible(cutoff: datetime, batch_size: int | None = None):
+    o = Order.__table__
+    stmt = select(o.c.id).where(
+        o.c.status == "entregue",
+        o.c.payment_status == "quitado",
+        func.coalesce(o.c.delivery_date, o.c.created_at) < cutoff,
+    )
+    return stmt.order_by(o.c.id).limit(batch_size) if batch_size else stmt
+
+
+def _cutoff(after_days: int | None, now: datetime | None) -> datetime:
+    if after_days is None:
+        after_days = current_app.config["ARCHIVE_AFTER_DAYS"]
+    return (now or datetime.utcnow()) - timedelta(days=after_days)
+
+
+def eligible_count(after_days: int | None = None, now: datetime | None = None) -> int:
+    stmt = select(func.count()).select_from(_eligible(_cutoff(after_days, now)).subquery())
+    return db.session.execute(stmt).scalar()
+
+
+def _move(conn, hot: Table, cold: Table, key, ids):
+    names = [c.name for c in cold.columns]
+    # Left over from an interrupted batch: the same row is already in the archive
+    twin = cold.alias("copied")  # same table name in both files: correlate explicitly
+    copied = exists().where(twin.c.id == hot.c.id, *[hot.c[n].is_not_distinct_from(twin.c[n]) for n in names])
+    rows = select(*[hot.c[n] for n in names]).where(key.in_(ids), ~copied)
+    try:
+        conn.execute(cold.insert().from_select(names, rows))
+    except IntegrityError as exc:
+        raise ArchiveConflict(
+            f"{hot.name}: id já existe no arquivo morto com outro conteúdo; nada foi movido neste lote"
+        ) from exc
+    return conn.execute(hot.delete().where(key.in_(ids))).rowcount
+
+
+def raise_id_floor() -> dict:
+    """Start the hot id sequences above the archive's highest ids; returns the floors set.
+
+    Files archived before the hot tables had AUTOINCREMENT may hold ids above the
+    current hot maximum.
+    """
+    raised = {}
+    for hot, cold in ((Order, orders), (OrderItem, items), (Payment, payments)):
+        top = db.session.execute(select(func.max(cold.c.id))).scalar()
+        if top is None:
+            continue
+        name = hot.__table__.name
+        seq = db.session.execute(text("SELECT seq FROM sqlite_sequence WHERE name = :name"), {"name": name}).first()
+        if seq is None:
+            db.session.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :top)"),
+                               {"name": name, "top": top})
+        elif seq[0] < top:
+            db.session.execute(text("UPDATE sqlite_sequence SET seq = :top WHERE name = :name"),
+                               {"name": name, "top": top})
+        else:
+            continue
+        raised[name] = top
+    db.session.commit()
+    return raised
+
+
+def archive_orders(after_days: int | None = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                   limit: int | None = None, now: datetime | None = None) -> dict:
+    """Move finished orders older than after_days into the archive, one batch per transaction."""
+    if not enabled():
+        raise RuntimeError("arquivo morto indisponível para este banco")
+    cutoff = _cutoff(after_days, now)
+    counts = {"orders": 0, "items": 0, "payments": 0, "batches": 0}
+    while limit is None or counts["orders"] < limit:
+        size = batch_size if limit is None else min(batch_size, limit - counts["orders"])
+        ids = db.session.execute(_eligible(cutoff, size)).scalars().all()
+        if not ids:
+            break
+        conn = db.session.connection()
+        try:
+            moved = (
+                _move(conn, OrderItem.__table__, items, OrderItem.__table__.c.order_id, ids),
+                _move(conn, Payment.__table__, payments, Payment.__table__.c.order_id, ids),
+                _move(conn, Order.__table__, orders, Order.__table__.c.id, ids),
+            )
+        except ArchiveConflict:
+            db.session.rollback()
+            raise
+        counts["items"] += moved[0]
+        counts["payments"] += moved[1]
+        counts["orders"] += moved[2]
+        # Rows left behind the ORM's back: caches and counters start over
+        changes.record(db.session, "resync", "archive")
+        db.session.commit()
+        counts["batches"] += 1
+    return counts
+
+
+def vacuum():
+    """Give the space freed in the main file back to the filesystem."""
+    with db.engine.connect() as conn:
+        conn.exec_driver_sql("VACUUM main")
+
+
+def client_has_orders(client_id: int) -> bool:
+    if not enabled():
+        return False
+    return db.session.execute(
+        select(exists().where(orders.c.client_id == client_id))
+    ).scalar()
+
+
+def stats() -> dict:
+    counts = {}
+    for name, table in (("orders", orders), ("items", items), ("payments", payments)):
+        counts[name] = db.session.execute(select(func.count()).select_from(table)).scalar()
+    return counts
+
+
+def init_app(app):
+    app.config.setdefault("ARCHIVE_DATABASE", os.environ.get("ARCHIVE_DATABASE"))
+    app.config.setdefault("ARCHIVE_AFTER_DAYS", int(os.environ.get("ARCHIVE_AFTER_DAYS", DEFAULT_AFTER_DAYS)))
+    with app.app_context():
+        path = archive_path(app)
+        if not path:
+            app.extensions["archive"] = None
+            return
+        engine = db.engine
+        pragmas = [
+            f"PRAGMA {SCHEMA}.journal_mode={app.config['SQLITE_JOURNAL_MODE']}",
+            f"PRAGMA {SCHEMA}.synchronous={app.config['SQLITE_SYNCHRONOUS']}",
+        ]
+
+        @event.listens_for(engine, "connect")
+        def _attach(dbapi_conn, _record):
+            cur = dbapi_conn.cursor()
+            try:
+                cur.execute(f"ATTACH DATABASE ? AS {SCHEMA}", (path,))
+                for stmt in pragmas:
+                    cur.execute(stmt)
+            finally:
+                cur.close()
+
+        # Connections opened during startup predate the listener
+        engine.dispose()
+        metadata.create_all(engine)
+        app.extensions["archive"] = path
@@ -0,0 +1,216 @@
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import urllib.request
+from flask import abort, current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except Exception:  # optional: without it only .gz variants are built
+    brotli = None
+
+# Self-hosted front-end assets. `flask assets vendor` downloads the pinned
+# libraries into static/vendor once; `flask assets build` copies every static
+# file to static/build under a content-hash name (bootstrap.min.3f9c0e12ab.css),
+# rewrites url() references inside CSS to the hashed names and writes .gz/.br
+# siblings. Hashed URLs never change content, so they are served with a one-year
+# immutable Cache-Control and the precompressed variant the browser accepts.
+# asset_url() falls back to the plain static file, then to the CDN, so pages
+# still work on a checkout where the commands have not been run yet.
+
+log = logging.getLogger(__name__)
+
+VENDOR = [
+    ("vendor/bootstrap/css/bootstrap.min.css",
+     "https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/css/bootstrap.min.css"),
+    ("vendor/bootstrap/js/bootstrap.bundle.min.js",
+     "https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/js/bootstrap.bundle.min.js"),
+    ("vendor/bootstrap-icons/bootstrap-icons.min.css",
+     "https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.3/font/bootstrap-icons.min.css"),
+    ("vendor/bootstrap-icons/fonts/bootstrap-icons.woff2",
+     "https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.3/font/fonts/bootstrap-icons.woff2"),
+    ("vendor/bootstrap-icons/fonts/bootstrap-icons.woff",
+     "https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.3/font/fonts/bootstrap-icons.woff"),
+    ("vendor/choices/choices.min.css",
+     "https://cdn.jsdelivr.net/npm/choices.js@10.2.0/public/assets/styles/choices.min.css"),
+    ("vendor/choices/choices.min.js",
+     "https://cdn.jsdelivr.net/npm/choices.js@10.2.0/public/assets/scripts/choices.min.js"),
+    ("vendor/chart.js/chart.umd.min.js",
+     "https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.min.js"),
+]
+CDN = dict(VENDOR)
+
+BUILD_DIR = "build"
+MANIFEST = "manifest.json"
+COMPRESSIBLE = {".css", ".js", ".svg", ".json", ".txt", ".map", ".html"}
+MIN_COMPRESS_BYTES = 1024
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+_CSS_URL = re.compile(r"url\(\s*(['\"]?)([^'\")]+)\1\s*\)")
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def _hashed_name(path: str, digest: str) -> str:
+    root, ext = posixpath.splitext(path)
+    return f"{root}.{digest}{ext}"
+
+
+def vendor(static_folder: str, force: bool = False, timeout: float = 30.0) -> list[tuple[str, str]]:
+    """Download the pinned libraries; returns (path, outcome) pairs. Existing files are kept."""
+    results = []
+    for path, url in VENDOR:
+        dest = os.path.join(static_folder, *path.split("/"))
+        if os.path.exists(dest) and not force:
+            results.append((path, "presente"))
+            continue
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as resp:
+                data = resp.read()
+        except Exception as e:
+            results.append((path, f"falhou: {e}"))
+            continue
+        tmp = dest + ".part"
+        with open(tmp, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, dest)
+        results.append((path, f"baixado ({len(data) // 1024} KB)"))
+    return results
+
+
+def _source_files(static_folder: str):
+    for root, dirs, files in os.walk(static_folder):
+        rel_root = os.path.relpath(root, static_folder).replace(os.sep, "/")
+        if rel_root == BUILD_DIR or rel_root.startswith(BUILD_DIR + "/"):
+            dirs[:] = []
+            continue
+        for name in files:
+            if name.endswith(".part"):
+                continue
+            yield name if rel_root == "." else f"{rel_root}/{name}"
+
+
+def _rewrite_css(path: str, data: bytes, manifest: dict) -> bytes:
+    base = posixpath.dirname(path)
+
+    def repl(match):
+        ref = match.group(2)
+        if ref.startswith(("data:", "http:", "https:", "//", "/", "#")):
+            return match.group(0)
+        target, sep, suffix = ref.partition("?")
+        if not sep:
+            target, sep, suffix = ref.partition("#")
+        resolved = posixpath.normpath(posixpath.join(base, target))
+        hashed = manifest.get(resolved)
+        if not hashed:
+            return match.group(0)
+        # Hashed files keep the source layout under build/, so the reference stays relative
+        new_ref = posixpath.relpath(hashed, posixpath.join(BUILD_DIR, base))
+        return f"url({match.group(1)}{new_ref}{sep}{suffix}{match.group(1)})"
+
+    return _CSS_URL.sub(repl, data.decode("utf-8")).encode("utf-8")
+
+
+def _write_compressed(dest: str, data: bytes):
+    with open(dest + ".gz", "wb") as fh:
+        fh.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(dest + ".br", "wb") as fh:
+            fh.write(brotli.compress(data, quality=11))
+
+
+def build(static_folder: str, clean: bool = False) -> dict:
+    """Fingerprint and precompress every static file into static/build; returns the manifest.
+
+    Older hashed files are kept unless clean=True, so pages already rendered by a
+    running server (with the previous manifest) keep loading while it restarts.
+    """
+    out_root = os.path.join(static_folder, BUILD_DIR)
+    if clean and os.path.isdir(out_root):
+        shutil.rmtree(out_root)
+    os.makedirs(out_root, exist_ok=True)
+    sources = sorted(_source_files(static_folder))
+    # CSS last: its url() references must already have hashed names
+    sources.sort(key=lambda p: p.endswith(".css"))
+    manifest = {}
+    for path in sources:
+        with open(os.path.join(static_folder, *path.split("/")), "rb") as fh:
+            data = fh.read()
+        if path.endswith(".css"):
+            data = _rewrite_css(path, data, manifest)
+        hashed = f"{BUILD_DIR}/{_hashed_name(path, _digest(data))}"
+        manifest[path] = hashed
+        dest = os.path.join(static_folder, *hashed.split("/"))
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        with open(dest, "wb") as fh:
+            fh.write(data)
+        if posixpath.splitext(path)[1] in COMPRESSIBLE and len(data) >= MIN_COMPRESS_BYTES:
+            _write_compressed(dest, data)
+    tmp = os.path.join(out_root, MANIFEST + ".part")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    os.replace(tmp, os.path.join(out_root, MANIFEST))
+    return manifest
+
+
+class Assets:
+    def __init__(self, app):
+        self.app = app
+        self.static_folder = app.static_folder
+        self.manifest = {}
+        self.reload()
+
+    def reload(self):
+        path = os.path.join(self.static_folder, BUILD_DIR, MANIFEST)
+        if not os.path.exists(path):
+            self.manifest = {}
+            return
+        try:
+            with open(path, encoding="utf-8") as fh:
+                self.manifest = json.load(fh)
+        except Exception:
+            log.exception("invalid asset manifest %s", path)
+            self.manifest = {}
+
+    def url(self, path: str) -> str:
+        # In debug the plain files are used so edits to static/ show up without a rebuild
+        hashed = None if self.app.debug else self.manifest.get(path)
+        if hashed:
+            return url_for("static_build", filename=hashed[len(BUILD_DIR) + 1:])
+        if os.path.exists(os.path.join(self.static_folder, *path.split("/"))):
+            return url_for("static", filename=path)
+        return CDN.get(path) or url_for("static", filename=path)
+
+
+def _serve_build(filename):
+    build_dir = os.path.join(current_app.static_folder, BUILD_DIR)
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    accepted = request.accept_encodings
+    for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+        if accepted[encoding] and os.path.isfile(os.path.join(build_dir, *(filename + suffix).split("/"))):
+            resp = send_from_directory(build_dir, filename + suffix, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+            resp.headers["Content-Encoding"] = encoding
+            break
+    else:
+        if not os.path.isfile(os.path.join(build_dir, *filename.split("/"))):
+            abort(404)
+        resp = send_from_directory(build_dir, filename, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+    resp.headers["Cache-Control"] = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    resp.vary.add("Accept-Encoding")
+    return resp
+
+
+def init_app(app):
+    assets = Assets(app)
+    app.extensions["assets"] = assets
+    app.add_url_rule(f"{app.static_url_path}/{BUILD_DIR}/<path:filename>", "static_build", _serve_build)
+    app.jinja_env.globals["asset_url"] = assets.url
@@ -0,0 +1,235 @@
+import atexit
+import json
+import logging
+import os
+import threading
+from datetime import date, datetime
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import select
+from . import changes, db, timeutil
+from .models import AuditEntry
+
+# Audit journal: who changed what in orders, items, payments, clients, services
+# and users, with the values before and after. Entries come from the committed-
+# change feed (so cascades and rolled back work are handled like everywhere
+# else) and are only appended to an in-memory buffer on the request thread; a
+# background writer saves them with one batched INSERT every AUDIT_FLUSH_SECONDS
+# or AUDIT_BATCH_SIZE entries. When the writer falls AUDIT_BUFFER_MAX entries
+# behind, the committing thread writes the batch itself instead of dropping it.
+
+log = logging.getLogger(__name__)
+
+MODELS = {"Order", "OrderItem", "Payment", "Client", "Service", "User"}
+# Never copied into the journal, only marked as changed
+HIDDEN = {"password_hash"}
+MASK = "***"
+PAGE_SIZE = 100
+
+MODEL_LABELS = {
+    "Order": "Ordem", "OrderItem": "Item", "Payment": "Pagamento",
+    "Client": "Cliente", "Service": "Serviço", "User": "Usuário",
+}
+ACTION_LABELS = {"insert": "criação", "update": "alteração", "delete": "exclusão", "resync": "manutenção"}
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if isinstance(value, dict):
+        return {k: (MASK if k in HIDDEN else _plain(v)) for k, v in value.items()}
+    return value
+
+
+def _actor() -> tuple:
+    if not has_request_context():
+        return None, None, None
+    # The user the request already loaded: the feed runs inside commit, where
+    # loading it now would query the session that is committing
+    user = g.get("_login_user")
+    if user is None or not getattr(user, "is_authenticated", False):
+        return None, None, request.endpoint
+    return user.id, user.username, request.endpoint
+
+
+def entries(change_list, now: datetime | None = None) -> list[dict]:
+    """Journal rows for the audited models in one committed transaction."""
+    now = now or datetime.utcnow()
+    user_id, username, endpoint = _actor()
+    rows = []
+    updates = {}  # (model, id) -> update row; autoflush may write a row twice per commit
+    for ch in change_list:
+        if ch.model == changes.EXTERNAL:
+            continue  # journaled by the process that wrote
+        if ch.op == "resync":
+            # Set-based maintenance (reconcile, archive, seed): rows unknown
+            values = {}
+        elif ch.model not in MODELS:
+            continue
+        elif ch.op == "update":
+            values = {k: (MASK if k in HIDDEN else _plain([old, new])) for k, (old, new) in ch.diff.items()}
+            row = updates.get((ch.model, ch.pk))
+            if row is not None:
+                for key, (old, new) in values.items():
+                    row["values"][key] = [row["values"].get(key, [old])[0], new]
+                continue
+        else:
+            values = _plain({k: v for k, v in ch.values.items() if v is not None})
+        object_id = ch.pk if ch.op != "resync" else None
+        if ch.model == "Order":
+            order_id = object_id
+        else:
+            order_id = ch.values.get("order_id")
+        rows.append({
+            "created_at": now,
+            "user_id": user_id,
+            "username": username,
+            "endpoint": endpoint,
+            "action": ch.op,
+            "model": ch.model,
+            "object_id": object_id if isinstance(object_id, int) else None,
+            "order_id": order_id,
+            "values": values,
+        })
+        if ch.op == "update":
+            updates[(ch.model, ch.pk)] = rows[-1]
+    for row in rows:
+        values = row.pop("values")
+        row["changes"] = json.dumps(values, ensure_ascii=False, separators=(",", ":"), default=str) if values else None
+    return rows
+
+
+class Journal:
+    """In-memory buffer of journal rows and the thread that writes them."""
+
+    def __init__(self, app):
+        self.app = app
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # one batch INSERT at a time, in order
+        self._wake = threading.Event()
+        self._buffer = []
+        self._thread = None
+        self.written = 0
+        self.failures = 0
+
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def apply(self, change_list):
+        rows = entries(change_list)
+        if not rows:
+            return
+        config = self.app.config
+        with self._lock:
+            self._buffer.extend(rows)
+            size = len(self._buffer)
+        if size >= config["AUDIT_BUFFER_MAX"]:
+            # The writer is behind (database busy): this thread pays, nothing is lost
+            self.flush()
+        elif size >= config["AUDIT_BATCH_SIZE"]:
+            self._wake.set()
+        self._ensure_writer()
+
+    def flush(self) -> int:
+        """Write everything buffered so far; returns the number of rows written."""
+        with self._write_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+            if not rows:
+                return 0
+            try:
+                with self.app.app_context():
+                    with db.engine.begin() as conn:
+                        conn.execute(AuditEntry.__table__.insert(), rows)
+            except Exception:
+                self.failures += 1
+                log.exception("audit: writing %d entries failed; retrying later", len(rows))
+                with self._lock:
+                    self._buffer[:0] = rows
+                return 0
+            self.written += len(rows)
+            return len(rows)
+
+    def _ensure_writer(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.app.config["AUDIT_FLUSH_SECONDS"])
+            self._wake.clear()
+            self.flush()
+
+
+def _apply(change_list):
+    # Commits always run inside an app context: the journal of that app
+    journal = current_app.extensions.get("audit") if has_app_context() else None
+    if journal is not None:
+        journal.apply(change_list)
+
+
+def _fields(entry: AuditEntry) -> list[tuple]:
+    """(field, before, after) for display; before is None outside updates."""
+    if not entry.changes:
+        return []
+    values = json.loads(entry.changes)
+    if entry.action == "update":
+        return [(k, old, new) for k, (old, new) in values.items()]
+    return [(k, None, v) for k, v in values.items()]
+
+
+def search(filters: dict, before: int | None = None, limit: int = PAGE_SIZE) -> tuple[list, int | None]:
+    """Newest entries matching filters, `limit` at a time (keyset on id).
+
+    Returns the entries, each with .fields, and the id to continue from (None on the last page).
+    """
+    a = AuditEntry
+    stmt = select(a).order_by(a.id.desc()).limit(limit + 1)
+    if before:
+        stmt = stmt.where(a.id < before)
+    if filters.get("model"):
+        stmt = stmt.where(a.model == filters["model"])
+    if filters.get("action"):
+        stmt = stmt.where(a.action == filters["action"])
+    if filters.get("user"):
+        stmt = stmt.where(a.username == filters["user"])
+    if filters.get("order_id"):
+        stmt = stmt.where(a.order_id == filters["order_id"])
+    if filters.get("object_id"):
+        stmt = stmt.where(a.object_id == filters["object_id"])
+    start, end = timeutil.range_bounds(filters.get("start"), filters.get("end"))
+    if start:
+        stmt = stmt.where(a.created_at >= start)
+    if end:
+        stmt = stmt.where(a.created_at < end)
+    if filters.get("q"):
+        stmt = stmt.where(a.changes.contains(filters["q"], autoescape=True))
+    rows = db.session.execute(stmt).scalars().all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    for entry in rows:
+        entry.fields = _fields(entry)
+    return rows, (rows[-1].id if more else None)
+
+
+def init_app(app):
+    app.config.setdefault(
+        "AUDIT_ENABLED",
+        os.environ.get("AUDIT_ENABLED", "1").strip().lower() in ("1", "true", "yes", "on"),
+    )
+    app.config.setdefault("AUDIT_FLUSH_SECONDS", float(os.environ.get("AUDIT_FLUSH_SECONDS", "1")))
+    app.config.setdefault("AUDIT_BATCH_SIZE", int(os.environ.get("AUDIT_BATCH_SIZE", "200")))
+    app.config.setdefault("AUDIT_BUFFER_MAX", int(os.environ.get("AUDIT_BUFFER_MAX", "5000")))
+    app.extensions["audit"] = None
+    if not app.config["AUDIT_ENABLED"]:
+        return
+    journal = app.extensions["audit"] = Journal(app)
+    changes.subscribe(_apply)
+    # Short-lived processes (flask commands) exit before the writer's next tick
+    atexit.register(journal.flush)
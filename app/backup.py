@@ -0,0 +1,305 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from . import changes, db, storage
+
+# Online backups. The database (and the archive file, when present) is copied
+# with SQLite's backup API a few pages per step, sleeping between steps, so the
+# copy never holds a lock long enough to stall a clerk's commit. The copy is
+# checked with PRAGMA integrity_check, gzipped next to a JSON sidecar (sha256,
+# size, timings) and old snapshots are rotated out. Nothing in the app pauses:
+# in-memory counters and caches are not involved in a backup.
+#
+# A write from another connection makes the backup API start over; after a few
+# restarts the copy is finished in a single pass instead, which under WAL only
+# holds a read snapshot and does not block writers either.
+
+log = logging.getLogger(__name__)
+
+SUFFIX = ".db.gz"
+MAX_RESTARTS = 3
+
+
+class BackupError(RuntimeError):
+    pass
+
+
+class _Restarted(Exception):
+    pass
+
+
+class Status:
+    """Outcome of the latest backup run in this process (read by /metrics)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.last_success = None
+        self.last_error = None
+        self.last_seconds = 0.0
+        self.failures = 0
+
+    def ok(self, seconds: float):
+        with self._lock:
+            self.last_success = time.time()
+            self.last_seconds = seconds
+            self.last_error = None
+
+    def failed(self, error: str):
+        with self._lock:
+            self.failures += 1
+            self.last_error = error
+
+    def read_last_success(self) -> float:
+        return self.last_success or 0.0
+
+    def read_failures(self) -> float:
+        return float(self.failures)
+
+
+status = Status()
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _integrity(path: str) -> str:
+    conn = sqlite3.connect(path)
+    try:
+        rows = [r[0] for r in conn.execute("PRAGMA integrity_check")]
+    finally:
+        conn.close()
+    return "ok" if rows == ["ok"] else "; ".join(rows[:5])
+
+
+def sources(app) -> list[tuple[str, str]]:
+    """(label, path) of the SQLite files to back up: main database and archive."""
+    if not storage.is_sqlite(app):
+        return []
+    with app.app_context():
+        main = db.engine.url.database
+    if not main or main == ":memory:":
+        return []
+    found = [(os.path.splitext(os.path.basename(main))[0], main)]
+    cold = app.extensions.get("archive")
+    if cold and os.path.exists(cold):
+        found.append((os.path.splitext(os.path.basename(cold))[0], cold))
+    return found
+
+
+def copy_database(src_path: str, dest_path: str, pages: int, sleep: float, busy_timeout: float) -> dict:
+    """Consistent copy of a live SQLite file through the backup API."""
+    src = sqlite3.connect(src_path, timeout=busy_timeout)
+    dst = sqlite3.connect(dest_path)
+    state = {"remaining": None, "restarts": 0, "total": 0}
+
+    def progress(_status, remaining, total):
+        if state["remaining"] is not None and remaining > state["remaining"]:
+            state["restarts"] += 1
+            if state["restarts"] > MAX_RESTARTS:
+                raise _Restarted()
+        state["remaining"], state["total"] = remaining, total
+
+    try:
+        try:
+            src.backup(dst, pages=pages, sleep=sleep, progress=progress)
+            mode = "steps"
+        except _Restarted:
+            src.backup(dst, pages=-1)
+            mode = "single pass"
+    finally:
+        dst.close()
+        src.close()
+    return {"pages": state["total"], "restarts": state["restarts"], "mode": mode}
+
+
+def _write_snapshot(label: str, src_path: str, dest_dir: str, config) -> dict:
+    started = time.perf_counter()
+    now = datetime.now(timezone.utc)
+    # Milliseconds keep a restore's safety copy from taking the name of the snapshot being restored
+    stamp = f"{now:%Y%m%d-%H%M%S}{now.microsecond // 1000:03d}"
+    name = f"{label}-{stamp}"
+    fd, tmp = tempfile.mkstemp(prefix=f".{name}-", suffix=".db", dir=dest_dir)
+    os.close(fd)
+    try:
+        info = copy_database(
+            src_path, tmp, pages=config["BACKUP_STEP_PAGES"], sleep=config["BACKUP_STEP_SLEEP_MS"] / 1000.0,
+            busy_timeout=config.get("SQLITE_BUSY_TIMEOUT_MS", 10000) / 1000.0,
+        )
+        integrity = _integrity(tmp)
+        if integrity != "ok":
+            raise BackupError(f"cópia de {src_path} falhou na verificação de integridade: {integrity}")
+        meta = {
+            "source": label,
+            "path": src_path,
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "bytes": os.path.getsize(tmp),
+            "sha256": _sha256(tmp),
+            "integrity": integrity,
+            **info,
+        }
+        final = os.path.join(dest_dir, name + SUFFIX)
+        with open(tmp, "rb") as fin, gzip.open(final + ".part", "wb", compresslevel=6) as fout:
+            shutil.copyfileobj(fin, fout, 1 << 20)
+        os.replace(final + ".part", final)
+        meta["compressed_bytes"] = os.path.getsize(final)
+        meta["seconds"] = round(time.perf_counter() - started, 3)
+        with open(os.path.join(dest_dir, name + ".json"), "w", encoding="utf-8") as fh:
+            json.dump(meta, fh, indent=2)
+        meta["file"] = final
+        return meta
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def rotate(dest_dir: str, label: str, keep: int) -> list[str]:
+    """Delete all but the newest `keep` snapshots of one source; returns removed files."""
+    snaps = sorted(
+        f for f in os.listdir(dest_dir)
+        if f.startswith(label + "-") and f.endswith(SUFFIX) and f[len(label) + 1:len(label) + 2].isdigit()
+    )
+    removed = []
+    for name in snaps[:-keep] if keep > 0 else []:
+        for path in (os.path.join(dest_dir, name), os.path.join(dest_dir, name[:-len(SUFFIX)] + ".json")):
+            if os.path.exists(path):
+                os.remove(path)
+                removed.append(path)
+    return removed
+
+
+def run(app, dest_dir: str | None = None) -> list[dict]:
+    """Snapshot every source into dest_dir (BACKUP_DIR) and rotate old ones."""
+    dest_dir = dest_dir or app.config["BACKUP_DIR"]
+    os.makedirs(dest_dir, exist_ok=True)
+    started = time.perf_counter()
+    results = []
+    try:
+        for label, path in sources(app):
+            meta = _write_snapshot(label, path, dest_dir, app.config)
+            meta["removed"] = rotate(dest_dir, label, app.config["BACKUP_KEEP"])
+            results.append(meta)
+    except Exception as e:
+        status.failed(str(e))
+        raise
+    status.ok(time.perf_counter() - started)
+    return results
+
+
+def list_snapshots(dest_dir: str) -> list[dict]:
+    if not os.path.isdir(dest_dir):
+        return []
+    found = []
+    for name in sorted(os.listdir(dest_dir), reverse=True):
+        if not name.endswith(SUFFIX):
+            continue
+        sidecar = os.path.join(dest_dir, name[:-len(SUFFIX)] + ".json")
+        meta = {}
+        if os.path.exists(sidecar):
+            with open(sidecar, encoding="utf-8") as fh:
+                meta = json.load(fh)
+        meta["file"] = os.path.join(dest_dir, name)
+        meta["compressed_bytes"] = os.path.getsize(meta["file"])
+        found.append(meta)
+    return found
+
+
+def _sidecar(snapshot: str) -> dict:
+    path = snapshot[:-len(SUFFIX)] + ".json" if snapshot.endswith(SUFFIX) else None
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    return {}
+
+
+def _expand(snapshot: str, dest_dir: str) -> str:
+    fd, tmp = tempfile.mkstemp(prefix=".restore-", suffix=".db", dir=dest_dir)
+    os.close(fd)
+    try:
+        with gzip.open(snapshot, "rb") as fin, open(tmp, "wb") as fout:
+            shutil.copyfileobj(fin, fout, 1 << 20)
+    except (OSError, EOFError, zlib.error) as e:
+        os.remove(tmp)
+        raise BackupError(f"arquivo compactado corrompido: {e}")
+    return tmp
+
+
+def verify(snapshot: str) -> dict:
+    """Decompress, compare with the recorded sha256 and run integrity_check."""
+    meta = _sidecar(snapshot)
+    try:
+        tmp = _expand(snapshot, os.path.dirname(os.path.abspath(snapshot)))
+    except BackupError as e:
+        return {"file": snapshot, "source": meta.get("source"), "sha256_ok": False, "integrity": str(e), "ok": False}
+    try:
+        digest = _sha256(tmp)
+        result = {
+            "file": snapshot,
+            "source": meta.get("source"),
+            "sha256_ok": meta.get("sha256") in (None, digest),
+            "integrity": _integrity(tmp),
+        }
+    finally:
+        os.remove(tmp)
+    result["ok"] = result["sha256_ok"] and result["integrity"] == "ok"
+    return result
+
+
+def restore(app, snapshot: str, target: str | None = None) -> dict:
+    """Write a snapshot over a database file through the backup API.
+
+    The current content is snapshotted first. The target is locked only while
+    pages are written; running servers notice the write marker moved
+    (changes.ExternalWrites) and reload their counters and caches.
+    """
+    meta = _sidecar(snapshot)
+    if target is None:
+        by_label = dict(sources(app))
+        target = by_label.get(meta.get("source")) or meta.get("path")
+        if not target:
+            raise BackupError("não foi possível identificar o banco de destino; informe --target")
+    dest_dir = app.config["BACKUP_DIR"]
+    os.makedirs(dest_dir, exist_ok=True)
+    tmp = _expand(snapshot, dest_dir)
+    try:
+        if meta.get("sha256") and _sha256(tmp) != meta["sha256"]:
+            raise BackupError("sha256 não confere com o registrado no backup")
+        integrity = _integrity(tmp)
+        if integrity != "ok":
+            raise BackupError(f"backup corrompido: {integrity}")
+        safety = None
+        if os.path.exists(target):
+            label = os.path.splitext(os.path.basename(target))[0]
+            safety = _write_snapshot(label, target, dest_dir, app.config)["file"]
+        # The snapshot carries its own marker: move past the one servers last saw
+        watcher = changes.external_writes(app)
+        marker = watcher.read() if watcher is not None and os.path.exists(watcher.path) else 0
+        copy_database(tmp, target, pages=-1, sleep=0,
+                      busy_timeout=app.config.get("SQLITE_BUSY_TIMEOUT_MS", 10000) / 1000.0)
+        if watcher is not None:
+            watcher.announce(after=marker)
+    finally:
+        os.remove(tmp)
+    return {"target": target, "safety_snapshot": safety}
+
+
+def init_app(app):
+    instance = os.path.join(os.path.dirname(os.path.dirname(__file__)), "instance")
+    app.config.setdefault("BACKUP_DIR", os.environ.get("BACKUP_DIR") or os.path.join(instance, "backups"))
+    app.config.setdefault("BACKUP_KEEP", int(os.environ.get("BACKUP_KEEP", "14")))
+    app.config.setdefault("BACKUP_INTERVAL_HOURS", float(os.environ.get("BACKUP_INTERVAL_HOURS", "24")))
+    app.config.setdefault("BACKUP_STEP_PAGES", int(os.environ.get("BACKUP_STEP_PAGES", "256")))
+    app.config.setdefault("BACKUP_STEP_SLEEP_MS", int(os.environ.get("BACKUP_STEP_SLEEP_MS", "5")))
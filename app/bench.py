@@ -0,0 +1,160 @@
+import json
+import platform
+import sqlite3
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func
+from . import timeutil
+from .instrumentation import percentile
+from .querybudget import render_receipt, sample_ids
+
+# Route benchmarks. Each target is rendered `rounds` times through the test
+# client (no network), timing p50/p95 wall clock; a few extra rounds run under
+# tracemalloc to record the peak Python memory of one request. Results are
+# plain JSON so runs from two versions can be diffed with compare().
+
+BENCHMARKS = [
+    ("index", "/"),
+    ("list_orders", "/orders/"),
+    ("list_orders:quitado", "/orders/?pay=quitado"),
+    ("list_orders:em_aberto", "/orders/?pay=em_aberto"),
+    ("list_orders:search", "/orders/?q=silva"),
+    ("list_orders:created", "/orders/?start={month_ago}&end={today}"),
+    ("list_orders:delivery", "/orders/?date_field=delivery&start={month_ago}&end={today}"),
+    ("edit_order", "/orders/{order_id}/edit"),
+    ("list_clients", "/clients/"),
+    ("list_clients:search", "/clients/?q=Silva"),
+    ("receipt", lambda sample: render_receipt(sample["order_id"])),
+    ("filter:datetime_br", lambda sample: render_timestamps(sample["timestamps"])),
+]
+
+MEMORY_ROUNDS = 3
+TIMESTAMP_CELLS = 5000
+
+_TIMESTAMPS_TEMPLATE = "{% for v in values %}<td>{{ v|datetime_br }}</td>{% endfor %}"
+
+
+def render_timestamps(values):
+    # A list page's worth of created_at cells, isolating the date filter cost
+    from flask import render_template_string
+    render_template_string(_TIMESTAMPS_TEMPLATE, values=values)
+    return 200
+
+
+def _timestamps(count: int) -> list[datetime]:
+    # UTC-naive like the database, spread over two years (both DST eras when old enough)
+    start = datetime(2018, 1, 1, 0, 7, 31)
+    return [start + timedelta(minutes=211 * i) for i in range(count)]
+
+
+def _git_version(root) -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "describe", "--always", "--dirty"], cwd=root, capture_output=True, text=True, timeout=5,
+        )
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _row_counts(db) -> dict:
+    from .models import Client, Order, OrderItem, Payment
+    return {
+        name: db.session.query(func.count(model.id)).scalar()
+        for name, model in (("clients", Client), ("orders", Order), ("items", OrderItem), ("payments", Payment))
+    }
+
+
+def _call(app, client, target, sample):
+    if callable(target):
+        with app.test_request_context():
+            return target(sample)
+    return client.get(target).status_code
+
+
+def run(app, rounds: int = 20, warmup: int = 2, only=None, username="admin", password="admin") -> dict:
+    """Benchmark every target against app's database and return the JSON-ready report."""
+    from . import db
+    client = app.test_client()
+    resp = client.post("/login", data={"username": username, "password": password})
+    if resp.status_code != 302:
+        raise RuntimeError(f"login as {username!r} failed ({resp.status_code})")
+    with app.app_context():
+        sample = sample_ids(db)
+        rows = _row_counts(db)
+    today = timeutil.today()
+    sample.update(today=today.isoformat(), month_ago=(today - timedelta(days=30)).isoformat(),
+                  timestamps=_timestamps(TIMESTAMP_CELLS))
+
+    results = {}
+    for name, target in BENCHMARKS:
+        if only and not any(name.startswith(o) for o in only):
+            continue
+        if not callable(target):
+            target = target.format(**sample)
+        for _ in range(warmup):
+            _call(app, client, target, sample)
+        timings = []
+        status = None
+        for _ in range(rounds):
+            started = time.perf_counter()
+            status = _call(app, client, target, sample)
+            timings.append((time.perf_counter() - started) * 1000.0)
+        peak = 0
+        for _ in range(MEMORY_ROUNDS):
+            tracemalloc.start()
+            try:
+                _call(app, client, target, sample)
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+        timings.sort()
+        results[name] = {
+            "target": target if isinstance(target, str) else name,
+            "status": status,
+            "rounds": rounds,
+            "p50_ms": round(percentile(timings, 50), 3),
+            "p95_ms": round(percentile(timings, 95), 3),
+            "mean_ms": round(sum(timings) / len(timings), 3) if timings else 0.0,
+            "max_ms": round(timings[-1], 3) if timings else 0.0,
+            "peak_kb": round(peak / 1024.0, 1),
+        }
+    return {
+        "meta": {
+            "version": _git_version(app.root_path),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "rows": rows,
+        },
+        "results": results,
+    }
+
+
+def save(report: dict, path: str):
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2, ensure_ascii=False)
+
+
+def load(path: str) -> dict:
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def compare(baseline: dict, current: dict, tolerance: float = 0.15) -> list[dict]:
+    """Per-target deltas against a previous report; `regressed` marks p95/memory above tolerance."""
+    rows = []
+    for name, cur in current.get("results", {}).items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        row = {"name": name}
+        for key in ("p50_ms", "p95_ms", "peak_kb"):
+            old, new = float(base.get(key) or 0.0), float(cur.get(key) or 0.0)
+            row[key] = (old, new, (new - old) / old if old else 0.0)
+        row["regressed"] = row["p95_ms"][2] > tolerance or row["peak_kb"][2] > tolerance
+        rows.append(row)
+    return rows
@@ -0,0 +1,125 @@
+import os
+from flask import Blueprint, render_template, current_app
+from flask_login import login_required
+from sqlalchemy import func, select, union_all
+from . import db, live, timeutil
+from .models import Order
+
+# Production board: open orders as columns by status. The page is one grouped
+# count plus the oldest cards of each column, both over ix_order_status. Screens
+# then stay current through Server-Sent Events (live.py): every committed order
+# change becomes one event with the card to show, so keeping many boards open
+# costs no database queries.
+
+board_bp = Blueprint("board", __name__, template_folder="templates")
+
+COLUMNS = (
+    ("pendente", "Pendente"),
+    ("em andamento", "Em andamento"),
+    ("pronto", "Pronto"),
+)
+STATUSES = tuple(key for key, _label in COLUMNS)
+# Order columns shown on a card (the rest of the row never reaches the browser)
+CARD_FIELDS = ("id", "client_id", "status", "total", "paid", "payment_status", "created_at", "delivery_date")
+
+
+def _display(card: dict) -> dict:
+    """JSON-ready card: timestamps as ISO (UTC, for ordering) plus local display text."""
+    created, delivery = card["created_at"], card["delivery_date"]
+    card["opened"] = timeutil.format_local(created, "%d/%m %H:%M") if created else ""
+    # delivery_date is a local calendar date stored naive
+    card["delivery"] = delivery.strftime("%d/%m") if delivery else ""
+    card["created_at"] = created.isoformat() if created else None
+    card["delivery_date"] = delivery.isoformat() if delivery else None
+    card["balance"] = max(0.0, float(card["total"] or 0) - float(card["paid"] or 0))
+    return card
+
+
+class BoardHub(live.Hub):
+    """Order changes as board events: moves between columns and the card to show."""
+
+    def _card(self, values: dict) -> dict:
+        card = {key: values.get(key) for key in CARD_FIELDS}
+        card["client_name"] = live.client_names.get(card["client_id"])
+        return _display(card)
+
+    def events(self, change_list) -> list[tuple[str, dict]]:
+        events = []
+        orders = {}  # order id -> event; one per order even when a commit flushed it twice
+        for ch in change_list:
+            if ch.op == "resync":
+                # Set-based writes: row-level changes unknown, screens reload
+                return [("reload", {})]
+            if ch.model == "Client":
+                if ch.op == "update" and "name" in ch.diff:
+                    events.append(("client", {"client_id": ch.pk, "name": ch.values.get("name")}))
+                continue
+            if ch.model != "Order":
+                continue
+            if ch.op == "update" and not any(key in ch.diff for key in CARD_FIELDS):
+                continue
+            order_id = ch.pk
+            old = None if ch.op == "insert" else (
+                ch.diff["status"][0] if "status" in ch.diff else ch.values.get("status")
+            )
+            new = None if ch.op == "delete" else ch.values.get("status")
+            data = orders.get(order_id)
+            if data is None:
+                data = orders[order_id] = {"id": order_id, "from": old}
+                events.append(("order", data))
+            data["to"] = new
+            data["card"] = self._card(ch.values) if new in STATUSES else None
+        return [(event, data) for event, data in events if event != "order" or data["from"] or data["to"]]
+
+
+hub = BoardHub()
+
+
+def board_data(limit: int) -> dict:
+    """Counts per status and the oldest `limit` cards of each column."""
+    o = Order.__table__.c
+    # Taken before reading: events committed meanwhile are replayed to the page
+    seq = hub.seq
+    counts = dict(db.session.execute(
+        select(o.status, func.count()).where(o.status.in_(STATUSES)).group_by(o.status)
+    ).all())
+    parts = [
+        select(*[o[key] for key in CARD_FIELDS])
+        .where(o.status == status)
+        .order_by(o.created_at, o.id)
+        .limit(limit)
+        .subquery()
+        for status in STATUSES
+    ]
+    rows = db.session.execute(union_all(*[select(part) for part in parts])).all()
+    names = live.client_names.load()
+    cards = {status: [] for status in STATUSES}
+    for row in rows:
+        card = dict(zip(CARD_FIELDS, row))
+        card["client_name"] = names.get(card["client_id"])
+        cards[card["status"]].append(_display(card))
+    return {
+        "columns": [
+            {"status": status, "label": label, "count": counts.get(status, 0), "cards": cards[status]}
+            for status, label in COLUMNS
+        ],
+        "seq": seq,
+    }
+
+
+@board_bp.route("/")
+@login_required
+def board():
+    limit = current_app.config["BOARD_CARD_LIMIT"]
+    return render_template("board/board.html", data=board_data(limit), limit=limit)
+
+
+@board_bp.route("/events")
+@login_required
+def events():
+    return live.event_stream(hub)
+
+
+def init_app(app):
+    app.config.setdefault("BOARD_CARD_LIMIT", int(os.environ.get("BOARD_CARD_LIMIT", "100")))
+    hub.subscribe()
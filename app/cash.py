@@ -0,0 +1,263 @@
+from datetime import date
+from flask import Blueprint, render_template, redirect, url_for, flash, request, abort
+from flask_login import login_required, current_user
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.exc import IntegrityError
+from . import db, timeutil
+from .admin import admin_required
+from .forms import parse_money_to_float
+from .models import CashClosing, CashClosingEvent, CashClosingLine, Payment
+
+# Daily cash closing (fechamento de caixa). Closing a local day aggregates its
+# payments by method and when_type in one grouped query and stores the result;
+# the stored figures never change afterwards, even if payments of that day are
+# later edited or deleted. Reopening marks the closing as reopened and the next
+# closing is a new version; adjustments are separate audit entries. Past days
+# are reported from the stored closings without scanning payment.
+
+cash_bp = Blueprint("cash", __name__, template_folder="templates")
+
+FROZEN_COLUMNS = {"day", "version", "payments", "total", "counted", "closed_at", "closed_by"}
+
+
+class CashError(ValueError):
+    """Closing rule violation; the message is shown to the user as-is."""
+
+
+@event.listens_for(CashClosing, "before_update")
+def _closing_frozen(_mapper, _connection, target):
+    changed = {a.key for a in inspect(target).attrs if a.history.has_changes()}
+    if changed & FROZEN_COLUMNS:
+        raise CashError("Fechamento de caixa não pode ser alterado; reabra e feche novamente.")
+
+
+@event.listens_for(CashClosingLine, "before_update")
+@event.listens_for(CashClosingLine, "before_delete")
+def _line_frozen(_mapper, _connection, _target):
+    raise CashError("Linhas de fechamento de caixa não podem ser alteradas.")
+
+
+def day_breakdown(day: date) -> list[tuple]:
+    """(method, when_type, payments, amount) of the payments made on a local day."""
+    start, end = timeutil.day_bounds(day)
+    stmt = (
+        select(Payment.method, Payment.when_type, func.count(), func.coalesce(func.sum(Payment.amount), 0.0))
+        .where(Payment.created_at >= start, Payment.created_at < end)
+        .group_by(Payment.method, Payment.when_type)
+        .order_by(func.sum(Payment.amount).desc())
+    )
+    return db.session.execute(stmt).all()
+
+
+def current_closing(day: date) -> CashClosing | None:
+    return CashClosing.query.filter_by(day=day).order_by(CashClosing.version.desc()).first()
+
+
+def close_day(day: date, user_id: int, counted: float | None = None, note: str | None = None) -> CashClosing:
+    last = current_closing(day)
+    if last is not None and last.status == "fechado":
+        raise CashError("O caixa deste dia já está fechado.")
+    if day > timeutil.today():
+        raise CashError("Não é possível fechar um dia futuro.")
+    rows = day_breakdown(day)
+    closing = CashClosing(
+        day=day,
+        version=(last.version + 1) if last else 1,
+        status="fechado",
+        payments=sum(r[2] for r in rows),
+        total=sum(float(r[3]) for r in rows),
+        counted=counted,
+        note=note or None,
+        closed_by=user_id,
+    )
+    db.session.add(closing)
+    try:
+        db.session.flush()
+        db.session.add_all([
+            CashClosingLine(closing_id=closing.id, method=m, when_type=w, payments=n, amount=float(a))
+            for m, w, n, a in rows
+        ])
+        db.session.add(CashClosingEvent(day=day, closing_id=closing.id, action="fechamento",
+                                        amount=closing.total, note=note or None, user_id=user_id))
+        db.session.commit()
+    except IntegrityError:
+        # UNIQUE(day, version): another request closed the same day first (double click)
+        db.session.rollback()
+        raise CashError("O caixa deste dia já está fechado.")
+    return closing
+
+
+def reopen_day(day: date, user_id: int, note: str) -> CashClosing:
+    closing = current_closing(day)
+    if closing is None or closing.status != "fechado":
+        raise CashError("O caixa deste dia não está fechado.")
+    if not note:
+        raise CashError("Informe o motivo da reabertura.")
+    closing.status = "reaberto"
+    db.session.add(CashClosingEvent(day=day, closing_id=closing.id, action="reabertura", note=note, user_id=user_id))
+    db.session.commit()
+    return closing
+
+
+def adjust_day(day: date, user_id: int, amount: float, note: str) -> CashClosingEvent:
+    closing = current_closing(day)
+    if closing is None or closing.status != "fechado":
+        raise CashError("Ajustes só podem ser lançados em um caixa fechado.")
+    if not amount:
+        raise CashError("Informe o valor do ajuste (negativo para saída).")
+    if not note:
+        raise CashError("Informe o motivo do ajuste.")
+    entry = CashClosingEvent(day=day, closing_id=closing.id, action="ajuste", amount=amount, note=note, user_id=user_id)
+    db.session.add(entry)
+    db.session.commit()
+    return entry
+
+
+def adjustments(closing_ids) -> dict[int, float]:
+    if not closing_ids:
+        return {}
+    rows = db.session.execute(
+        select(CashClosingEvent.closing_id, func.sum(CashClosingEvent.amount))
+        .where(CashClosingEvent.closing_id.in_(closing_ids), CashClosingEvent.action == "ajuste")
+        .group_by(CashClosingEvent.closing_id)
+    )
+    return {cid: float(total or 0.0) for cid, total in rows}
+
+
+def history(first: date, last: date) -> dict:
+    """Latest closing of each day in first..last, from the stored snapshots only."""
+    latest = (
+        select(CashClosing.day, func.max(CashClosing.version).label("version"))
+        .where(CashClosing.day.between(first, last))
+        .group_by(CashClosing.day)
+        .subquery()
+    )
+    closings = (
+        CashClosing.query
+        .join(latest, (CashClosing.day == latest.c.day) & (CashClosing.version == latest.c.version))
+        .order_by(CashClosing.day.desc())
+        .all()
+    )
+    ids = [c.id for c in closings]
+    by_method = {}
+    methods = set()
+    if ids:
+        for cid, method, amount in db.session.execute(
+            select(CashClosingLine.closing_id, CashClosingLine.method, func.sum(CashClosingLine.amount))
+            .where(CashClosingLine.closing_id.in_(ids))
+            .group_by(CashClosingLine.closing_id, CashClosingLine.method)
+        ):
+            by_method.setdefault(cid, {})[method or "-"] = float(amount)
+            methods.add(method or "-")
+    adjusted = adjustments(ids)
+    rows = [
+        {"closing": c, "methods": by_method.get(c.id, {}), "adjustments": adjusted.get(c.id, 0.0)}
+        for c in closings
+    ]
+    return {
+        "rows": rows,
+        "methods": sorted(methods),
+        "total": sum(c.total for c in closings),
+        "adjustments": sum(adjusted.values()),
+    }
+
+
+def _day_arg(value) -> date:
+    day = timeutil.parse_day(value) if value else timeutil.today()
+    if day is None:
+        abort(404)
+    return day
+
+
+@cash_bp.route("/")
+@login_required
+def day_view():
+    day = _day_arg(request.args.get("day"))
+    closing = current_closing(day)
+    if closing is not None and closing.status == "fechado":
+        lines = [(ln.method, ln.when_type, ln.payments, ln.amount) for ln in closing.lines]
+    else:
+        # Open day: live preview of what closing would store
+        lines = day_breakdown(day)
+    events = (
+        CashClosingEvent.query.filter_by(day=day).order_by(CashClosingEvent.created_at.desc()).all()
+    )
+    adjusted = adjustments([closing.id]).get(closing.id, 0.0) if closing is not None else 0.0
+    by_method, by_when = {}, {}
+    for method, when_type, n, amount in lines:
+        by_method[method or "-"] = by_method.get(method or "-", 0.0) + float(amount)
+        by_when[when_type or "-"] = by_when.get(when_type or "-", 0.0) + float(amount)
+    return render_template(
+        "cash/day.html",
+        day=day,
+        today=timeutil.today(),
+        closing=closing,
+        closed=closing is not None and closing.status == "fechado",
+        lines=lines,
+        by_method=sorted(by_method.items(), key=lambda kv: -kv[1]),
+        by_when=sorted(by_when.items(), key=lambda kv: -kv[1]),
+        total=sum(float(r[3]) for r in lines),
+        payments=sum(r[2] for r in lines),
+        adjustments=adjusted,
+        events=events,
+    )
+
+
+@cash_bp.route("/close", methods=["POST"])
+@login_required
+def close():
+    day = _day_arg(request.form.get("day"))
+    counted_raw = (request.form.get("counted") or "").strip()
+    try:
+        close_day(day, current_user.id, parse_money_to_float(counted_raw) if counted_raw else None,
+                  (request.form.get("note") or "").strip())
+        flash(f"Caixa de {day:%d/%m/%Y} fechado.", "success")
+    except CashError as e:
+        db.session.rollback()
+        flash(str(e), "warning")
+    return redirect(url_for("cash.day_view", day=day.isoformat()))
+
+
+@cash_bp.route("/reopen", methods=["POST"])
+@admin_required
+def reopen():
+    day = _day_arg(request.form.get("day"))
+    try:
+        reopen_day(day, current_user.id, (request.form.get("note") or "").strip())
+        flash(f"Caixa de {day:%d/%m/%Y} reaberto.", "info")
+    except CashError as e:
+        db.session.rollback()
+        flash(str(e), "warning")
+    return redirect(url_for("cash.day_view", day=day.isoformat()))
+
+
+@cash_bp.route("/adjust", methods=["POST"])
+@admin_required
+def adjust():
+    day = _day_arg(request.form.get("day"))
+    raw = (request.form.get("amount") or "").strip()
+    negative = raw.startswith("-")
+    amount = parse_money_to_float(raw.lstrip("-")) or 0.0
+    try:
+        adjust_day(day, current_user.id, -amount if negative else amount, (request.form.get("note") or "").strip())
+        flash("Ajuste registrado.", "success")
+    except CashError as e:
+        db.session.rollback()
+        flash(str(e), "warning")
+    return redirect(url_for("cash.day_view", day=day.isoformat()))
+
+
+@cash_bp.route("/history")
+@login_required
+def history_view():
+    today = timeutil.today()
+    first = timeutil.parse_day(request.args.get("start")) or today.replace(day=1)
+    last = timeutil.parse_day(request.args.get("end")) or today
+    if last < first:
+        first, last = last, first
+    return render_template(
+        "cash/history.html",
+        data=history(first, last),
+        start=first.isoformat(),
+        end=last.isoformat(),
+    )
@@ -0,0 +1,251 @@
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+import click
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+from . import db, storage
+
+# Committed-change feed. ORM writes are collected per session and published to
+# subscribers only after the transaction commits (rolled back work is dropped),
+# so caches, counters and live views can react to writes without polling.
+# Core-level bulk statements bypass the ORM; callers report those with record().
+#
+# The feed only sees this process's commits. Flask commands (archive, reconcile,
+# seed, backup restore...) bump PRAGMA user_version of the database after they
+# commit; servers read it on a connection of their own, at most every
+# FEED_CHECK_SECONDS, before requests and from idle live streams, and publish a
+# "resync" when it moved.
+
+log = logging.getLogger(__name__)
+
+_subscribers = []
+
+# Processes that serve the pages: they watch the marker instead of bumping it
+SERVER_COMMANDS = {"serve", "run"}
+# Model name of the resync published for another process's writes
+EXTERNAL = "external"
+
+
+class Change:
+    __slots__ = ("op", "model", "pk", "values", "diff")
+
+    def __init__(self, op: str, model: str, pk, values: dict | None = None, diff: dict | None = None):
+        self.op = op  # insert, update, delete
+        self.model = model  # mapped class name, e.g. "Order"
+        self.pk = pk
+        self.values = values or {}  # column values after insert/update, before delete
+        self.diff = diff or {}  # attr -> (old, new), updates only
+
+    @property
+    def order_id(self):
+        if self.model == "Order":
+            return self.pk
+        return self.values.get("order_id")
+
+    def __repr__(self):
+        return f"<Change {self.op} {self.model}#{self.pk}>"
+
+
+def subscribe(fn):
+    """Register fn(changes: list[Change]); called once per committed transaction."""
+    if fn not in _subscribers:
+        _subscribers.append(fn)
+    return fn
+
+
+def record(session, op: str, model: str, pk=None, **values):
+    session.info.setdefault("pending_changes", []).append(Change(op, model, pk, values))
+
+
+def _column_values(obj) -> dict:
+    mapper = inspect(obj).mapper
+    return {attr.key: getattr(obj, attr.key, None) for attr in mapper.column_attrs}
+
+
+def _column_diff(obj) -> dict:
+    state = inspect(obj)
+    diff = {}
+    for attr in state.mapper.column_attrs:
+        hist = state.attrs[attr.key].history
+        if not hist.has_changes():
+            continue
+        old = hist.deleted[0] if hist.deleted else None
+        new = hist.added[0] if hist.added else None
+        if old != new:
+            diff[attr.key] = (old, new)
+    return diff
+
+
+def _pk(obj):
+    identity = inspect(obj).identity
+    if not identity:
+        return None
+    return identity[0] if len(identity) == 1 else identity
+
+
+# Mapper-level events fire for every row the flush writes, including cascaded
+# deletes and delete-orphans that never show up in session.deleted.
+
+def _pending(target):
+    session = object_session(target)
+    return None if session is None else session.info.setdefault("pending_changes", [])
+
+
+def _after_insert(mapper, _conn, target):
+    pending = _pending(target)
+    if pending is not None:
+        # The identity key is only set after the flush; the new key is on the instance
+        key = mapper.primary_key_from_instance(target)
+        pk = key[0] if len(key) == 1 else tuple(key)
+        pending.append(Change("insert", type(target).__name__, pk, _column_values(target)))
+
+
+def _after_update(_mapper, _conn, target):
+    pending = _pending(target)
+    if pending is None:
+        return
+    diff = _column_diff(target)
+    if diff:
+        pending.append(Change("update", type(target).__name__, _pk(target), _column_values(target), diff))
+
+
+def _after_delete(_mapper, _conn, target):
+    pending = _pending(target)
+    if pending is not None:
+        pending.append(Change("delete", type(target).__name__, _pk(target), _column_values(target)))
+
+
+def _publish(pending):
+    for fn in list(_subscribers):
+        try:
+            fn(pending)
+        except Exception:
+            log.exception("change subscriber %r failed", fn)
+
+
+def _after_commit(session):
+    pending = session.info.pop("pending_changes", None)
+    if pending:
+        _publish(pending)
+
+
+def _after_rollback(session):
+    session.info.pop("pending_changes", None)
+
+
+class ExternalWrites:
+    """Write marker shared between processes: PRAGMA user_version of the main database."""
+
+    def __init__(self, path: str, interval: float, busy_timeout: float):
+        self.path = path
+        self.interval = interval
+        self.busy_timeout = busy_timeout
+        self._lock = threading.Lock()
+        self._conn = None
+        self.marker = self._read() if os.path.exists(path) else None
+        self._checked = time.monotonic()
+        self._dirty = False
+        self._announced = 0.0
+
+    def _read(self) -> int:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=self.busy_timeout,
+                                         isolation_level=None, check_same_thread=False)
+        return self._conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def read(self) -> int:
+        with self._lock:
+            return self._read()
+
+    def check(self) -> bool:
+        """Publish a resync when another process wrote since the last look; True if it did."""
+        if time.monotonic() - self._checked < self.interval:
+            return False
+        with self._lock:
+            if time.monotonic() - self._checked < self.interval:
+                return False
+            self._checked = time.monotonic()
+            try:
+                marker = self._read()
+            except sqlite3.Error:
+                log.exception("reading the write marker failed")
+                return False
+            previous, self.marker = self.marker, marker
+            if previous is None or marker == previous:
+                return False
+        _publish([Change("resync", EXTERNAL, None)])
+        return True
+
+    def announce(self, after: int = 0):
+        """Move the marker (past `after` too) so that servers reload what they keep."""
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            current = conn.execute("PRAGMA user_version").fetchone()[0]
+            conn.execute(f"PRAGMA user_version = {(max(current, after) + 1) % 2 ** 31}")
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        self._dirty = False
+        self._announced = time.monotonic()
+
+    def wrote(self):
+        # At most one announcement per interval; the last one at exit
+        self._dirty = True
+        if time.monotonic() - self._announced >= self.interval:
+            self.announce()
+
+    def flush(self):
+        # Scratch databases (check-queries, bench) may be gone by then
+        if self._dirty and os.path.exists(self.path):
+            self.announce()
+
+
+def external_writes(app=None) -> ExternalWrites | None:
+    """The marker of app's database; None for databases other than a SQLite file."""
+    return (app or current_app).extensions.get("external_writes")
+
+
+def _announce(change_list):
+    # Only flask commands announce: the server processes are the ones watching
+    ctx = click.get_current_context(silent=True)
+    if ctx is None or ctx.command.name in SERVER_COMMANDS or not has_app_context():
+        return
+    watcher = external_writes()
+    if watcher is not None and not any(ch.model == EXTERNAL for ch in change_list):
+        watcher.wrote()
+
+
+def init_app(app):
+    app.config.setdefault("FEED_CHECK_SECONDS", float(os.environ.get("FEED_CHECK_SECONDS", "2")))
+    install()
+    app.extensions["external_writes"] = None
+    if not storage.is_sqlite(app):
+        return
+    with app.app_context():
+        path = db.engine.url.database
+    if not path or path == ":memory:":
+        return
+    watcher = app.extensions["external_writes"] = ExternalWrites(
+        path, app.config["FEED_CHECK_SECONDS"], app.config.get("SQLITE_BUSY_TIMEOUT_MS", 10000) / 1000.0,
+    )
+    subscribe(_announce)
+    atexit.register(watcher.flush)
+
+    @app.before_request
+    def _check_external():
+        watcher.check()
+
+
+def install():
+    if not event.contains(Session, "after_commit", _after_commit):
+        event.listen(db.Model, "after_insert", _after_insert, propagate=True)
+        event.listen(db.Model, "after_update", _after_update, propagate=True)
+        event.listen(db.Model, "after_delete", _after_delete, propagate=True)
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_rollback", _after_rollback)
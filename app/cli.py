@@ -0,0 +1,479 @@
+import logging
+import os
+import signal
+import time
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import text
+from . import db
+
+# Command-line entry points, available through `flask --app run <command>`.
+
+log = logging.getLogger(__name__)
+
+
+def register(app):
+    app.cli.add_command(serve_command)
+    app.cli.add_command(check_queries_command)
+    app.cli.add_command(seed_command)
+    app.cli.add_command(bench_command)
+    app.cli.add_command(loadtest_command)
+    app.cli.add_command(assets_group)
+    app.cli.add_command(archive_command)
+    app.cli.add_command(reconcile_command)
+    app.cli.add_command(backup_group)
+    app.cli.add_command(jobs_group)
+
+
+@click.command("serve")
+@click.option("--host", default=lambda: os.environ.get("LAVANDERIA_HOST", "127.0.0.1"), show_default="127.0.0.1",
+              help="Endereço de escuta (0.0.0.0 para aceitar outros terminais da rede).")
+@click.option("--port", default=lambda: int(os.environ.get("LAVANDERIA_PORT", "5000")), show_default="5000", type=int)
+@click.option("--threads", default=lambda: int(os.environ.get("LAVANDERIA_THREADS", "16")), show_default="16", type=int,
+              help="Número de workers (threads) atendendo requisições em paralelo.")
+@click.option("--connection-limit", default=100, show_default=True, type=int,
+              help="Máximo de conexões simultâneas aceitas.")
+@click.option("--channel-timeout", default=60, show_default=True, type=int,
+              help="Segundos até encerrar uma conexão sem atividade (requisição travada).")
+@click.option("--graceful-timeout", default=15, show_default=True, type=int,
+              help="Segundos para concluir requisições em andamento ao desligar.")
+@with_appcontext
+def serve_command(host, port, threads, connection_limit, channel_timeout, graceful_timeout):
+    """Inicia o servidor de produção (waitress, multi-thread)."""
+    try:
+        from waitress.server import create_server
+    except ImportError:
+        raise click.ClickException("waitress não instalado. Execute: pip install -r requirements.txt")
+    app = current_app._get_current_object()
+    if threads < 1:
+        raise click.BadParameter("deve ser pelo menos 1", param_hint="--threads")
+    # Every worker thread may hold one pooled SQLite connection at a time
+    pool_capacity = app.config.get("SQLITE_POOL_SIZE", 0) + app.config.get("SQLITE_POOL_MAX_OVERFLOW", 0)
+    if pool_capacity and threads > pool_capacity:
+        click.echo(
+            f"[WARN] {threads} threads para {pool_capacity} conexões no pool; "
+            "aumente SQLITE_POOL_SIZE ou reduza --threads.", err=True,
+        )
+    # Live screens (board, dashboard) hold one worker each while open
+    from . import live
+    reserved = app.config["LIVE_RESERVED_THREADS"]
+    if app.config["LIVE_STREAM_MAX"] is None:
+        app.config["LIVE_STREAM_MAX"] = live.stream_max(threads, reserved)
+    streams = app.config["LIVE_STREAM_MAX"]
+    if threads - streams < reserved:
+        click.echo(
+            f"[WARN] LIVE_STREAM_MAX={streams} deixa {max(0, threads - streams)} de {threads} threads "
+            "para as demais requisições; reduza LIVE_STREAM_MAX ou aumente --threads.", err=True,
+        )
+    server = create_server(
+        app,
+        host=host,
+        port=port,
+        threads=threads,
+        connection_limit=connection_limit,
+        channel_timeout=channel_timeout,
+        cleanup_interval=min(30, max(1, channel_timeout // 2)),
+        ident="LavanderiaOS",
+    )
+
+    def _stop(signum, _frame):
+        raise SystemExit(0)
+
+    for name in ("SIGINT", "SIGTERM", "SIGBREAK"):  # SIGBREAK: Ctrl+Break on Windows
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), _stop)
+
+    from . import scheduler
+    jobs = scheduler.start(app)
+    if jobs is not None:
+        click.echo("[INFO] Tarefas em segundo plano ativas (backup, relatórios, manutenção); histórico em /admin/jobs")
+
+    click.echo(f"[INFO] Servindo em http://{host}:{port} com {threads} threads, "
+               f"até {streams} telas ao vivo (Ctrl+C para parar)")
+    try:
+        server.run()
+    except (SystemExit, KeyboardInterrupt):
+        pass
+    finally:
+        if jobs is not None:
+            jobs.stop()
+        click.echo("[INFO] Encerrando: aguardando requisições em andamento...")
+        # Stop accepting new connections, then let in-flight requests finish
+        server.close()
+        server.task_dispatcher.shutdown(cancel_pending=False, timeout=graceful_timeout)
+        if app.extensions["audit"] is not None:
+            app.extensions["audit"].flush()
+        _close_database(app)
+        click.echo("[INFO] Servidor encerrado.")
+
+
+def _close_database(app):
+    with app.app_context():
+        try:
+            if db.engine.dialect.name == "sqlite":
+                # Fold the WAL back into the main file so a copy of the .db is complete
+                with db.engine.connect() as conn:
+                    conn.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+        except Exception:
+            log.exception("WAL checkpoint on shutdown failed")
+        db.engine.dispose()
+
+
+@click.command("check-queries")
+@click.option("--clients", default=120, show_default=True, type=int, help="Clientes gerados na base temporária.")
+@click.option("--orders", default=300, show_default=True, type=int, help="Ordens geradas na base temporária.")
+@click.option("--repeat-limit", default=None, type=int,
+              help="Máximo de execuções do mesmo formato de SQL por página (padrão: REPEAT_LIMIT).")
+def check_queries_command(clients, orders, repeat_limit):
+    """Verifica o orçamento de consultas SQL de cada página (detecta N+1)."""
+    from . import querybudget
+    limit = querybudget.REPEAT_LIMIT if repeat_limit is None else repeat_limit
+    results = querybudget.check_seeded(clients=clients, orders=orders, repeat_limit=limit)
+    failed = 0
+    for r in results:
+        mark = "OK " if r.ok else "FALHA"
+        click.echo(f"[{mark}] {r.name:<18} {r.count:>4}/{r.budget:<3} HTTP {r.status}  {r.target}")
+        for shape, n in r.repeated:
+            click.echo(f"        {n}x {shape[:160]}")
+        failed += not r.ok
+    if failed:
+        raise click.ClickException(f"{failed} rota(s) fora do orçamento de consultas")
+    click.echo(f"[INFO] {len(results)} rotas dentro do orçamento.")
+
+
+@click.command("seed")
+@click.option("--clients", default=2000, show_default=True, type=int)
+@click.option("--orders", default=20000, show_default=True, type=int)
+@click.option("--items-per-order", default=4, show_default=True, type=int, help="Média de itens por ordem.")
+@click.option("--years", default=3.0, show_default=True, type=float, help="Período coberto pelas datas geradas.")
+@click.option("--seed", "rng_seed", default=1, show_default=True, type=int, help="Semente (mesma semente, mesmos dados).")
+@click.option("--yes", is_flag=True, help="Não pedir confirmação.")
+@with_appcontext
+def seed_command(clients, orders, items_per_order, years, rng_seed, yes):
+    """Gera dados sintéticos (clientes, ordens, itens, pagamentos) no banco configurado."""
+    from .seed import seed_database
+    uri = current_app.config["SQLALCHEMY_DATABASE_URI"]
+    if not yes:
+        click.confirm(f"Inserir {orders} ordens de teste em {uri}?", abort=True)
+    started = time.perf_counter()
+    counts = seed_database(clients=clients, orders=orders, items_per_order=items_per_order,
+                           years=years, seed=rng_seed)
+    elapsed = time.perf_counter() - started
+    summary = ", ".join(f"{n} {name}" for name, n in counts.items())
+    click.echo(f"[INFO] Inseridos {summary} em {elapsed:.1f}s")
+
+
+@click.command("bench")
+@click.option("--database", type=click.Path(exists=True, dir_okay=False),
+              help="Arquivo SQLite a medir (cópia de produção). Padrão: base temporária gerada.")
+@click.option("--clients", default=2000, show_default=True, type=int, help="Clientes da base gerada.")
+@click.option("--orders", default=2000, show_default=True, type=int, help="Ordens da base gerada.")
+@click.option("--rounds", default=10, show_default=True, type=int, help="Repetições por rota.")
+@click.option("--only", multiple=True, help="Medir apenas rotas com este prefixo (repetível).")
+@click.option("--output", type=click.Path(dir_okay=False), help="Salvar o resultado em JSON.")
+@click.option("--compare", "baseline", type=click.Path(exists=True, dir_okay=False),
+              help="JSON de uma execução anterior para comparar.")
+@click.option("--tolerance", default=0.15, show_default=True, type=float,
+              help="Piora relativa de p95/memória aceita na comparação.")
+@click.option("--username", default="admin", show_default=True)
+@click.option("--password", default="admin", show_default=True)
+def bench_command(database, clients, orders, rounds, only, output, baseline, tolerance, username, password):
+    """Mede latência (p50/p95) e memória das principais rotas."""
+    import tempfile
+    from . import bench
+    from .seed import scratch_app, seed_database
+    with tempfile.TemporaryDirectory(prefix="lavanderia-bench-") as tmp:
+        if database:
+            app = scratch_app(os.path.abspath(database))
+        else:
+            app = scratch_app(os.path.join(tmp, "bench.db"))
+            with app.app_context():
+                seed_database(clients=clients, orders=orders)
+        try:
+            report = bench.run(app, rounds=rounds, only=only, username=username, password=password)
+        finally:
+            with app.app_context():
+                db.engine.dispose()
+    rows = report["meta"]["rows"]
+    click.echo(f"[INFO] {rows['orders']} ordens, {rows['items']} itens, {rows['payments']} pagamentos")
+    click.echo(f"{'rota':<24} {'p50 ms':>9} {'p95 ms':>9} {'pico KB':>10}")
+    for name, r in report["results"].items():
+        click.echo(f"{name:<24} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['peak_kb']:>10.0f}"
+                   + ("" if r["status"] == 200 else f"  HTTP {r['status']}"))
+    if output:
+        bench.save(report, output)
+        click.echo(f"[INFO] Resultado salvo em {output}")
+    if baseline:
+        regressions = 0
+        click.echo(f"\nComparação com {baseline} (p95 e pico de memória):")
+        for row in bench.compare(bench.load(baseline), report, tolerance):
+            old, new, delta = row["p95_ms"]
+            _, mem, mem_delta = row["peak_kb"]
+            mark = "PIOROU" if row["regressed"] else "ok"
+            click.echo(f"{row['name']:<24} {old:>8.1f} -> {new:>8.1f} ms ({delta:+.0%})  "
+                       f"mem {mem:.0f} KB ({mem_delta:+.0%})  {mark}")
+            regressions += row["regressed"]
+        if regressions:
+            raise click.ClickException(f"{regressions} rota(s) pioraram além de {tolerance:.0%}")
+
+
+@click.command("loadtest")
+@click.option("--url", help="Servidor em execução (ex.: http://127.0.0.1:5000). Padrão: app em processo.")
+@click.option("--database", type=click.Path(exists=True, dir_okay=False),
+              help="Em processo: arquivo SQLite a usar (uma cópia, pois recebe gravações).")
+@click.option("--clients", default=500, show_default=True, type=int, help="Em processo: clientes da base gerada.")
+@click.option("--orders", default=2000, show_default=True, type=int, help="Em processo: ordens da base gerada.")
+@click.option("--clerks", default=4, show_default=True, type=int, help="Atendentes simulados.")
+@click.option("--dashboards", default=1, show_default=True, type=int, help="Terminais atualizando o painel.")
+@click.option("--duration", default=30.0, show_default=True, type=float, help="Segundos de teste.")
+@click.option("--think-ms", default=200, show_default=True, type=int, help="Pausa média entre rotinas.")
+@click.option("--print-delay-ms", default=150, show_default=True, type=int, help="Latência da impressora falsa.")
+@click.option("--metrics-token", default=lambda: os.environ.get("METRICS_TOKEN"),
+              help="Com --url: token do /metrics para ler os erros de bloqueio.")
+@click.option("--output", type=click.Path(dir_okay=False), help="Salvar o relatório em JSON.")
+@click.option("--username", default="admin", show_default=True)
+@click.option("--password", default="admin", show_default=True)
+def loadtest_command(url, database, clients, orders, clerks, dashboards, duration, think_ms, print_delay_ms,
+                     metrics_token, output, username, password):
+    """Teste de carga com vários atendentes simultâneos (vazão, latência, bloqueios do SQLite)."""
+    import json
+    import tempfile
+    from . import loadtest, instrumentation
+    from .seed import scratch_app, seed_database
+    options = dict(clerks=clerks, dashboards=dashboards, duration=duration, think_ms=think_ms,
+                   username=username, password=password)
+    if url:
+        click.echo("[INFO] Com --url, inicie o servidor com PRINTER_BACKEND=fake para não imprimir de verdade.")
+        report = loadtest.run(lambda: loadtest.HttpSession(url),
+                              lock_errors=loadtest.http_lock_errors(url, metrics_token), **options)
+    else:
+        os.environ["PRINTER_BACKEND"] = "fake"
+        os.environ["PRINTER_FAKE_DELAY_MS"] = str(print_delay_ms)
+        with tempfile.TemporaryDirectory(prefix="lavanderia-load-") as tmp:
+            app = scratch_app(os.path.abspath(database) if database else os.path.join(tmp, "load.db"))
+            if not database:
+                with app.app_context():
+                    seed_database(clients=clients, orders=orders)
+            try:
+                report = loadtest.run(lambda: loadtest.InProcessSession(app),
+                                      lock_errors=instrumentation.lock_error_count, **options)
+            finally:
+                with app.app_context():
+                    db.engine.dispose()
+
+    click.echo(f"[INFO] {report['clerks']} atendentes + {report['dashboards']} painel(is), {report['seconds']}s: "
+               f"{report['requests']} requisições ({report['requests_per_s']}/s), "
+               f"{report['routines']} rotinas ({report['routines_per_min']}/min)")
+    click.echo(f"{'ação':<20} {'n':>6} {'erros':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'máx ms':>8}")
+    for name, a in report["actions"].items():
+        click.echo(f"{name:<20} {a['count']:>6} {a['errors']:>6} {a['p50_ms']:>8.1f} {a['p95_ms']:>8.1f} "
+                   f"{a['p99_ms']:>8.1f} {a['max_ms']:>8.1f}")
+    locks = report["lock_errors"]
+    click.echo(f"[INFO] Erros 5xx/exceções: {report['errors']}; "
+               f"'database is locked': {'indisponível' if locks is None else locks}")
+    for failure in report["failures"]:
+        click.echo(f"[WARN] {failure}", err=True)
+    if output:
+        with open(output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2, ensure_ascii=False)
+        click.echo(f"[INFO] Relatório salvo em {output}")
+
+
+@click.group("assets")
+def assets_group():
+    """Arquivos estáticos locais (CSS/JS/fontes) com hash e pré-compressão."""
+
+
+@assets_group.command("vendor")
+@click.option("--force", is_flag=True, help="Baixar novamente mesmo se o arquivo já existir.")
+@with_appcontext
+def assets_vendor_command(force):
+    """Baixa as bibliotecas (Bootstrap, ícones, Choices.js, Chart.js) para static/vendor."""
+    from . import assets
+    failed = 0
+    for path, outcome in assets.vendor(current_app.static_folder, force=force):
+        click.echo(f"{path:<52} {outcome}")
+        failed += outcome.startswith("falhou")
+    if failed:
+        raise click.ClickException(f"{failed} arquivo(s) não baixados; as páginas usarão a CDN para eles")
+
+
+@assets_group.command("build")
+@click.option("--clean", is_flag=True, help="Apagar versões anteriores em static/build.")
+@with_appcontext
+def assets_build_command(clean):
+    """Gera cópias com hash no nome e versões .gz/.br em static/build."""
+    from . import assets
+    manifest = assets.build(current_app.static_folder, clean=clean)
+    missing = [p for p, _ in assets.VENDOR if p not in manifest]
+    click.echo(f"[INFO] {len(manifest)} arquivos processados"
+               + ("" if assets.brotli else " (brotli não instalado: somente .gz)"))
+    if missing:
+        click.echo(f"[WARN] Não baixados (servidos pela CDN): {', '.join(missing)}. "
+                   "Execute: flask --app run assets vendor", err=True)
+
+
+@click.command("archive")
+@click.option("--days", type=int, default=None,
+              help="Idade mínima (dias desde a entrega) das ordens entregues e quitadas. Padrão: ARCHIVE_AFTER_DAYS.")
+@click.option("--batch-size", default=500, show_default=True, type=int, help="Ordens movidas por transação.")
+@click.option("--limit", type=int, help="Máximo de ordens nesta execução.")
+@click.option("--vacuum", is_flag=True, help="Compactar o banco principal ao final (VACUUM).")
+@click.option("--dry-run", is_flag=True, help="Apenas contar as ordens que seriam arquivadas.")
+@click.option("--yes", is_flag=True, help="Não pedir confirmação.")
+@with_appcontext
+def archive_command(days, batch_size, limit, vacuum, dry_run, yes):
+    """Move ordens antigas (entregues e quitadas) para o arquivo morto."""
+    from . import archive
+    if not archive.enabled():
+        raise click.ClickException("Arquivo morto disponível apenas para bancos SQLite em arquivo.")
+    days = current_app.config["ARCHIVE_AFTER_DAYS"] if days is None else days
+    pending = archive.eligible_count(days)
+    click.echo(f"[INFO] {pending} ordem(ns) entregues e quitadas há mais de {days} dias; "
+               f"arquivo: {current_app.extensions['archive']}")
+    if dry_run or not pending:
+        return
+    if not yes:
+        click.confirm(f"Mover {min(pending, limit or pending)} ordem(ns) para o arquivo morto?", abort=True)
+    started = time.perf_counter()
+    try:
+        counts = archive.archive_orders(days, batch_size=batch_size, limit=limit)
+    except archive.ArchiveConflict as exc:
+        raise click.ClickException(str(exc))
+    click.echo(f"[INFO] Arquivadas {counts['orders']} ordens, {counts['items']} itens, "
+               f"{counts['payments']} pagamentos em {counts['batches']} lote(s), "
+               f"{time.perf_counter() - started:.1f}s")
+    if vacuum:
+        archive.vacuum()
+        click.echo("[INFO] Banco principal compactado.")
+    totals = archive.stats()
+    click.echo(f"[INFO] Arquivo morto: {totals['orders']} ordens, {totals['items']} itens, {totals['payments']} pagamentos")
+
+
+@click.command("reconcile")
+@click.option("--start", help="Primeiro dia (AAAA-MM-DD) de criação das ordens. Padrão: todas.")
+@click.option("--end", help="Último dia (AAAA-MM-DD) de criação das ordens.")
+@click.option("--chunk-size", default=None, type=int, help="Ordens por lote (padrão: RECONCILE_CHUNK).")
+@click.option("--dry-run", is_flag=True, help="Apenas contar as ordens desatualizadas.")
+@with_appcontext
+def reconcile_command(start, end, chunk_size, dry_run):
+    """Recalcula total e situação de pagamento gravados das ordens (instruções em lote)."""
+    from . import order_service, timeutil
+    first, last = timeutil.parse_day(start), timeutil.parse_day(end)
+    if start and first is None:
+        raise click.BadParameter("use AAAA-MM-DD", param_hint="--start")
+    if end and last is None:
+        raise click.BadParameter("use AAAA-MM-DD", param_hint="--end")
+    t0 = time.perf_counter()
+    counts = order_service.reconcile_orders(
+        created=timeutil.range_bounds(first, last),
+        chunk_size=chunk_size or order_service.RECONCILE_CHUNK,
+        dry_run=dry_run,
+    )
+    if counts["first_id"] is None:
+        click.echo("[INFO] Nenhuma ordem no período.")
+        return
+    verb = "desatualizada(s)" if dry_run else "corrigida(s)"
+    click.echo(f"[INFO] Ordens #{counts['first_id']}..#{counts['last_id']}: {counts['changed']} {verb} "
+               f"em {counts['chunks']} lote(s), {time.perf_counter() - t0:.2f}s")
+
+
+@click.group("backup")
+def backup_group():
+    """Backups online do banco (API de backup do SQLite), com rotação e restauração."""
+
+
+@backup_group.command("run")
+@click.option("--dir", "dest_dir", type=click.Path(file_okay=False), help="Pasta de destino. Padrão: BACKUP_DIR.")
+@with_appcontext
+def backup_run_command(dest_dir):
+    """Gera um backup compactado e verificado agora (o servidor pode continuar no ar)."""
+    from . import backup
+    app = current_app._get_current_object()
+    results = backup.run(app, dest_dir)
+    if not results:
+        raise click.ClickException("Nenhum banco SQLite em arquivo para copiar.")
+    for meta in results:
+        click.echo(f"[INFO] {meta['file']}: {meta['bytes'] // 1024} KB -> {meta['compressed_bytes'] // 1024} KB "
+                   f"em {meta['seconds']:.1f}s ({meta['mode']}, integridade {meta['integrity']})")
+        for path in meta["removed"]:
+            click.echo(f"[INFO] Removido (rotação): {path}")
+
+
+@backup_group.command("list")
+@with_appcontext
+def backup_list_command():
+    """Lista os backups existentes."""
+    from . import backup
+    snaps = backup.list_snapshots(current_app.config["BACKUP_DIR"])
+    if not snaps:
+        click.echo("[INFO] Nenhum backup encontrado.")
+    for meta in snaps:
+        click.echo(f"{os.path.basename(meta['file']):<48} {meta['compressed_bytes'] // 1024:>8} KB  "
+                   f"{meta.get('created_at', '?')}")
+
+
+@backup_group.command("verify")
+@click.argument("snapshot", type=click.Path(exists=True, dir_okay=False))
+def backup_verify_command(snapshot):
+    """Confere sha256 e integridade de um backup."""
+    from . import backup
+    result = backup.verify(snapshot)
+    click.echo(f"[INFO] sha256: {'ok' if result['sha256_ok'] else 'DIFERENTE'}; integridade: {result['integrity']}")
+    if not result["ok"]:
+        raise click.ClickException("Backup inválido.")
+
+
+@backup_group.command("restore")
+@click.argument("snapshot", type=click.Path(exists=True, dir_okay=False))
+@click.option("--target", type=click.Path(dir_okay=False), help="Banco a sobrescrever. Padrão: o de origem do backup.")
+@click.option("--yes", is_flag=True, help="Não pedir confirmação.")
+@with_appcontext
+def backup_restore_command(snapshot, target, yes):
+    """Restaura um backup (o conteúdo atual é salvo antes)."""
+    from . import backup
+    app = current_app._get_current_object()
+    if not yes:
+        click.confirm(f"Substituir o banco pelo conteúdo de {snapshot}?", abort=True)
+    try:
+        result = backup.restore(app, snapshot, target)
+    except backup.BackupError as e:
+        raise click.ClickException(str(e))
+    if result["safety_snapshot"]:
+        click.echo(f"[INFO] Conteúdo anterior salvo em {result['safety_snapshot']}")
+    click.echo(f"[INFO] {result['target']} restaurado. Servidores em execução recarregam contadores e caches "
+               "em alguns segundos.")
+
+
+@click.group("jobs")
+def jobs_group():
+    """Tarefas em segundo plano (manutenção, backup, relatórios) e seu histórico."""
+
+
+@jobs_group.command("list")
+@with_appcontext
+def jobs_list_command():
+    """Lista as tarefas, a frequência e a última execução de cada uma."""
+    from . import scheduler
+    app = current_app._get_current_object()
+    last = scheduler.last_runs()
+    for entry in scheduler.jobs():
+        interval = entry.interval(app)
+        every = f"{interval / 60:g} min" if interval else "desativada"
+        when = last[entry.name].isoformat(sep=" ", timespec="seconds") if entry.name in last else "-"
+        click.echo(f"{entry.name:<10} {every:>12}  última: {when}  {entry.title}")
+
+
+@jobs_group.command("run")
+@click.argument("name")
+@with_appcontext
+def jobs_run_command(name):
+    """Executa uma tarefa agora (registrada no histórico como manual)."""
+    from . import scheduler
+    if scheduler.get(name) is None:
+        raise click.BadParameter(f"tarefas: {', '.join(j.name for j in scheduler.jobs())}", param_hint="NAME")
+    record = scheduler.run_job(current_app._get_current_object(), name, "manual")
+    click.echo(f"[INFO] {name}: {record['status']} em {record['seconds']:.2f}s - {record['detail']}")
+    if record["status"] != "ok":
+        raise click.ClickException(f"Tarefa {name} falhou.")
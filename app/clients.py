@@ -1,8 +1,10 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required
-from . import db
+from sqlalchemy.exc import IntegrityError
+from . import db, archive, readmodels
 from .models import Client
 from .forms import ClientForm
+from .responses import conditional
 import re
 
 clients_bp = Blueprint("clients", __name__, template_folder="templates")
@@ -10,15 +12,37 @@ clients_bp = Blueprint("clients", __name__, template_folder="templates")
 
 @clients_bp.route("/")
 @login_required
+@conditional("Client")
 def list_clients():
     q = request.args.get("q", "").strip()
-    query = Client.query
-    if q:
-        query = query.filter(Client.name.contains(q))
-    clients = query.order_by(Client.id.desc()).all()
+    clients = readmodels.client_rows(q)
     return render_template("clients/list.html", clients=clients, q=q)
 
 
+@clients_bp.route("/<int:client_id>/statement")
+@login_required
+@conditional("Order", "OrderItem", "Payment", "Client")
+def statement(client_id):
+    client = Client.query.get_or_404(client_id)
+    include_archive = request.args.get("archive") == "1" and archive.enabled()
+    rows = readmodels.order_rows(
+        readmodels.order_rows_query(client_id=client_id, include_archive=include_archive)
+    )
+    totals = {
+        "total": sum(r.grand_total for r in rows),
+        "paid": sum(r.paid for r in rows),
+        "remaining": sum(r.remaining for r in rows),
+    }
+    return render_template(
+        "clients/statement.html",
+        client=client,
+        rows=rows,
+        totals=totals,
+        archive=include_archive,
+        archive_enabled=archive.enabled(),
+    )
+
+
 @clients_bp.route("/create", methods=["GET", "POST"])
 @login_required
 def create_client():
@@ -58,7 +82,17 @@ def edit_client(client_id):
 @login_required
 def delete_client(client_id):
     client = Client.query.get_or_404(client_id)
+    if archive.client_has_orders(client_id):
+        # Archived orders keep the client id but have no foreign key to enforce it
+        flash("Cliente possui ordens arquivadas e não pode ser excluído.", "warning")
+        return redirect(url_for("clients.list_clients"))
     db.session.delete(client)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # foreign_keys=ON: clients with orders cannot be removed
+        db.session.rollback()
+        flash("Cliente possui ordens e não pode ser excluído.", "warning")
+        return redirect(url_for("clients.list_clients"))
     flash("Cliente excluído", "info")
     return redirect(url_for("clients.list_clients"))
@@ -0,0 +1,293 @@
+import os
+import threading
+from datetime import datetime, timedelta
+from flask import Blueprint, current_app, jsonify, render_template
+from flask_login import login_required
+from sqlalchemy import func
+from . import db, live, responses, timeutil
+from .models import Order, Payment, Client
+
+# Dashboard figures. The page embeds one snapshot and then stays current through
+# Server-Sent Events (live.py): a new order, payment or client becomes a small
+# delta (counters and the day's chart points) computed from the committed-change
+# feed without queries, applied in place by the open dashboards. Changes a delta
+# cannot describe (deletes, reconciliation, "paid today" when it depends on
+# earlier payments) send a "refresh" instead and the pages fetch data.json,
+# which is computed once per data version and shared by every open screen.
+# When the stream is refused (all live slots taken) the page polls data.json
+# every DASHBOARD_POLL_SECONDS instead; its ETag answers unchanged polls with
+# a 304 and no thread is held between them.
+
+dashboard_bp = Blueprint("dashboard", __name__)
+
+MODELS = ("Order", "OrderItem", "Payment", "Client")
+RECENT_ORDERS = 8
+TREND_DAYS = 7
+EMPTY_METRICS = {
+    'today_orders': 0, 'open_orders': 0, 'today_deliveries': 0,
+    'revenue_7d': 0.0, 'paid_today': 0, 'new_clients_7d': 0,
+}
+
+
+def _label(day) -> str:
+    return day.strftime('%d/%m')
+
+
+def compute() -> dict:
+    """Metrics, 7-day trends and recent orders, JSON-ready."""
+    try:
+        # Today boundaries in local Sao_Paulo (created_at is UTC-naive)
+        today = timeutil.today()
+        today_utc_start, today_utc_end = timeutil.day_bounds(today)
+        # Orders created today (created_at in UTC-naive range)
+        today_orders = (
+            db.session.query(func.count(Order.id))
+            .filter(Order.created_at >= today_utc_start, Order.created_at < today_utc_end)
+            .scalar()
+        ) or 0
+        # Open orders by payment_status
+        open_orders = (db.session.query(func.count(Order.id)).filter(Order.payment_status == 'em_aberto').scalar()) or 0
+        # Deliveries today: compare by DATE only on delivery_date
+        sd = today.strftime("%Y-%m-%d")
+        deliveries_today = (
+            db.session.query(func.count(Order.id))
+            .filter(func.date(Order.delivery_date) == sd)
+            .scalar()
+        ) or 0
+        # Revenue last 7 days based on payments created_at within local range
+        start7_utc, end7_utc = timeutil.range_bounds(today - timedelta(days=TREND_DAYS - 1), today)
+        revenue_7d = (
+            db.session.query(func.coalesce(func.sum(Payment.amount), 0.0))
+            .filter(Payment.created_at >= start7_utc, Payment.created_at < end7_utc)
+            .scalar()
+        ) or 0.0
+        # Recent orders with client name, latest first
+        recent = (
+            db.session.query(Order.id, Order.client_id, Client.name, Order.status, Order.total)
+            .outerjoin(Client, Client.id == Order.client_id)
+            .order_by(Order.id.desc()).limit(RECENT_ORDERS).all()
+        )
+        # Paid today: distinct orders that are quitado and had any payment today
+        paid_today = (
+            db.session.query(func.count(func.distinct(Payment.order_id)))
+            .join(Order, Order.id == Payment.order_id)
+            .filter(Payment.created_at >= today_utc_start, Payment.created_at < today_utc_end)
+            .filter(Order.payment_status == 'quitado')
+            .scalar()
+        ) or 0
+        # New clients in last 7 days (local)
+        new_clients_7d = (
+            db.session.query(func.count(Client.id))
+            .filter(Client.created_at >= start7_utc, Client.created_at < end7_utc)
+            .scalar()
+        ) or 0
+        # Build 7-day trends for Orders created and Revenue by payment date:
+        # one grouped query each, bucketing UTC timestamps by local calendar day
+        shift = timeutil.sqlite_day_modifier(today)
+        order_day = func.date(Order.created_at, shift)
+        orders_by_day = dict(
+            db.session.query(order_day, func.count(Order.id))
+            .filter(Order.created_at >= start7_utc, Order.created_at < end7_utc)
+            .group_by(order_day)
+            .all()
+        )
+        payment_day = func.date(Payment.created_at, shift)
+        revenue_by_day = dict(
+            db.session.query(payment_day, func.coalesce(func.sum(Payment.amount), 0.0))
+            .filter(Payment.created_at >= start7_utc, Payment.created_at < end7_utc)
+            .group_by(payment_day)
+            .all()
+        )
+        labels, orders_series, revenue_series = [], [], []
+        for i in range(TREND_DAYS - 1, -1, -1):
+            d_local = today - timedelta(days=i)
+            key = d_local.strftime('%Y-%m-%d')
+            labels.append(_label(d_local))
+            orders_series.append(int(orders_by_day.get(key) or 0))
+            revenue_series.append(float(revenue_by_day.get(key) or 0.0))
+        metrics = {
+            'today_orders': int(today_orders),
+            'open_orders': int(open_orders),
+            'today_deliveries': int(deliveries_today),
+            'revenue_7d': float(revenue_7d),
+            'paid_today': int(paid_today),
+            'new_clients_7d': int(new_clients_7d),
+        }
+        trends = {
+            'labels': labels,
+            'orders': orders_series,
+            'revenue': revenue_series,
+        }
+        recent_orders = [
+            {'id': oid, 'client_id': client_id, 'client_name': name, 'status': status, 'total': float(total or 0)}
+            for oid, client_id, name, status, total in recent
+        ]
+    except Exception:
+        metrics = dict(EMPTY_METRICS)
+        recent_orders = []
+        trends = {'labels': [], 'orders': [], 'revenue': []}
+    return {'metrics': metrics, 'trends': trends, 'recent_orders': recent_orders}
+
+
+def _local_day(value):
+    return timeutil.to_local_naive(value).date() if value else None
+
+
+def _delivery_day(value):
+    # delivery_date is a local calendar date stored naive
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+class DashboardHub(live.Hub):
+    """Committed changes as dashboard deltas, or a refresh when a delta cannot tell."""
+
+    def events(self, change_list) -> list[tuple[str, dict]]:
+        today = timeutil.today()
+        first = today - timedelta(days=TREND_DAYS - 1)
+        metrics = {}
+        trend = {'orders': {}, 'revenue': {}}
+        rows = {}  # order id -> recent-orders row (new orders and changed cells)
+        clients = {}  # client id -> new name
+        transitions = {}  # order id -> [payment_status before the commit, after]
+        paid = set()  # orders that received a payment today in this commit
+
+        def add(key, amount):
+            metrics[key] = metrics.get(key, 0) + amount
+
+        for ch in change_list:
+            if ch.op == "resync":
+                return [("refresh", {})]
+            if ch.model == "Client":
+                if ch.op == "delete":
+                    return [("refresh", {})]
+                if ch.op == "insert":
+                    created = _local_day(ch.values.get("created_at"))
+                    if created and first <= created <= today:
+                        add('new_clients_7d', 1)
+                elif "name" in ch.diff:
+                    clients[ch.pk] = ch.values.get("name")
+            elif ch.model == "Order":
+                if ch.op == "delete":
+                    # The recent list needs the next row and the counters the old values
+                    return [("refresh", {})]
+                values = ch.values
+                order_id = ch.pk
+                if ch.op == "insert":
+                    created = _local_day(values.get("created_at"))
+                    if created == today:
+                        add('today_orders', 1)
+                    if created and first <= created <= today:
+                        label = _label(created)
+                        trend['orders'][label] = trend['orders'].get(label, 0) + 1
+                    if values.get("payment_status") == 'em_aberto':
+                        add('open_orders', 1)
+                    if _delivery_day(values.get("delivery_date")) == today:
+                        add('today_deliveries', 1)
+                    transitions[order_id] = [None, values.get("payment_status")]
+                    rows[order_id] = {'id': order_id, 'client_id': values.get("client_id"), 'new': True}
+                else:
+                    if "payment_status" in ch.diff:
+                        old, new = ch.diff["payment_status"]
+                        add('open_orders', (new == 'em_aberto') - (old == 'em_aberto'))
+                        transitions.setdefault(order_id, [old, new])[1] = new
+                    if "delivery_date" in ch.diff:
+                        old, new = ch.diff["delivery_date"]
+                        add('today_deliveries', (_delivery_day(new) == today) - (_delivery_day(old) == today))
+                    if not any(key in ch.diff for key in ("status", "total", "client_id")):
+                        continue
+                    rows.setdefault(order_id, {'id': order_id, 'client_id': values.get("client_id")})
+                row = rows[order_id]
+                row['client_id'] = values.get("client_id")
+                row['client_name'] = live.client_names.get(row['client_id'])
+                row['status'] = values.get("status")
+                row['total'] = float(values.get("total") or 0)
+            elif ch.model == "Payment":
+                if ch.op != "insert":
+                    return [("refresh", {})]
+                created = _local_day(ch.values.get("created_at"))
+                amount = float(ch.values.get("amount") or 0.0)
+                if created and first <= created <= today:
+                    add('revenue_7d', amount)
+                    label = _label(created)
+                    trend['revenue'][label] = trend['revenue'].get(label, 0.0) + amount
+                if created == today:
+                    paid.add(ch.values.get("order_id"))
+
+        for order_id, (old, new) in transitions.items():
+            if old is None:
+                # Created in this commit: its only payments are the ones above
+                add('paid_today', int(new == 'quitado' and order_id in paid))
+            elif old == new or 'quitado' not in (old, new):
+                continue
+            elif new == 'quitado' and order_id in paid:
+                add('paid_today', 1)
+            else:
+                # Counted only when the order has some payment today: unknown here
+                return [("refresh", {})]
+        # A payment never settles more than the balance, so a payment without a
+        # status change leaves an open order open and paid_today as it was
+        metrics = {key: value for key, value in metrics.items() if value}
+        if not (metrics or trend['orders'] or trend['revenue'] or rows or clients):
+            return []
+        return [("delta", {
+            'day': _label(today), 'metrics': metrics, 'trend': trend,
+            'orders': list(rows.values()), 'clients': clients,
+        })]
+
+
+hub = DashboardHub()
+
+
+class _Snapshots:
+    """compute() once per data version and day, shared by every open dashboard."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.key = None
+        self.data = None
+
+    def get(self) -> dict:
+        key = (responses.versions.stamp(MODELS)[0], timeutil.today())
+        with self._lock:
+            if self.key == key:
+                return self.data
+            live.client_names.load()
+            for _attempt in range(3):
+                # A commit while computing would leave the page unsure whether
+                # its deltas are already counted: compute again
+                seq = hub.seq
+                data = compute()
+                if seq == hub.seq:
+                    break
+            data.update(seq=seq, day=_label(key[1]))
+            self.key, self.data = key, data
+            return data
+
+
+snapshots = _Snapshots()
+
+
+@responses.conditional(*MODELS, daily=True)
+def page():
+    return render_template("dashboard.html", data=snapshots.get(), recent_limit=RECENT_ORDERS,
+                           poll_seconds=current_app.config["DASHBOARD_POLL_SECONDS"])
+
+
+@dashboard_bp.route("/data.json")
+@login_required
+@responses.conditional(*MODELS, daily=True)
+def data():
+    return jsonify(snapshots.get())
+
+
+@dashboard_bp.route("/events")
+@login_required
+def events():
+    return live.event_stream(hub)
+
+
+def init_app(app):
+    app.config.setdefault("DASHBOARD_POLL_SECONDS", float(os.environ.get("DASHBOARD_POLL_SECONDS", "15")))
+    hub.subscribe()
@@ -0,0 +1,112 @@
+import os
+import threading
+from collections import OrderedDict
+from flask import current_app
+from markupsafe import Markup
+from . import changes
+
+# Fragment cache for the order list. Each <tr> is rendered once per row version
+# and kept in a bounded LRU; later listings of unchanged orders just join the
+# cached strings. A row version moves whenever the order, one of its items or
+# payments, or its client changes (committed-change feed). Per-request values
+# never enter the cache: the CSRF token is a placeholder swapped in after the
+# join, and the printer list is part of the key.
+
+ROW_TEMPLATE = "orders/_row.html"
+CSRF_PLACEHOLDER = "__csrf_token__"
+
+
+class RowVersions:
+    """Per-order and per-client change sequence numbers fed by the change feed."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.seq = 0
+        self.orders = {}
+        self.clients = {}
+        self.generation = 0
+
+    def apply(self, change_list):
+        with self._lock:
+            self.seq += 1
+            for ch in change_list:
+                if ch.op == "resync":
+                    # Set-based writes: per-row tracking is unknown, drop everything
+                    self.generation += 1
+                elif ch.model == "Client":
+                    self.clients[ch.pk] = self.seq
+                elif ch.order_id is not None:
+                    self.orders[ch.order_id] = self.seq
+
+    def key(self, order_id, client_id):
+        return (order_id, self.orders.get(order_id, 0), self.clients.get(client_id, 0), self.generation)
+
+    def changed_since(self, seq, order_id, client_id) -> bool:
+        return self.orders.get(order_id, 0) > seq or self.clients.get(client_id, 0) > seq
+
+
+versions = RowVersions()
+
+
+class LRUCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._data), "maxsize": self.maxsize,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+def render_order_rows(rows, printers, csrf_token: str, seq: int | None = None) -> Markup:
+    """HTML for the list rows; rows are readmodels.OrderRow.
+
+    seq is versions.seq read before the orders were queried: rows whose version
+    moved since then were loaded from older data and are rendered but not stored.
+    """
+    cache = current_app.extensions.get("fragments")
+    template = current_app.jinja_env.get_template(ROW_TEMPLATE)
+    printers = tuple(printers or ())
+    parts = []
+    for row in rows:
+        key = versions.key(row.id, row.client_id) + (row.archived, printers)
+        html = cache.get(key) if cache is not None else None
+        if html is None:
+            html = template.render(o=row, printers=printers, csrf_placeholder=CSRF_PLACEHOLDER)
+            if cache is not None and (seq is None or not versions.changed_since(seq, row.id, row.client_id)):
+                cache.put(key, html)
+        parts.append(html)
+    return Markup("".join(parts).replace(CSRF_PLACEHOLDER, str(Markup.escape(csrf_token))))
+
+
+def init_app(app):
+    app.config.setdefault("FRAGMENT_CACHE_SIZE", int(os.environ.get("FRAGMENT_CACHE_SIZE", "5000")))
+    app.extensions["fragments"] = LRUCache(app.config["FRAGMENT_CACHE_SIZE"])
+    changes.subscribe(versions.apply)
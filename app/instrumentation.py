@@ -0,0 +1,201 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Per-request database instrumentation. Every COMMIT that reaches SQLite is an
+# fsync plus a turn on the write lock, so handlers should need at most one.
+# Commit counting is always on (X-DB-Commits header); the profiler below, which
+# also times every SQL statement, is opt-in via PROFILING_ENABLED.
+
+log = logging.getLogger(__name__)
+slow_log = logging.getLogger("lavanderia.slow")
+
+
+def _on_commit(conn):
+    if has_request_context():
+        g.db_commits = g.get("db_commits", 0) + 1
+
+
+_lock_errors = 0
+_lock_errors_mutex = threading.Lock()
+
+
+def is_lock_error(exc) -> bool:
+    """SQLite gave up waiting for the write lock (busy_timeout expired)."""
+    msg = str(getattr(exc, "orig", exc)).lower()
+    return "database is locked" in msg or "database table is locked" in msg
+
+
+def _on_error(context):
+    global _lock_errors
+    if is_lock_error(context.original_exception):
+        with _lock_errors_mutex:
+            _lock_errors += 1
+        log.warning("SQLite lock timeout: %s", str(context.statement or "")[:120])
+
+
+def lock_error_count() -> int:
+    """Lock timeouts seen by this process since start (all requests and threads)."""
+    return _lock_errors
+
+
+# Callbacks fn(seconds) run after every timed statement (e.g. metrics histograms)
+statement_observers = []
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    for observer in statement_observers:
+        observer(elapsed)
+    if has_request_context():
+        g.db_statements = g.get("db_statements", 0) + 1
+        g.db_time = g.get("db_time", 0.0) + elapsed
+
+
+def request_elapsed() -> float | None:
+    """Seconds since the request started, when query timing is enabled."""
+    start = g.get("perf_start") if has_request_context() else None
+    return None if start is None else time.perf_counter() - start
+
+
+def enable_query_timing(app):
+    """Time every SQL statement and the request itself; shared by profiling and metrics."""
+    if app.extensions.get("query_timing"):
+        return
+    app.extensions["query_timing"] = True
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    @app.before_request
+    def _start_timer():
+        g.perf_start = time.perf_counter()
+
+
+def commit_count() -> int:
+    return g.get("db_commits", 0) if has_request_context() else 0
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+class PerfStats:
+    """Rolling per-endpoint samples of (wall ms, statements, sql ms, commits)."""
+
+    def __init__(self, window: int = 500):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._totals = {}
+        self.since = time.time()
+
+    def record(self, endpoint: str, wall_ms: float, statements: int, sql_ms: float, commits: int):
+        with self._lock:
+            samples = self._samples.get(endpoint)
+            if samples is None:
+                samples = self._samples[endpoint] = deque(maxlen=self.window)
+            samples.append((wall_ms, statements, sql_ms, commits))
+            self._totals[endpoint] = self._totals.get(endpoint, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+            self.since = time.time()
+
+    def snapshot(self) -> list[dict]:
+        with self._lock:
+            items = [(ep, list(s), self._totals.get(ep, 0)) for ep, s in self._samples.items()]
+        rows = []
+        for endpoint, samples, total in items:
+            walls = sorted(s[0] for s in samples)
+            n = len(samples)
+            rows.append({
+                'endpoint': endpoint,
+                'requests': total,
+                'window': n,
+                'p50_ms': percentile(walls, 50),
+                'p95_ms': percentile(walls, 95),
+                'p99_ms': percentile(walls, 99),
+                'max_ms': walls[-1] if walls else 0.0,
+                'avg_statements': sum(s[1] for s in samples) / n if n else 0.0,
+                'max_statements': max((s[1] for s in samples), default=0),
+                'avg_sql_ms': sum(s[2] for s in samples) / n if n else 0.0,
+                'avg_commits': sum(s[3] for s in samples) / n if n else 0.0,
+            })
+        rows.sort(key=lambda r: r['p95_ms'], reverse=True)
+        return rows
+
+
+def _configure_slow_log(app):
+    path = app.config.get("PROFILING_SLOW_LOG")
+    if not path or any(getattr(h, "_lavanderia", False) for h in slow_log.handlers):
+        return
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    handler._lavanderia = True
+    slow_log.addHandler(handler)
+    slow_log.setLevel(logging.INFO)
+
+
+def init_app(app):
+    app.config.setdefault(
+        "PROFILING_ENABLED",
+        os.environ.get("PROFILING_ENABLED", "").strip().lower() in ("1", "true", "yes", "on"),
+    )
+    app.config.setdefault("PROFILING_SLOW_MS", int(os.environ.get("PROFILING_SLOW_MS", "500")))
+    app.config.setdefault("PROFILING_WINDOW", int(os.environ.get("PROFILING_WINDOW", "500")))
+    app.config.setdefault(
+        "PROFILING_SLOW_LOG",
+        os.environ.get("PROFILING_SLOW_LOG") or os.path.join(app.instance_path, "slow_requests.log"),
+    )
+
+    if not event.contains(Engine, "commit", _on_commit):
+        event.listen(Engine, "commit", _on_commit)
+        event.listen(Engine, "handle_error", _on_error)
+
+    profiling = bool(app.config["PROFILING_ENABLED"])
+    stats = PerfStats(window=app.config["PROFILING_WINDOW"])
+    app.extensions["perf"] = stats
+    if profiling:
+        enable_query_timing(app)
+        os.makedirs(os.path.dirname(app.config["PROFILING_SLOW_LOG"]) or ".", exist_ok=True)
+        _configure_slow_log(app)
+
+    @app.after_request
+    def _report_commits(response):
+        commits = commit_count()
+        response.headers["X-DB-Commits"] = str(commits)
+        if commits > 1:
+            log.warning("%s %s issued %d commits", request.method, request.path, commits)
+        elapsed = request_elapsed()
+        if profiling and elapsed is not None:
+            wall_ms = elapsed * 1000.0
+            statements = g.get("db_statements", 0)
+            sql_ms = g.get("db_time", 0.0) * 1000.0
+            endpoint = request.endpoint or "<unmatched>"
+            stats.record(endpoint, wall_ms, statements, sql_ms, commits)
+            response.headers["Server-Timing"] = f'app;dur={wall_ms:.1f}, db;dur={sql_ms:.1f};desc="{statements} queries"'
+            if wall_ms >= app.config["PROFILING_SLOW_MS"]:
+                slow_log.info(
+                    "%s %s endpoint=%s wall_ms=%.1f sql=%d sql_ms=%.1f commits=%d status=%s",
+                    request.method, request.full_path.rstrip("?"), endpoint,
+                    wall_ms, statements, sql_ms, commits, response.status_code,
+                )
+        return response
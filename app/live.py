@@ -0,0 +1,224 @@
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from flask import Response, request, current_app
+from sqlalchemy import select
+from . import changes, db
+
+# Server-Sent Events for live pages (production board, dashboard). A Hub turns
+# committed changes (change feed) into events once, in the writing thread, and
+# fans them out from memory to every open stream, so idle screens cost no
+# queries and each change costs the same however many screens are open.
+#
+# Each open stream holds a server thread (waitress), so all hubs together keep
+# at most LIVE_STREAM_MAX streams open and close each one after
+# LIVE_STREAM_SECONDS; the browser reconnects on its own and gets the events it
+# missed (Last-Event-ID) from a short backlog, or a "reload" when they are gone.
+# Unless set, `serve` derives LIVE_STREAM_MAX from --threads, keeping
+# LIVE_RESERVED_THREADS workers for ordinary requests.
+# Writes made by other processes arrive as a "resync" (changes.ExternalWrites).
+
+BACKLOG = 500
+PING_SECONDS = 15.0
+# Streams allowed when no thread count is known (flask run, tests)
+DEFAULT_STREAM_MAX = 4
+
+_open_lock = threading.Lock()
+_open_streams = 0
+
+
+class StreamQueue(queue.Queue):
+    def __init__(self):
+        super().__init__(maxsize=256)
+
+    def clear_and_reload(self):
+        with self.mutex:
+            self.queue.clear()
+        self.put_nowait([(None, "reload", {})])
+
+
+class Hub:
+    """Numbered events with a short backlog, fanned out to the open streams.
+
+    Subclasses implement events(change_list) -> [(event, data), ...]; it runs
+    under the hub lock right after each commit, so it must not query.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.seq = 0
+        self.backlog = deque(maxlen=BACKLOG)  # (seq, event, data)
+        self.streams = set()
+
+    def events(self, change_list) -> list[tuple[str, dict]]:
+        raise NotImplementedError
+
+    def apply(self, change_list):
+        with self._lock:
+            events = self.events(change_list)
+            if not events:
+                return
+            batch = []
+            for event, data in events:
+                self.seq += 1
+                batch.append((self.seq, event, data))
+            self.backlog.extend(batch)
+            streams = list(self.streams)
+        for q in streams:
+            try:
+                q.put_nowait(batch)
+            except queue.Full:
+                # Stalled reader: it reloads instead of growing memory
+                q.clear_and_reload()
+
+    def open(self, limit: int):
+        global _open_streams
+        with _open_lock:
+            if _open_streams >= limit:
+                return None
+            _open_streams += 1
+        q = StreamQueue()
+        with self._lock:
+            self.streams.add(q)
+        return q
+
+    def close(self, q):
+        global _open_streams
+        with self._lock:
+            if q not in self.streams:
+                return
+            self.streams.discard(q)
+        with _open_lock:
+            _open_streams -= 1
+
+    def since(self, last_id: int):
+        """Events after last_id, or None when they are no longer in the backlog."""
+        with self._lock:
+            if last_id >= self.seq:
+                return []
+            if not self.backlog or self.backlog[0][0] > last_id + 1:
+                return None
+            return [entry for entry in self.backlog if entry[0] > last_id]
+
+    def subscribe(self):
+        changes.subscribe(self.apply)
+
+
+class ClientNames:
+    """Client id -> name for the events, loaded once and then kept by the feed."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.names = None
+
+    def load(self) -> dict:
+        if self.names is None:
+            from .models import Client
+            names = dict(db.session.execute(select(Client.id, Client.name)).all())
+            with self._lock:
+                if self.names is None:
+                    self.names = names
+        return self.names
+
+    def get(self, client_id):
+        return (self.names or {}).get(client_id)
+
+    def apply(self, change_list):
+        with self._lock:
+            for ch in change_list:
+                if ch.op == "resync":
+                    self.names = None
+                elif ch.model == "Client" and self.names is not None:
+                    if ch.op == "delete":
+                        self.names.pop(ch.pk, None)
+                    else:
+                        self.names[ch.pk] = ch.values.get("name")
+
+
+# Subscribed ahead of the hubs, so their events already see the new names
+client_names = ClientNames()
+
+
+def sse(event: str, data: dict, seq=None) -> str:
+    head = f"id: {seq}\n" if seq is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def _stream(hub: Hub, q, backlog, seconds: float, external=None):
+    try:
+        yield "retry: 3000\n\n"
+        sent = 0
+        if backlog is None:
+            yield sse("reload", {})
+        else:
+            for seq, event, data in backlog:
+                sent = seq
+                yield sse(event, data, seq)
+        deadline = time.monotonic() + seconds
+        while True:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                break
+            try:
+                batch = q.get(timeout=min(PING_SECONDS, left))
+            except queue.Empty:
+                # Idle screens also pick up writes made by other processes
+                if external is not None:
+                    external.check()
+                # Comment line: keeps proxies from closing the connection, detects gone clients
+                yield ": ping\n\n"
+                continue
+            # The queue was open before the backlog was read: skip what it already sent
+            yield "".join(sse(event, data, seq) for seq, event, data in batch if seq is None or seq > sent)
+    finally:
+        hub.close(q)
+
+
+class _Stream:
+    # close() also runs when the server drops a stream it never started iterating
+    def __init__(self, hub: Hub, q, backlog, seconds: float, external=None):
+        self.hub, self.q = hub, q
+        self.body = _stream(hub, q, backlog, seconds, external)
+
+    def __iter__(self):
+        return self.body
+
+    def close(self):
+        self.body.close()
+        self.hub.close(self.q)
+
+
+def event_stream(hub: Hub) -> Response:
+    """text/event-stream response for hub, resuming after Last-Event-ID (or ?since=)."""
+    config = current_app.config
+    limit = config["LIVE_STREAM_MAX"]
+    q = hub.open(DEFAULT_STREAM_MAX if limit is None else limit)
+    if q is None:
+        return Response("Muitas telas ao vivo abertas", status=503, headers={"Retry-After": "30"},
+                        mimetype="text/plain")
+    last = request.headers.get("Last-Event-ID") or request.args.get("since")
+    try:
+        backlog = hub.since(int(last)) if last else []
+    except ValueError:
+        backlog = None
+    return Response(
+        _Stream(hub, q, backlog, config["LIVE_STREAM_SECONDS"], changes.external_writes()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def stream_max(threads: int, reserved: int) -> int:
+    """Streams a server with `threads` workers can hold and still answer other requests."""
+    return max(0, threads - reserved)
+
+
+def init_app(app):
+    limit = os.environ.get("LIVE_STREAM_MAX")
+    app.config.setdefault("LIVE_STREAM_MAX", int(limit) if limit else None)
+    app.config.setdefault("LIVE_RESERVED_THREADS", int(os.environ.get("LIVE_RESERVED_THREADS", "4")))
+    app.config.setdefault("LIVE_STREAM_SECONDS", float(os.environ.get("LIVE_STREAM_SECONDS", "300")))
+    changes.subscribe(client_names.apply)
@@ -0,0 +1,230 @@
+import http.cookiejar
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter
+from .instrumentation import percentile
+
+# Multi-terminal load test. N simulated clerks loop over the counter routine
+# (open the order form, create an order, add items, take a down payment, print
+# the receipt, check the open orders list) while dashboard terminals refresh the
+# index page, either in-process through the Flask test client or over HTTP
+# against a running `flask serve`. The report gives throughput, per-action
+# latency percentiles and how often SQLite gave up on the write lock.
+
+_ORDER_ID = re.compile(r"/orders/(\d+)/items/batch")
+_CLIENT_ID = re.compile(r"/clients/(\d+)/edit")
+_SERVICE_ID = re.compile(r"/services/(\d+)/edit")
+_CSRF = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+_LOCK_METRIC = re.compile(r"^lavanderia_db_lock_errors_total (\S+)$", re.M)
+
+
+class InProcessSession:
+    def __init__(self, app):
+        self.client = app.test_client()
+        self.csrf = ""
+
+    def request(self, method: str, path: str, data=None):
+        resp = self.client.open(path, method=method, data=data)
+        return resp.status_code, resp.get_data(as_text=True)
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpSession:
+    def __init__(self, base_url: str, timeout: float = 60.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect(),
+        )
+        self.csrf = ""
+
+    def request(self, method: str, path: str, data=None):
+        body = urllib.parse.urlencode(data or {}, doseq=True).encode() if method == "POST" else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with self.opener.open(req, timeout=self.timeout) as resp:
+                return resp.status, resp.read().decode("utf-8", "replace")
+        except urllib.error.HTTPError as e:
+            return e.code, e.read().decode("utf-8", "replace")
+
+
+def login(session, username: str, password: str):
+    _, page = session.request("GET", "/login")
+    match = _CSRF.search(page)
+    session.csrf = match.group(1) if match else ""
+    status, _ = session.request("POST", "/login", {
+        "username": username, "password": password, "csrf_token": session.csrf,
+    })
+    if status != 302:
+        raise RuntimeError(f"login as {username!r} failed ({status})")
+
+
+def discover_ids(session) -> tuple[list[int], list[int]]:
+    """Client and service ids as the pages list them (works for both session kinds)."""
+    _, clients = session.request("GET", "/clients/")
+    _, services = session.request("GET", "/services/")
+    client_ids = sorted({int(x) for x in _CLIENT_ID.findall(clients)})
+    service_ids = sorted({int(x) for x in _SERVICE_ID.findall(services)})
+    if not client_ids or not service_ids:
+        raise RuntimeError("the database needs at least one client and one service")
+    return client_ids, service_ids
+
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timings = {}
+        self.errors = Counter()
+        self.statuses = Counter()
+        self.scripts = 0
+
+    def record(self, action: str, ms: float, status):
+        with self._lock:
+            self.timings.setdefault(action, []).append(ms)
+            self.statuses[str(status)] += 1
+            if not isinstance(status, int) or status >= 500:
+                self.errors[action] += 1
+
+    def script_done(self):
+        with self._lock:
+            self.scripts += 1
+
+
+def _timed(session, stats, action, method, path, data=None):
+    started = time.perf_counter()
+    try:
+        status, body = session.request(method, path, data)
+    except Exception as e:  # in-process: unhandled view errors propagate here
+        status, body = type(e).__name__, ""
+    stats.record(action, (time.perf_counter() - started) * 1000.0, status)
+    return status, body
+
+
+def clerk_routine(session, stats, rng, client_ids, service_ids):
+    csrf = {"csrf_token": session.csrf}
+    _timed(session, stats, "order_form", "GET", "/orders/create")
+    _, page = _timed(session, stats, "create_order", "POST", "/orders/create", {
+        **csrf, "client_id": rng.choice(client_ids), "status": "pendente", "notes": "",
+        "discount": "", "surcharge": "",
+    })
+    match = _ORDER_ID.search(page)
+    if not match:
+        stats.record("create_order:no_id", 0.0, "no_id")
+        return
+    order_id = int(match.group(1))
+    rows = rng.randint(1, 4)
+    _timed(session, stats, "add_items", "POST", f"/orders/{order_id}/items/batch", {
+        **csrf,
+        "service_id": [str(rng.choice(service_ids)) for _ in range(rows)],
+        "quantity": [str(rng.randint(1, 5)) for _ in range(rows)],
+        "unit_price": [""] * rows,
+        "description": [""] * rows,
+    })
+    _timed(session, stats, "add_payment", "POST", f"/orders/{order_id}/edit", {
+        **csrf, "_action": "add_payment", "amount": "5,00", "method": rng.choice(("dinheiro", "pix", "cartao")),
+        "when_type": "entrada", "note": "",
+    })
+    _timed(session, stats, "print", "POST", f"/orders/{order_id}/print", {**csrf, "printer_name": "fake"})
+    _timed(session, stats, "list_open", "GET", "/orders/?pay=em_aberto")
+
+
+def run(make_session, clerks: int = 4, dashboards: int = 1, duration: float = 30.0, think_ms: int = 200,
+        dashboard_interval: float = 5.0, username: str = "admin", password: str = "admin",
+        lock_errors=None, seed: int = 1) -> dict:
+    """Drive clerks and dashboard terminals for `duration` seconds and return the report.
+
+    make_session() builds a fresh InProcessSession/HttpSession (one per terminal);
+    lock_errors() returns the server's cumulative lock-timeout count, or None.
+    """
+    stats = Stats()
+    setup = make_session()
+    login(setup, username, password)
+    client_ids, service_ids = discover_ids(setup)
+    locks_before = lock_errors() if lock_errors else None
+    deadline = time.monotonic() + duration
+    failures = []
+
+    def clerk(n):
+        rng = random.Random(seed + n)
+        try:
+            session = make_session()
+            login(session, username, password)
+            while time.monotonic() < deadline:
+                clerk_routine(session, stats, rng, client_ids, service_ids)
+                stats.script_done()
+                if think_ms:
+                    time.sleep(rng.uniform(0.5, 1.5) * think_ms / 1000.0)
+        except Exception as e:
+            failures.append(f"clerk {n}: {e}")
+
+    def dashboard(n):
+        try:
+            session = make_session()
+            login(session, username, password)
+            while time.monotonic() < deadline:
+                _timed(session, stats, "dashboard", "GET", "/")
+                time.sleep(dashboard_interval)
+        except Exception as e:
+            failures.append(f"dashboard {n}: {e}")
+
+    threads = [threading.Thread(target=clerk, args=(n,), daemon=True) for n in range(clerks)]
+    threads += [threading.Thread(target=dashboard, args=(n,), daemon=True) for n in range(dashboards)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    locks_after = lock_errors() if lock_errors else None
+    actions = {}
+    requests = 0
+    for action, values in sorted(stats.timings.items()):
+        values.sort()
+        requests += len(values)
+        actions[action] = {
+            "count": len(values),
+            "errors": stats.errors.get(action, 0),
+            "p50_ms": round(percentile(values, 50), 1),
+            "p95_ms": round(percentile(values, 95), 1),
+            "p99_ms": round(percentile(values, 99), 1),
+            "max_ms": round(values[-1], 1) if values else 0.0,
+        }
+    return {
+        "clerks": clerks,
+        "dashboards": dashboards,
+        "seconds": round(elapsed, 1),
+        "routines": stats.scripts,
+        "requests": requests,
+        "requests_per_s": round(requests / elapsed, 1) if elapsed else 0.0,
+        "routines_per_min": round(stats.scripts * 60.0 / elapsed, 1) if elapsed else 0.0,
+        "errors": sum(stats.errors.values()),
+        "statuses": dict(stats.statuses),
+        "lock_errors": None if locks_before is None or locks_after is None else locks_after - locks_before,
+        "actions": actions,
+        "failures": failures,
+    }
+
+
+def http_lock_errors(base_url: str, token: str | None = None):
+    """Reader for the server's lavanderia_db_lock_errors_total (needs /metrics access)."""
+    def read():
+        req = urllib.request.Request(base_url.rstrip("/") + "/metrics")
+        if token:
+            req.add_header("Authorization", f"Bearer {token}")
+        try:
+            with urllib.request.urlopen(req, timeout=10) as resp:
+                match = _LOCK_METRIC.search(resp.read().decode())
+        except Exception:
+            return None
+        return int(float(match.group(1))) if match else None
+    return read
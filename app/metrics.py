@@ -0,0 +1,323 @@
+import ipaddress
+import logging
+import math
+import os
+import threading
+from datetime import datetime, timezone
+from flask import Response, request, abort, g
+from sqlalchemy import func
+from . import db, backup, changes, instrumentation, timeutil
+
+# Prometheus text-format metrics (exposition format 0.0.4), implemented in-process
+# so the shop machine needs no extra dependency. Business gauges are maintained
+# from the committed-change feed, so a scrape never touches the database.
+
+log = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+PRINT_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _num(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, doc: str, labelnames=()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, doc, labelnames=()):
+        super().__init__(name, doc, labelnames)
+        self._values = {}
+
+    def inc(self, amount: float = 1.0, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in sorted(items)]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, doc, read):
+        super().__init__(name, doc)
+        self._read = read
+
+    def render(self) -> list[str]:
+        return self.header() + [f"{self.name} {_num(self._read())}"]
+
+
+class CounterFunc(Gauge):
+    """Monotonic total maintained elsewhere and read at scrape time."""
+    kind = "counter"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, doc, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, doc, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        lines = self.header()
+        for labels, series in sorted(items):
+            for i, bound in enumerate(self.buckets):
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, ('le', _num(bound)))} {series[i]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_num(series[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+
+# ---- Business counters ------------------------------------------------------
+
+def _today_utc_bounds(now_utc: datetime | None = None):
+    day = (now_utc or datetime.now(timezone.utc)).astimezone(timeutil.LOCAL_TZ).date()
+    start, end = timeutil.day_bounds(day)
+    return day, start, end
+
+
+class BusinessCounters:
+    """Open orders and today's revenue, seeded once and then kept up to date by deltas."""
+
+    def __init__(self, app):
+        self.app = app
+        self._lock = threading.Lock()
+        self.day = None
+        self.day_start = self.day_end = None
+        self.open_orders = 0
+        self.revenue_today = 0.0
+        self.applied = 0  # commits seen by apply(); a resync racing one is redone
+
+    def resync(self):
+        day, start, end = _today_utc_bounds()
+        from .models import Order, Payment
+        for _attempt in range(3):
+            with self._lock:
+                seen = self.applied
+            with self.app.app_context():
+                open_orders = (
+                    db.session.query(func.count(Order.id)).filter(Order.payment_status == 'em_aberto').scalar()
+                ) or 0
+                revenue = (
+                    db.session.query(func.coalesce(func.sum(Payment.amount), 0.0))
+                    .filter(Payment.created_at >= start, Payment.created_at < end)
+                    .scalar()
+                ) or 0.0
+                db.session.remove()
+            with self._lock:
+                if self.applied != seen:
+                    # A commit's delta landed meanwhile and the totals may not include it
+                    continue
+                self.day, self.day_start, self.day_end = day, start, end
+                self.open_orders = int(open_orders)
+                self.revenue_today = float(revenue)
+                return
+        # Writes kept arriving: leave the day unset so the next read tries again
+
+    def _ensure_today(self):
+        if self.day != _today_utc_bounds()[0]:
+            # Local midnight passed: one query per day to restart the revenue counter
+            self.resync()
+
+    def read_open_orders(self) -> int:
+        self._ensure_today()
+        return self.open_orders
+
+    def read_revenue_today(self) -> float:
+        self._ensure_today()
+        return self.revenue_today
+
+    def _is_today(self, created_at) -> bool:
+        return bool(created_at and self.day_start and self.day_start <= created_at < self.day_end)
+
+    def apply(self, change_list):
+        with self._lock:
+            self.applied += 1
+            for ch in change_list:
+                if ch.op == "resync":
+                    # Set-based statements (reconciliation, archival) changed rows behind the ORM
+                    self.day = None
+                elif ch.model == "Order":
+                    if ch.op == "insert" and ch.values.get("payment_status") == 'em_aberto':
+                        self.open_orders += 1
+                    elif ch.op == "delete" and ch.values.get("payment_status") == 'em_aberto':
+                        self.open_orders -= 1
+                    elif ch.op == "update" and "payment_status" in ch.diff:
+                        old, new = ch.diff["payment_status"]
+                        self.open_orders += (new == 'em_aberto') - (old == 'em_aberto')
+                elif ch.model == "Payment":
+                    amount = float(ch.values.get("amount") or 0.0)
+                    if ch.op == "insert" and self._is_today(ch.values.get("created_at")):
+                        self.revenue_today += amount
+                    elif ch.op == "delete" and self._is_today(ch.values.get("created_at")):
+                        self.revenue_today -= amount
+                    elif ch.op == "update" and "amount" in ch.diff and self._is_today(ch.values.get("created_at")):
+                        old, new = ch.diff["amount"]
+                        self.revenue_today += float(new or 0.0) - float(old or 0.0)
+
+
+# ---- Registry ---------------------------------------------------------------
+
+class Registry:
+    def __init__(self):
+        self.requests = Histogram(
+            "lavanderia_request_duration_seconds", "Request latency by endpoint.",
+            ("endpoint", "method"), LATENCY_BUCKETS,
+        )
+        self.responses = Counter(
+            "lavanderia_responses_total", "Responses by endpoint and status code.", ("endpoint", "status"),
+        )
+        self.request_queries = Counter(
+            "lavanderia_db_queries_total", "SQL statements executed, by endpoint.", ("endpoint",),
+        )
+        self.request_query_seconds = Counter(
+            "lavanderia_db_query_seconds_total", "Time spent in SQL statements, by endpoint.", ("endpoint",),
+        )
+        self.query_duration = Histogram(
+            "lavanderia_db_query_duration_seconds", "Duration of individual SQL statements.", (), QUERY_BUCKETS,
+        )
+        self.commits = Counter("lavanderia_db_commits_total", "Database commits issued by requests.")
+        self.lock_errors = CounterFunc(
+            "lavanderia_db_lock_errors_total", "Statements that failed with SQLite 'database is locked'.",
+            instrumentation.lock_error_count,
+        )
+        self.print_jobs = Counter(
+            "lavanderia_print_jobs_total", "Receipt print jobs by outcome.", ("outcome",),
+        )
+        self.print_duration = Histogram(
+            "lavanderia_print_duration_seconds", "Receipt print job latency.", ("outcome",), PRINT_BUCKETS,
+        )
+        self.business = None
+        self.backup_last_success = Gauge(
+            "lavanderia_backup_last_success_timestamp_seconds", "Unix time of the last successful backup (0: none yet).",
+            backup.status.read_last_success,
+        )
+        self.backup_failures = CounterFunc(
+            "lavanderia_backup_failures_total", "Backup runs that failed.", backup.status.read_failures,
+        )
+
+    def all(self):
+        metrics = [
+            self.requests, self.responses, self.request_queries, self.request_query_seconds,
+            self.query_duration, self.commits, self.lock_errors, self.print_jobs, self.print_duration,
+            self.backup_last_success, self.backup_failures,
+        ]
+        if self.business is not None:
+            metrics.append(Gauge("lavanderia_open_orders", "Orders with payment_status em_aberto.",
+                                 self.business.read_open_orders))
+            metrics.append(Gauge("lavanderia_revenue_today", "Sum of payments created today (local day), BRL.",
+                                 self.business.read_revenue_today))
+        return metrics
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.all():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def observe_print(outcome: str, seconds: float):
+    registry.print_jobs.inc(1.0, outcome)
+    registry.print_duration.observe(seconds, outcome)
+
+
+def _is_local(addr: str | None) -> bool:
+    try:
+        return ipaddress.ip_address(addr or "").is_loopback
+    except ValueError:
+        return False
+
+
+def init_app(app):
+    app.config.setdefault(
+        "METRICS_ENABLED",
+        os.environ.get("METRICS_ENABLED", "1").strip().lower() in ("1", "true", "yes", "on"),
+    )
+    # Without a token only loopback clients may scrape (local monitoring agent)
+    app.config.setdefault("METRICS_TOKEN", os.environ.get("METRICS_TOKEN") or None)
+    if not app.config["METRICS_ENABLED"]:
+        return
+    instrumentation.enable_query_timing(app)
+    if registry.query_duration.observe not in instrumentation.statement_observers:
+        instrumentation.statement_observers.append(registry.query_duration.observe)
+
+    business = BusinessCounters(app)
+    registry.business = business
+    changes.subscribe(business.apply)
+
+    @app.after_request
+    def _observe_request(response):
+        elapsed = instrumentation.request_elapsed()
+        if elapsed is None:
+            return response
+        endpoint = request.endpoint or "<unmatched>"
+        if endpoint == "metrics":
+            return response
+        registry.requests.observe(elapsed, endpoint, request.method)
+        registry.responses.inc(1.0, endpoint, str(response.status_code))
+        registry.request_queries.inc(g.get("db_statements", 0), endpoint)
+        registry.request_query_seconds.inc(g.get("db_time", 0.0), endpoint)
+        registry.commits.inc(instrumentation.commit_count())
+        return response
+
+    def metrics_view():
+        token = app.config.get("METRICS_TOKEN")
+        if token:
+            supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+            if supplied != token:
+                abort(401)
+        elif not _is_local(request.remote_addr):
+            abort(403)
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+    app.add_url_rule("/metrics", "metrics", metrics_view)
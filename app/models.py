@@ -40,6 +40,15 @@ class Service(db.Model):
 
 
 class Order(db.Model):
+    __table_args__ = (
+        # Receivables: only open orders are indexed, by client and age
+        db.Index("ix_order_open", "client_id", "created_at", sqlite_where=db.text("payment_status = 'em_aberto'")),
+        # Production board: cards per status, oldest first
+        db.Index("ix_order_status", "status", "created_at"),
+        # Ids never go back: archived orders leave this table but keep their numbers
+        {"sqlite_autoincrement": True},
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     client_id = db.Column(db.Integer, db.ForeignKey("client.id"), nullable=False)
     status = db.Column(db.String(30), default="entrada")
@@ -52,13 +61,16 @@ class Order(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     delivery_date = db.Column(db.DateTime, nullable=True)
     payment_status = db.Column(db.String(20), default="em_aberto")  # em_aberto, quitado
+    paid = db.Column(db.Float, default=0.0)  # soma dos pagamentos, mantida com payment_status
 
     client = db.relationship("Client", backref=db.backref("orders", lazy=True))
 
 
 class OrderItem(db.Model):
+    __table_args__ = ({"sqlite_autoincrement": True},)  # see Order
+
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey("order.id"), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey("order.id"), nullable=False, index=True)
     service_id = db.Column(db.Integer, db.ForeignKey("service.id"), nullable=False)
     description = db.Column(db.String(255))
     quantity = db.Column(db.Integer, default=1)
@@ -70,12 +82,89 @@ class OrderItem(db.Model):
 
 
 class Payment(db.Model):
+    __table_args__ = ({"sqlite_autoincrement": True},)  # see Order
+
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey("order.id"), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey("order.id"), nullable=False, index=True)
     amount = db.Column(db.Float, nullable=False)
     method = db.Column(db.String(30), default="dinheiro")  # dinheiro, pix, cartao, etc.
     when_type = db.Column(db.String(20), default="retirada")  # entrada, retirada, apos
     note = db.Column(db.String(255))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     order = db.relationship("Order", backref=db.backref("payments", lazy=True, cascade="all, delete-orphan"))
+
+
+class SchedulerLock(db.Model):
+    # One row per lease; the process holding it runs the background jobs
+    name = db.Column(db.String(40), primary_key=True)
+    owner = db.Column(db.String(80), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+
+class JobRun(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    job = db.Column(db.String(40), nullable=False, index=True)
+    started_at = db.Column(db.DateTime, nullable=False, index=True)
+    seconds = db.Column(db.Float, default=0.0)
+    status = db.Column(db.String(10), nullable=False)  # ok, error
+    trigger = db.Column(db.String(10), default="agenda")  # agenda, manual
+    detail = db.Column(db.String(500))
+
+
+class CashClosing(db.Model):
+    # Frozen totals of one local day's payments; reopening and closing again adds a version
+    __table_args__ = (db.UniqueConstraint("day", "version"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    status = db.Column(db.String(20), nullable=False, default="fechado")  # fechado, reaberto
+    payments = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0.0)
+    counted = db.Column(db.Float)  # dinheiro contado na gaveta (opcional)
+    note = db.Column(db.String(255))
+    closed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    closed_by = db.Column(db.Integer, db.ForeignKey("user.id"))
+
+    lines = db.relationship("CashClosingLine", lazy=True, order_by="CashClosingLine.amount.desc()")
+    user = db.relationship("User")
+
+
+class CashClosingLine(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    closing_id = db.Column(db.Integer, db.ForeignKey("cash_closing.id"), nullable=False, index=True)
+    method = db.Column(db.String(30))
+    when_type = db.Column(db.String(20))
+    payments = db.Column(db.Integer, nullable=False)
+    amount = db.Column(db.Float, nullable=False)
+
+
+class CashClosingEvent(db.Model):
+    # Audit trail: fechamento, reabertura, ajuste (amount is the adjustment value)
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    closing_id = db.Column(db.Integer, db.ForeignKey("cash_closing.id"), nullable=False)
+    action = db.Column(db.String(20), nullable=False)
+    amount = db.Column(db.Float)
+    note = db.Column(db.String(255))
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    user = db.relationship("User")
+
+
+class AuditEntry(db.Model):
+    # Append-only journal of ORM changes (written in batches by audit.py)
+    __table_args__ = (db.Index("ix_audit_entry_object", "model", "object_id"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, nullable=False, index=True)
+    user_id = db.Column(db.Integer)  # no FK: entries outlive deleted users
+    username = db.Column(db.String(80))
+    endpoint = db.Column(db.String(80))
+    action = db.Column(db.String(10), nullable=False)  # insert, update, delete, resync
+    model = db.Column(db.String(40), nullable=False)
+    object_id = db.Column(db.Integer)
+    order_id = db.Column(db.Integer, index=True)
+    changes = db.Column(db.Text)  # JSON: {field: [old, new]} on update, the row values otherwise
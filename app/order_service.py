@@ -0,0 +1,457 @@
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import case, func, insert, literal, or_, select, update
+from . import db, changes
+from .models import Order, OrderItem, Service, Payment
+from .forms import parse_money_to_float
+
+# Order-domain operations. Each public function is one user action and runs as a
+# single unit of work: mutations are staged on the session and committed once at
+# the end; any OrderError raised on the way rolls the whole action back.
+
+# Upper bound for a single batch; intake of a big bag is typically 15-30 items
+MAX_BATCH_ITEMS = 200
+
+# Orders per reconciliation statement; each chunk is its own short write transaction
+RECONCILE_CHUNK = 20000
+
+EPSILON = 1e-6
+
+
+class OrderError(ValueError):
+    """Business rule violation; the message is shown to the user as-is."""
+
+    def __init__(self, message: str, errors: list | None = None):
+        super().__init__(message)
+        self.errors = errors or [message]
+
+
+@contextmanager
+def unit_of_work():
+    try:
+        yield db.session
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+# ---- Totals -----------------------------------------------------------------
+
+def parse_adjustment(raw):
+    """Parse a discount/surcharge field: '10%' -> (0.0, 10.0), '10,00' -> (10.0, 0.0)."""
+    raw = (raw or "").strip()
+    if raw.endswith('%'):
+        try:
+            pct = float(raw[:-1].replace(',', '.'))
+        except Exception:
+            pct = 0.0
+        return 0.0, max(0.0, min(100.0, pct))
+    return parse_money_to_float(raw) or 0.0, 0.0
+
+
+def apply_adjustments(order: Order, discount_raw=None, surcharge_raw=None):
+    # None means "field not sent": keep the stored value
+    if discount_raw is not None:
+        order.discount, order.discount_percent = parse_adjustment(discount_raw)
+    if surcharge_raw is not None:
+        order.surcharge, order.surcharge_percent = parse_adjustment(surcharge_raw)
+
+
+def breakdown(order: Order, items_total: float) -> dict:
+    d_percent = (order.discount_percent or 0.0)
+    s_percent = (order.surcharge_percent or 0.0)
+    percent_discount = (items_total * (d_percent / 100.0)) if d_percent > 0 else 0.0
+    percent_surcharge = (items_total * (s_percent / 100.0)) if s_percent > 0 else 0.0
+    fixed_discount = order.discount or 0.0
+    fixed_surcharge = order.surcharge or 0.0
+    return {
+        'items_total': items_total,
+        'fixed_discount': fixed_discount,
+        'percent_discount': percent_discount,
+        'fixed_surcharge': fixed_surcharge,
+        'percent_surcharge': percent_surcharge,
+        'grand_total': max(0.0, items_total - percent_discount - fixed_discount + fixed_surcharge + percent_surcharge),
+    }
+
+
+def grand_total(order: Order, items_total: float) -> float:
+    return breakdown(order, items_total)['grand_total']
+
+
+def items_total(order: Order) -> float:
+    return sum(i.subtotal for i in order.items)
+
+
+def paid_total(order: Order) -> float:
+    try:
+        return sum((p.amount or 0.0) for p in order.payments)
+    except Exception:
+        return 0.0
+
+
+def recalc_total(order: Order, items_sum: float | None = None):
+    if items_sum is None:
+        items_sum = items_total(order)
+    order.total = grand_total(order, items_sum)
+
+
+def sync_payment_status(order: Order, paid: float | None = None):
+    if paid is None:
+        paid = paid_total(order)
+    remaining = max(0.0, float(order.total or 0) - float(paid or 0))
+    new_status = 'quitado' if remaining <= EPSILON else 'em_aberto'
+    if getattr(order, 'payment_status', None) != new_status:
+        order.payment_status = new_status
+    if abs(float(order.paid or 0) - float(paid or 0)) > EPSILON:
+        order.paid = float(paid or 0)
+
+
+def refresh(order: Order) -> bool:
+    """Bring total and payment status in line with items/payments without committing.
+
+    Returns True when the order row was changed.
+    """
+    recalc_total(order)
+    sync_payment_status(order)
+    return db.session.is_modified(order)
+
+
+def _check_paid_within(order: Order, proposed_total: float):
+    # Regra: total pago não pode exceder o total geral
+    if paid_total(order) > proposed_total + EPSILON:
+        raise OrderError("Total pago não pode ser maior que o Total Geral da ordem.")
+
+
+# ---- Actions ----------------------------------------------------------------
+
+def create_order(client_id: int, status: str, notes: str | None,
+                 discount_raw: str = "", surcharge_raw: str = "") -> Order:
+    if not client_id or int(client_id) <= 0:
+        raise OrderError("Selecione um cliente.")
+    with unit_of_work():
+        order = Order(client_id=client_id, status=status, notes=notes)
+        apply_adjustments(order, discount_raw, surcharge_raw)
+        order.total = grand_total(order, 0.0)
+        order.payment_status = 'quitado' if order.total <= EPSILON else 'em_aberto'
+        db.session.add(order)
+    return order
+
+
+def save_order(order: Order, status: str | None, notes: str | None, delivery_raw: str | None,
+               discount_raw: str | None, surcharge_raw: str | None):
+    if len(order.items) == 0:
+        raise OrderError("Adicione pelo menos um serviço (item) à ordem antes de salvar.")
+    with unit_of_work():
+        if status:
+            order.status = status
+        if notes is not None:
+            order.notes = notes
+        # Delivery date: persist only when status is 'entregue'.
+        # - Accept both ISO (YYYY-MM-DD) and BR (DD/MM/YYYY) formats.
+        # - When status is 'entregue' and the field is empty, keep the existing date (do not clear).
+        # - When status is NOT 'entregue', always clear the date.
+        if order.status == 'entregue':
+            del_str = (delivery_raw or "").strip()
+            if del_str:
+                order.delivery_date = parse_delivery_date(del_str)
+        else:
+            order.delivery_date = None
+        apply_adjustments(order, discount_raw or "", surcharge_raw or "")
+        proposed = grand_total(order, items_total(order))
+        _check_paid_within(order, proposed)
+        order.total = proposed
+        sync_payment_status(order)
+
+
+def parse_delivery_date(value: str):
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(value, fmt)
+        except Exception:
+            continue
+    return None
+
+
+def add_item(order: Order, service_id, quantity, unit_price_raw, description) -> OrderItem:
+    try:
+        svc_id = int(service_id or 0)
+    except Exception:
+        svc_id = 0
+    service = db.session.get(Service, svc_id) if svc_id > 0 else None
+    if service is None:
+        raise OrderError("Selecione um serviço válido.")
+    try:
+        qty = max(1, int(quantity))
+    except Exception:
+        qty = 1
+    parsed = parse_money_to_float(unit_price_raw or "")
+    unit_price = parsed if (parsed is not None and parsed > 0) else service.price
+    with unit_of_work():
+        item = OrderItem(
+            order=order,
+            service_id=svc_id,
+            description=description or "",
+            quantity=qty,
+            unit_price=unit_price,
+            subtotal=qty * float(unit_price),
+        )
+        db.session.add(item)
+        recalc_total(order)
+        sync_payment_status(order)
+    return item
+
+
+def validate_item_rows(rows):
+    """Validate raw batch rows against the service catalog in a single query.
+
+    Returns (values, errors): values are ready for a bulk insert (without order_id).
+    """
+    errors = []
+    parsed = []
+    for n, row in enumerate(rows, start=1):
+        try:
+            svc_id = int(row.get("service_id") or 0)
+        except Exception:
+            svc_id = 0
+        if svc_id <= 0:
+            errors.append(f"Linha {n}: selecione um serviço válido.")
+            continue
+        try:
+            qty = int(row.get("quantity") or 1)
+        except Exception:
+            qty = 0
+        if qty < 1:
+            errors.append(f"Linha {n}: quantidade mínima é 1.")
+            continue
+        raw_price = row.get("unit_price")
+        if isinstance(raw_price, (int, float)):
+            price = float(raw_price)
+        else:
+            price = parse_money_to_float(raw_price or "")
+        if price is not None and price < 0:
+            errors.append(f"Linha {n}: preço unitário inválido.")
+            continue
+        desc = (row.get("description") or "").strip()[:255]
+        parsed.append((n, svc_id, qty, price, desc))
+    if not parsed:
+        return [], errors
+    wanted = {p[1] for p in parsed}
+    prices = dict(
+        db.session.query(Service.id, Service.price).filter(Service.id.in_(wanted)).all()
+    )
+    values = []
+    for n, svc_id, qty, price, desc in parsed:
+        if svc_id not in prices:
+            errors.append(f"Linha {n}: serviço inexistente.")
+            continue
+        unit_price = price if (price is not None and price > 0) else float(prices[svc_id] or 0)
+        values.append({
+            "service_id": svc_id,
+            "description": desc,
+            "quantity": qty,
+            "unit_price": unit_price,
+            "subtotal": qty * float(unit_price),
+        })
+    return values, errors
+
+
+def add_items(order: Order, rows) -> int:
+    if not rows:
+        raise OrderError("Nenhum item informado.")
+    if len(rows) > MAX_BATCH_ITEMS:
+        raise OrderError(f"Máximo de {MAX_BATCH_ITEMS} itens por lote.")
+    values, errors = validate_item_rows(rows)
+    if errors:
+        # All-or-nothing: a single invalid row rejects the whole batch
+        raise OrderError(" ".join(errors), errors)
+    for v in values:
+        v["order_id"] = order.id
+    with unit_of_work():
+        # One executemany for all rows, then a single aggregate for the new total
+        db.session.execute(insert(OrderItem), values)
+        changes.record(db.session, "insert", "OrderItem", None, order_id=order.id, rows=len(values), items=values)
+        items_sum = (
+            db.session.query(func.coalesce(func.sum(OrderItem.subtotal), 0.0))
+            .filter(OrderItem.order_id == order.id)
+            .scalar()
+        ) or 0.0
+        recalc_total(order, float(items_sum))
+        sync_payment_status(order)
+        # The bulk insert bypassed the relationship; reload it on next access
+        db.session.expire(order, ['items'])
+    return len(values)
+
+
+def update_item(item: OrderItem, service_id, quantity, unit_price_raw, description):
+    order = item.order
+    parsed_price = parse_money_to_float(unit_price_raw or "")
+    if parsed_price is None:
+        raise OrderError("Preço unitário inválido no item.")
+    try:
+        qty = max(1, int(quantity))
+    except Exception:
+        qty = 1
+    try:
+        svc = db.session.get(Service, int(service_id))
+    except Exception:
+        svc = None
+    with unit_of_work():
+        if svc is not None:
+            item.service_id = svc.id
+        item.description = description or ""
+        item.quantity = qty
+        item.unit_price = parsed_price
+        item.subtotal = parsed_price * qty
+        proposed = grand_total(order, items_total(order))
+        _check_paid_within(order, proposed)
+        order.total = proposed
+        sync_payment_status(order)
+
+
+def delete_item(item: OrderItem) -> Order:
+    order = item.order
+    with unit_of_work():
+        order.items.remove(item)
+        recalc_total(order)
+        sync_payment_status(order)
+    return order
+
+
+def add_payment(order: Order, amount, method: str, when_type: str, note: str | None,
+                discount_raw: str | None = None, surcharge_raw: str | None = None) -> Payment:
+    amt = parse_money_to_float(amount)
+    if not amt or amt <= 0:
+        raise OrderError("Valor de pagamento inválido.")
+    if when_type == 'entrada' and any(p.when_type == 'entrada' for p in order.payments):
+        raise OrderError("Já existe um pagamento do tipo Entrada para esta ordem.")
+    with unit_of_work():
+        # Apply any header changes (discount/surcharge) sent via hidden fields,
+        # then recalc grand total to reflect them before validating payment cap.
+        apply_adjustments(order, discount_raw or None, surcharge_raw or None)
+        recalc_total(order)
+        remaining = max(0.0, float(order.total or 0) - paid_total(order))
+        if amt - remaining > EPSILON:  # amt > remaining with small epsilon
+            raise OrderError(f"Valor excede o restante da ordem (restante: R$ {remaining:,.2f}).")
+        payment = Payment(
+            order=order,
+            amount=float(amt),
+            method=method,
+            when_type=when_type,
+            note=note or None,
+        )
+        db.session.add(payment)
+        sync_payment_status(order)
+    return payment
+
+
+def delete_payment(order: Order, payment_id) -> bool:
+    try:
+        pid = int(payment_id)
+    except Exception:
+        return False
+    pay = db.session.get(Payment, pid) if pid > 0 else None
+    if pay is None or pay.order_id != order.id:
+        return False
+    with unit_of_work():
+        order.payments.remove(pay)
+        sync_payment_status(order)
+    return True
+
+
+def delete_order(order: Order):
+    with unit_of_work():
+        db.session.delete(order)
+
+
+# ---- Set-based reconciliation ------------------------------------------------
+# Same rules as refresh(), as SQL over a range of order ids: item and payment
+# sums are grouped once per chunk and the stale rows updated with UPDATE ... FROM.
+
+def _grand_total_sql(o, items_sum):
+    d_pct, s_pct = func.coalesce(o.discount_percent, 0.0), func.coalesce(o.surcharge_percent, 0.0)
+    percent_discount = case((d_pct > 0, items_sum * (d_pct / 100.0)), else_=0.0)
+    percent_surcharge = case((s_pct > 0, items_sum * (s_pct / 100.0)), else_=0.0)
+    net = (items_sum - percent_discount - func.coalesce(o.discount, 0.0)
+           + func.coalesce(o.surcharge, 0.0) + percent_surcharge)
+    # Two-argument max() is SQLite's scalar maximum
+    return func.max(literal(0.0), net)
+
+
+def _stale_orders(lo: int, hi: int, created=(None, None)):
+    """Subquery of (id, total, payment_status, paid) recomputed for orders lo..hi whose stored values differ."""
+    o = Order.__table__.c
+    items = (
+        select(OrderItem.order_id.label("order_id"), func.sum(OrderItem.subtotal).label("amount"))
+        .where(OrderItem.order_id.between(lo, hi))
+        .group_by(OrderItem.order_id)
+        .subquery()
+    )
+    paid = (
+        select(Payment.order_id.label("order_id"), func.sum(Payment.amount).label("amount"))
+        .where(Payment.order_id.between(lo, hi))
+        .group_by(Payment.order_id)
+        .subquery()
+    )
+    grand = _grand_total_sql(o, func.coalesce(items.c.amount, 0.0))
+    paid_amount = func.coalesce(paid.c.amount, 0.0)
+    status = case(
+        (func.max(literal(0.0), grand - paid_amount) <= EPSILON, "quitado"),
+        else_="em_aberto",
+    )
+    stmt = (
+        select(o.id.label("id"), grand.label("total"), status.label("payment_status"), paid_amount.label("paid"))
+        .select_from(Order.__table__)
+        .outerjoin(items, items.c.order_id == o.id)
+        .outerjoin(paid, paid.c.order_id == o.id)
+        .where(o.id.between(lo, hi))
+        .where(or_(
+            func.abs(func.coalesce(o.total, 0.0) - grand) > EPSILON,
+            func.coalesce(o.payment_status, "") != status,
+            func.abs(func.coalesce(o.paid, 0.0) - paid_amount) > EPSILON,
+        ))
+    )
+    created_start, created_end = created
+    if created_start is not None:
+        stmt = stmt.where(o.created_at >= created_start)
+    if created_end is not None:
+        stmt = stmt.where(o.created_at < created_end)
+    return stmt.subquery()
+
+
+def reconcile_orders(created=(None, None), chunk_size: int = RECONCILE_CHUNK, dry_run: bool = False) -> dict:
+    """Fix stored total/payment_status/paid of every order (or those created in [start, end)).
+
+    Returns counts of orders scanned, changed (or that would change, with dry_run)
+    and chunks. Each chunk commits on its own, so writers wait at most one chunk.
+    """
+    o = Order.__table__.c
+    bounds = select(func.min(o.id), func.max(o.id))
+    created_start, created_end = created
+    if created_start is not None:
+        bounds = bounds.where(o.created_at >= created_start)
+    if created_end is not None:
+        bounds = bounds.where(o.created_at < created_end)
+    first, last = db.session.execute(bounds).one()
+    counts = {"changed": 0, "chunks": 0, "first_id": first, "last_id": last}
+    if first is None:
+        return counts
+    for lo in range(first, last + 1, chunk_size):
+        hi = min(lo + chunk_size - 1, last)
+        fresh = _stale_orders(lo, hi, created)
+        if dry_run:
+            counts["changed"] += db.session.execute(select(func.count()).select_from(fresh)).scalar()
+        else:
+            stmt = (
+                update(Order.__table__)
+                .where(o.id == fresh.c.id)
+                .values(total=fresh.c.total, payment_status=fresh.c.payment_status, paid=fresh.c.paid)
+            )
+            changed = db.session.execute(stmt).rowcount
+            if changed:
+                # Rows changed behind the ORM: counters and caches start over
+                changes.record(db.session, "resync", "reconcile")
+            db.session.commit()
+            counts["changed"] += changed
+        counts["chunks"] += 1
+    return counts
@@ -1,6 +1,9 @@
 import os
+import time
 import unicodedata
 from datetime import datetime
+from sqlalchemy.orm import joinedload, selectinload
+from .metrics import observe_print
 
 try:
     import win32print
@@ -69,7 +72,14 @@ def _pair_line(left: str, right: str, width: int = MAX_CHARS) -> str:
     return left + (" " * space) + right
 
 
+def _fake_backend() -> bool:
+    # PRINTER_BACKEND=fake: accept jobs without a printer (load tests, demos on Linux)
+    return os.environ.get("PRINTER_BACKEND", "").strip().lower() == "fake"
+
+
 def list_printers():
+    if _fake_backend():
+        return ["fake"]
     if not win32print:
         return []
     flags = win32print.PRINTER_ENUM_LOCAL | win32print.PRINTER_ENUM_CONNECTIONS
@@ -83,6 +93,8 @@ def get_default_printer_name():
     name = os.environ.get("PRINTER_NAME")
     if name:
         return name
+    if _fake_backend():
+        return "fake"
     # Then system default
     if win32print:
         try:
@@ -93,6 +105,10 @@ def get_default_printer_name():
 
 
 def _send_raw_to_printer(printer_name: str, data: bytes):
+    if _fake_backend():
+        # Simulate the spooler round trip of a USB thermal printer
+        time.sleep(int(os.environ.get("PRINTER_FAKE_DELAY_MS", "150")) / 1000.0)
+        return
     if not win32print:
         raise RuntimeError("win32print indisponivel. Instale pywin32.")
     hPrinter = win32print.OpenPrinter(printer_name)
@@ -108,6 +124,20 @@ def _send_raw_to_printer(printer_name: str, data: bytes):
         win32print.ClosePrinter(hPrinter)
 
 
+def load_order(order_id: int):
+    """Fetch an order with everything the receipt reads (client, items+service, payments)."""
+    from .models import Order, OrderItem
+    return (
+        Order.query.options(
+            joinedload(Order.client),
+            selectinload(Order.items).joinedload(OrderItem.service),
+            selectinload(Order.payments),
+        )
+        .filter(Order.id == order_id)
+        .first()
+    )
+
+
 def build_order_receipt_text(order) -> str:
     lines = []
     # Header
@@ -182,6 +212,16 @@ def build_order_receipt_text(order) -> str:
 
 
 def print_order_receipt(order, printer_name: str | None = None):
+    started = time.perf_counter()
+    try:
+        _print_order_receipt(order, printer_name)
+    except Exception:
+        observe_print("error", time.perf_counter() - started)
+        raise
+    observe_print("ok", time.perf_counter() - started)
+
+
+def _print_order_receipt(order, printer_name: str | None = None):
     printer_name = printer_name or get_default_printer_name()
     if not printer_name:
         available = list_printers()
@@ -0,0 +1,156 @@
+import os
+import re
+import tempfile
+from collections import Counter
+from contextlib import contextmanager
+from sqlalchemy import event, func
+
+# Query budgets. Templates walk lazy relationships (order.client, order.items,
+# item.service, order.payments), so a template tweak can silently turn one page
+# into hundreds of statements. check() seeds a scratch database, renders every
+# route and reports a failure when a route goes over its declared statement
+# budget or repeats the same statement shape too often (the N+1 signature).
+# Run by tests/test_query_budgets.py and by `flask check-queries`.
+
+# Same normalized statement more than this many times in one request = N+1
+REPEAT_LIMIT = 3
+
+# (name, statement budget, target). Targets are URL templates formatted with the
+# ids of the seeded sample (order_id, client_id) or callables taking that dict.
+# Budgets include the Flask-Login user lookup every authenticated request does.
+BUDGETS = [
+    ("dashboard", 11, "/"),
+    ("dashboard:data", 11, "/dashboard/data.json"),
+    ("orders", 3, "/orders/"),
+    ("orders:quitado", 3, "/orders/?pay=quitado"),
+    ("orders:em_aberto", 3, "/orders/?pay=em_aberto"),
+    ("orders:search", 3, "/orders/?q=silva"),
+    ("orders:created", 3, "/orders/?start=2000-01-01&end=2100-01-01"),
+    ("orders:delivery", 3, "/orders/?date_field=delivery&start=2000-01-01&end=2100-01-01"),
+    ("order_edit", 8, "/orders/{order_id}/edit"),
+    ("order_create", 3, "/orders/create"),
+    ("clients", 2, "/clients/"),
+    ("clients:search", 2, "/clients/?q=Silva"),
+    ("client_edit", 2, "/clients/{client_id}/edit"),
+    ("client_statement", 3, "/clients/{client_id}/statement?archive=1"),
+    ("services", 2, "/services/"),
+    ("users", 2, "/users/"),
+    ("audit", 2, "/admin/audit?model=Order"),
+    ("board", 4, "/board/"),
+    ("receivables", 2, "/reports/aging"),
+    ("receivables:client", 4, "/reports/aging/orders?client_id={client_id}"),
+    ("receipt", 4, lambda sample: render_receipt(sample["order_id"])),
+]
+
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACES = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Collapse literals and expanded IN lists so repeated lookups compare equal."""
+    shape = _SPACES.sub(" ", statement).strip()
+    shape = _IN_LIST.sub("(?)", shape)
+    return _NUMBER.sub("N", shape)
+
+
+class QueryLog:
+    def __init__(self):
+        self.statements = []
+
+    def __len__(self):
+        return len(self.statements)
+
+    def repeated(self, limit: int = REPEAT_LIMIT) -> list[tuple[str, int]]:
+        counts = Counter(statement_shape(s) for s in self.statements)
+        return [(shape, n) for shape, n in counts.most_common() if n > limit]
+
+
+@contextmanager
+def capture(engine):
+    """Collect every statement sent through engine while the block runs."""
+    log = QueryLog()
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        log.statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        yield log
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+
+
+class Result:
+    __slots__ = ("name", "target", "budget", "count", "status", "repeated")
+
+    def __init__(self, name, target, budget, count, status, repeated):
+        self.name = name
+        self.target = target
+        self.budget = budget
+        self.count = count
+        self.status = status
+        self.repeated = repeated
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 200 and self.count <= self.budget and not self.repeated
+
+
+def render_receipt(order_id):
+    from . import printing
+    printing.build_order_receipt_text(printing.load_order(order_id))
+    return 200
+
+
+def sample_ids(db) -> dict:
+    from .models import Order, OrderItem, Client
+    # The order with the most items (and its client) exercises the per-row paths
+    order_id = (
+        db.session.query(OrderItem.order_id)
+        .group_by(OrderItem.order_id)
+        .order_by(func.count(OrderItem.id).desc())
+        .limit(1)
+        .scalar()
+    ) or db.session.query(func.max(Order.id)).scalar()
+    client_id = db.session.query(func.max(Client.id)).scalar()
+    return {"order_id": order_id, "client_id": client_id}
+
+
+def check(app, budgets=None, repeat_limit: int = REPEAT_LIMIT, username="admin", password="admin") -> list[Result]:
+    """Render every budgeted target against app's database; app must already have data."""
+    from . import db
+    client = app.test_client()
+    resp = client.post("/login", data={"username": username, "password": password})
+    if resp.status_code != 302:
+        raise RuntimeError(f"login as {username!r} failed ({resp.status_code})")
+    with app.app_context():
+        sample = sample_ids(db)
+        engine = db.engine
+    results = []
+    for name, budget, target in budgets or BUDGETS:
+        if callable(target):
+            label = name
+            with app.test_request_context(), capture(engine) as log:
+                status = target(sample)
+        else:
+            label = target.format(**sample)
+            with capture(engine) as log:
+                status = client.get(label).status_code
+        results.append(Result(name, label, budget, len(log), status, log.repeated(repeat_limit)))
+    return results
+
+
+def check_seeded(clients: int = 120, orders: int = 300, items_per_order: int = 4, **kwargs) -> list[Result]:
+    """Build a throwaway app on a temporary SQLite file, seed it and run check()."""
+    from . import db
+    from .seed import scratch_app, seed_database
+    with tempfile.TemporaryDirectory(prefix="lavanderia-qb-") as tmp:
+        app = scratch_app(os.path.join(tmp, "budget.db"))
+        with app.app_context():
+            seed_database(clients=clients, orders=orders, items_per_order=items_per_order)
+        try:
+            return check(app, **kwargs)
+        finally:
+            with app.app_context():
+                db.engine.dispose()
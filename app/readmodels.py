@@ -0,0 +1,101 @@
+from sqlalchemy import desc, func, literal, or_, select, union_all
+from . import db, archive, order_service
+from .models import Client, Order, OrderItem, Payment, Service, User
+
+# Read models for the list pages. Lists only display a handful of columns, so
+# they are loaded with column-only SELECTs: no ORM instances, identity map or
+# change tracking. Simple lists get the result rows as they come (tuples with
+# attribute access); orders get an OrderRow with item and payment sums computed
+# by SQL instead of loading every item and payment, optionally followed by the
+# archived orders (same query over the archive tables).
+
+class OrderRow:
+    """One line of the order list: stored columns plus the figures derived from them."""
+
+    __slots__ = (
+        "id", "client_id", "client_name", "status", "total", "discount", "surcharge",
+        "discount_percent", "surcharge_percent", "created_at", "delivery_date", "payment_status",
+        "items_total", "paid", "archived", "grand_total", "remaining", "pay_status",
+    )
+
+    def __init__(self, row):
+        (self.id, self.client_id, self.client_name, self.status, self.total, self.discount,
+         self.surcharge, self.discount_percent, self.surcharge_percent, self.created_at,
+         self.delivery_date, self.payment_status, self.items_total, self.paid, self.archived) = row
+        # Same rules as order_service.refresh, applied to the sums
+        self.grand_total = order_service.grand_total(self, self.items_total)
+        self.remaining = max(0.0, self.grand_total - self.paid)
+        self.pay_status = 'quitado' if self.remaining <= order_service.EPSILON else 'em_aberto'
+
+
+def _order_select(orders, items, payments, archived: bool, q="", created=(None, None),
+                  delivery=(None, None), client_id=None):
+    o = orders.c
+    items_sum = (
+        select(func.coalesce(func.sum(items.c.subtotal), 0.0))
+        .where(items.c.order_id == o.id)
+        .scalar_subquery()
+    )
+    paid_sum = (
+        select(func.coalesce(func.sum(payments.c.amount), 0.0))
+        .where(payments.c.order_id == o.id)
+        .scalar_subquery()
+    )
+    stmt = (
+        select(
+            o.id.label("id"), o.client_id, Client.name.label("client_name"), o.status, o.total, o.discount,
+            o.surcharge, o.discount_percent, o.surcharge_percent, o.created_at,
+            o.delivery_date, o.payment_status, items_sum.label("items_total"),
+            paid_sum.label("paid"), literal(archived).label("archived"),
+        )
+        .join(Client, Client.id == o.client_id)
+    )
+    if client_id is not None:
+        stmt = stmt.where(o.client_id == client_id)
+    if q:
+        # Numeric q also matches the order number; otherwise client name (case-insensitive)
+        like = func.lower(Client.name).like(f"%{q.lower()}%")
+        stmt = stmt.where(or_(o.id == int(q), like) if q.isdigit() else like)
+    created_start, created_end = created
+    if created_start is not None:
+        stmt = stmt.where(o.created_at >= created_start)
+    if created_end is not None:
+        stmt = stmt.where(o.created_at < created_end)
+    # delivery_date has date-only semantics (naive local): compare by DATE
+    delivery_start, delivery_end = delivery
+    if delivery_start:
+        stmt = stmt.where(func.date(o.delivery_date) >= delivery_start)
+    if delivery_end:
+        stmt = stmt.where(func.date(o.delivery_date) <= delivery_end)
+    return stmt
+
+
+def order_rows_query(q: str = "", created=(None, None), delivery=(None, None), client_id=None,
+                     include_archive: bool = False):
+    filters = dict(q=q, created=created, delivery=delivery, client_id=client_id)
+    stmt = _order_select(Order.__table__, OrderItem.__table__, Payment.__table__, False, **filters)
+    if include_archive and archive.enabled():
+        cold = _order_select(archive.orders, archive.items, archive.payments, True, **filters)
+        return union_all(stmt, cold).order_by(desc("id"))
+    return stmt.order_by(Order.id.desc())
+
+
+def order_rows(stmt) -> list[OrderRow]:
+    return [OrderRow(r) for r in db.session.execute(stmt)]
+
+
+def client_rows(q: str = ""):
+    stmt = select(Client.id, Client.name, Client.phone, Client.document, Client.address)
+    if q:
+        stmt = stmt.where(Client.name.contains(q))
+    return db.session.execute(stmt.order_by(Client.id.desc())).all()
+
+
+def service_rows():
+    stmt = select(Service.id, Service.name, Service.price, Service.unit)
+    return db.session.execute(stmt.order_by(Service.id.desc())).all()
+
+
+def user_rows():
+    stmt = select(User.id, User.username, User.full_name, User.role)
+    return db.session.execute(stmt.order_by(User.id.desc())).all()
@@ -0,0 +1,256 @@
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+from . import db, archive, backup, storage
+
+# Reporting snapshot. Reports over long date ranges hold a read transaction for
+# as long as they scan, so they run against a read-only copy of the database
+# instead of the live file. The copy is taken with the SQLite backup API (same
+# stepped copy as the backups, so clerks keep writing meanwhile), every
+# REPORTING_REFRESH_MINUTES by the scheduler or on demand from the report page.
+#
+# Each refresh writes a new generation directory (main.db plus archive.db when
+# the archive exists) and then switches to it; report connections are opened per
+# request against the current generation, so a refresh never waits for a report
+# and a report never sees a half-written copy. Old generations are removed once
+# nothing has them open (Windows keeps open files from being deleted).
+
+log = logging.getLogger(__name__)
+
+META_TABLE = "reporting_meta"
+
+_builders = []
+
+
+def builder(fn):
+    """Register fn(conn, with_archive) to add derived tables (rollups) to each new copy.
+
+    conn is a writable sqlite3 connection to the new main.db, with archive.db
+    attached when present; it runs before the copy becomes current.
+    """
+    if fn not in _builders:
+        _builders.append(fn)
+    return fn
+
+
+class Snapshot:
+    """Current generation of the reporting copy (app.extensions["reporting"])."""
+
+    def __init__(self, root: str, config):
+        self.root = root
+        self.config = config
+        self._lock = threading.Lock()
+        self.current = None
+        self.taken_at = None
+        self.seconds = 0.0
+        self.last_error = None
+        self.engine = create_engine("sqlite://", creator=self._connect, poolclass=NullPool)
+        self._adopt_newest()
+
+    def _generations(self) -> list[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            os.path.join(self.root, name) for name in os.listdir(self.root)
+            if os.path.exists(os.path.join(self.root, name, "main.db"))
+        )
+
+    def _adopt_newest(self):
+        # Keep serving the copy a previous run left behind
+        for path in reversed(self._generations()):
+            try:
+                taken_at, seconds = _read_meta(os.path.join(path, "main.db"))
+            except sqlite3.Error:
+                continue
+            self.current, self.taken_at, self.seconds = path, taken_at, seconds
+            return
+
+    def _connect(self):
+        path = self.current
+        if path is None:
+            raise RuntimeError("snapshot de relatórios ainda não gerado")
+        conn = sqlite3.connect(f"file:{os.path.join(path, 'main.db')}?mode=ro", uri=True, check_same_thread=False)
+        cold = os.path.join(path, "archive.db")
+        if os.path.exists(cold):
+            conn.execute(f"ATTACH DATABASE ? AS {archive.SCHEMA}", (f"file:{cold}?mode=ro",))
+        conn.execute("PRAGMA query_only=1")
+        conn.execute(f"PRAGMA cache_size=-{int(self.config['SQLITE_CACHE_SIZE_KB'])}")
+        return conn
+
+    @property
+    def ready(self) -> bool:
+        return self.current is not None
+
+    def has_archive(self) -> bool:
+        return self.ready and os.path.exists(os.path.join(self.current, "archive.db"))
+
+    def refresh(self, sources: list[tuple[str, str]]) -> bool:
+        """Copy the sources into a new generation and switch to it; False when one is already running."""
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            started = time.perf_counter()
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            taken_at = now.replace(microsecond=0)
+            target = os.path.join(self.root, f"{now:%Y%m%d-%H%M%S-%f}")
+            os.makedirs(target)
+            try:
+                for name, src in sources:
+                    _copy(src, os.path.join(target, f"{name}.db"), self.config)
+                _build(target)
+                seconds = round(time.perf_counter() - started, 3)
+                _write_meta(os.path.join(target, "main.db"), taken_at, seconds)
+            except Exception as e:
+                shutil.rmtree(target, ignore_errors=True)
+                self.last_error = str(e)
+                raise
+            self.current, self.taken_at, self.seconds, self.last_error = target, taken_at, seconds, None
+            self._prune()
+            return True
+        finally:
+            self._lock.release()
+
+    def _prune(self):
+        for path in self._generations():
+            if path != self.current:
+                # Still open by a running report on Windows: retried on the next refresh
+                shutil.rmtree(path, ignore_errors=True)
+
+    @property
+    def refreshing(self) -> bool:
+        return self._lock.locked()
+
+
+def _copy(src: str, dest: str, config):
+    backup.copy_database(
+        src, dest, pages=config["BACKUP_STEP_PAGES"], sleep=config["BACKUP_STEP_SLEEP_MS"] / 1000.0,
+        busy_timeout=config["SQLITE_BUSY_TIMEOUT_MS"] / 1000.0,
+    )
+    conn = sqlite3.connect(dest)
+    try:
+        # Rollback journal: a WAL file cannot be opened read-only without its -shm
+        conn.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        conn.close()
+
+
+def _build(target: str):
+    if not _builders:
+        return
+    conn = sqlite3.connect(os.path.join(target, "main.db"))
+    try:
+        cold = os.path.join(target, "archive.db")
+        with_archive = os.path.exists(cold)
+        if with_archive:
+            conn.execute(f"ATTACH DATABASE ? AS {archive.SCHEMA}", (cold,))
+        for fn in _builders:
+            fn(conn, with_archive)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _write_meta(path: str, taken_at: datetime, seconds: float):
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute(f"CREATE TABLE {META_TABLE} (taken_at TEXT NOT NULL, seconds REAL NOT NULL)")
+        conn.execute(f"INSERT INTO {META_TABLE} VALUES (?, ?)", (taken_at.isoformat(sep=" "), seconds))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _read_meta(path: str) -> tuple[datetime, float]:
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        taken_at, seconds = conn.execute(f"SELECT taken_at, seconds FROM {META_TABLE}").fetchone()
+    finally:
+        conn.close()
+    return datetime.fromisoformat(taken_at), seconds
+
+
+def _sources(app) -> list[tuple[str, str]]:
+    found = backup.sources(app)
+    return [("main" if i == 0 else "archive", path) for i, (_label, path) in enumerate(found)]
+
+
+def snapshot(app) -> Snapshot | None:
+    return app.extensions.get("reporting")
+
+
+def refresh(app) -> bool:
+    snap = snapshot(app)
+    if snap is None:
+        return False
+    return snap.refresh(_sources(app))
+
+
+def ensure(app):
+    """First report of a fresh install: build the copy instead of failing."""
+    snap = snapshot(app)
+    if snap is not None and not snap.ready:
+        try:
+            refresh(app)
+        except Exception:
+            log.exception("reporting snapshot failed")
+
+
+@contextmanager
+def connection(app):
+    """Connection for report queries: the snapshot when available, the live database otherwise."""
+    snap = snapshot(app)
+    if snap is not None and snap.ready:
+        with snap.engine.connect() as conn:
+            yield conn
+    else:
+        yield db.session.connection()
+
+
+def freshness(app) -> dict:
+    snap = snapshot(app)
+    if snap is None or not snap.ready:
+        return {"live": True, "taken_at": None, "age_minutes": None, "refreshing": False,
+                "error": snap.last_error if snap else None}
+    age = datetime.now(timezone.utc).replace(tzinfo=None) - snap.taken_at
+    return {
+        "live": False,
+        "taken_at": snap.taken_at,
+        "age_minutes": int(age.total_seconds() // 60),
+        "seconds": snap.seconds,
+        "refreshing": snap.refreshing,
+        "error": snap.last_error,
+        "has_archive": snap.has_archive(),
+    }
+
+
+def generation(app) -> str | None:
+    """Name of the copy reports currently read; changes on every refresh."""
+    snap = snapshot(app)
+    return os.path.basename(snap.current) if snap is not None and snap.ready else None
+
+
+def has_archive(app) -> bool:
+    snap = snapshot(app)
+    if snap is not None and snap.ready:
+        return snap.has_archive()
+    return archive.enabled(app)
+
+
+def init_app(app):
+    app.config.setdefault("REPORTING_SNAPSHOT", os.environ.get("REPORTING_SNAPSHOT", "1") not in ("0", "false", "no"))
+    app.config.setdefault("REPORTING_DIR", os.environ.get("REPORTING_DIR"))
+    app.config.setdefault("REPORTING_REFRESH_MINUTES", float(os.environ.get("REPORTING_REFRESH_MINUTES", "15")))
+    app.extensions["reporting"] = None
+    found = backup.sources(app) if app.config["REPORTING_SNAPSHOT"] and storage.is_sqlite(app) else []
+    if not found:
+        return
+    # Next to the main database (lavanderia.db -> lavanderia-reporting/)
+    root = app.config["REPORTING_DIR"] or os.path.splitext(found[0][1])[0] + "-reporting"
+    app.extensions["reporting"] = Snapshot(root, app.config)
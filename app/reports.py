@@ -0,0 +1,349 @@
+import csv
+import io
+from datetime import datetime, timedelta
+from flask import Blueprint, Response, render_template, redirect, url_for, flash, request, current_app
+from flask_login import login_required
+from sqlalchemy import case, func, literal, select, union_all
+from . import db, analytics, archive, reporting, timeutil
+from .models import Client, Order, Payment
+from .order_service import EPSILON
+
+# Period reports. Queries run on the reporting snapshot (see reporting.py), never
+# on the live database, and include archived orders when the archive exists.
+# Timestamps are grouped by UTC hour in SQL and the hours folded into local days
+# here, which stays exact across past daylight-saving changes.
+#
+# The receivables (aging) report is the exception: open balances must reflect a
+# payment taken a minute ago, so it reads the live database. It only touches
+# open orders (partial index ix_order_open) and the maintained order.paid
+# column, never the items or payments.
+
+reports_bp = Blueprint("reports", __name__, template_folder="templates")
+
+DEFAULT_DAYS = 30
+
+# (label, min age, max age) in local days since the order was opened
+AGING_BUCKETS = (
+    ("0–7 dias", 0, 7),
+    ("8–30 dias", 8, 30),
+    ("31–90 dias", 31, 90),
+    ("mais de 90 dias", 91, None),
+)
+AGING_PAGE_SIZE = 200
+
+
+def _hourly(ts, *columns):
+    return func.strftime("%Y-%m-%d %H:00:00", ts).label("hour"), *columns
+
+
+def _grouped(conn, hot, cold, ts_name, columns, start, end):
+    """Rows of (hour, *aggregates) over the hot table and, when attached, its archive copy."""
+    parts = []
+    for table in (hot, cold) if cold is not None else (hot,):
+        ts = table.c[ts_name]
+        parts.append(
+            select(*_hourly(ts, *columns(table)))
+            .where(ts >= start, ts < end)
+            .group_by("hour")
+        )
+    stmt = parts[0] if len(parts) == 1 else union_all(*parts)
+    return conn.execute(stmt).all()
+
+
+def _local_day(hour: str):
+    return timeutil.to_local_naive(datetime.fromisoformat(hour)).date()
+
+
+def movement(conn, first, last, with_archive: bool) -> dict:
+    """Orders opened and payments received per local day between first and last."""
+    start, end = timeutil.range_bounds(first, last)
+    orders_cold = archive.orders if with_archive else None
+    payments_cold = archive.payments if with_archive else None
+    days = {}
+    for i in range((last - first).days + 1):
+        day = first + timedelta(days=i)
+        days[day] = {"day": day, "orders": 0, "orders_total": 0.0, "payments": 0, "received": 0.0}
+    for hour, count, total in _grouped(
+        conn, Order.__table__, orders_cold, "created_at",
+        lambda t: (func.count(), func.coalesce(func.sum(t.c.total), 0.0)), start, end,
+    ):
+        row = days[_local_day(hour)]
+        row["orders"] += count
+        row["orders_total"] += float(total)
+    methods = {}
+    for hour, method, count, amount in _grouped(
+        conn, Payment.__table__, payments_cold, "created_at",
+        lambda t: (t.c.method, func.count(), func.coalesce(func.sum(t.c.amount), 0.0)), start, end,
+    ):
+        row = days[_local_day(hour)]
+        row["payments"] += count
+        row["received"] += float(amount)
+        methods[method or "-"] = methods.get(method or "-", 0.0) + float(amount)
+    rows = list(days.values())
+    totals = {
+        key: sum(r[key] for r in rows) for key in ("orders", "orders_total", "payments", "received")
+    }
+    return {"rows": rows, "totals": totals, "methods": sorted(methods.items(), key=lambda kv: -kv[1])}
+
+
+def _balance(o):
+    return func.max(literal(0.0), func.coalesce(o.total, 0.0) - func.coalesce(o.paid, 0.0))
+
+
+def _age_bucket(ts, today):
+    """SQL index into AGING_BUCKETS for a UTC created_at, by local day."""
+    whens = [
+        (ts >= timeutil.day_bounds(today - timedelta(days=max_age))[0], i)
+        for i, (_label, _min_age, max_age) in enumerate(AGING_BUCKETS) if max_age is not None
+    ]
+    return case(*whens, else_=len(AGING_BUCKETS) - 1)
+
+
+def _open_orders(o):
+    return select().select_from(Order.__table__).where(o.payment_status == "em_aberto", _balance(o) > EPSILON)
+
+
+def aging(today) -> dict:
+    """Open balances per client, split by age buckets."""
+    o = Order.__table__.c
+    bucket = _age_bucket(o.created_at, today).label("bucket")
+    grouped = (
+        _open_orders(o)
+        .add_columns(o.client_id, bucket, func.count().label("orders"), func.sum(_balance(o)).label("balance"))
+        .group_by(o.client_id, bucket)
+        .subquery()
+    )
+    rows = db.session.execute(
+        select(grouped.c.client_id, Client.name, grouped.c.bucket, grouped.c.orders, grouped.c.balance)
+        .join(Client, Client.id == grouped.c.client_id)
+    ).all()
+    clients = {}
+    totals = [0.0] * len(AGING_BUCKETS)
+    counts = [0] * len(AGING_BUCKETS)
+    for client_id, name, b, n, balance in rows:
+        entry = clients.setdefault(client_id, {
+            "client_id": client_id, "name": name, "orders": 0, "total": 0.0,
+            "buckets": [0.0] * len(AGING_BUCKETS),
+        })
+        entry["orders"] += n
+        entry["total"] += float(balance)
+        entry["buckets"][b] += float(balance)
+        totals[b] += float(balance)
+        counts[b] += n
+    return {
+        "clients": sorted(clients.values(), key=lambda c: -c["total"]),
+        "buckets": [
+            {"index": i, "label": label, "orders": counts[i], "balance": totals[i]}
+            for i, (label, _min_age, _max_age) in enumerate(AGING_BUCKETS)
+        ],
+        "total": sum(totals),
+        "orders": sum(counts),
+    }
+
+
+def _aging_cell(stmt, o, today, client_id=None, bucket=None):
+    if client_id is not None:
+        stmt = stmt.where(o.client_id == client_id)
+    if bucket is not None:
+        _label, min_age, max_age = AGING_BUCKETS[bucket]
+        stmt = stmt.where(o.created_at < timeutil.day_bounds(today - timedelta(days=min_age))[1])
+        if max_age is not None:
+            stmt = stmt.where(o.created_at >= timeutil.day_bounds(today - timedelta(days=max_age))[0])
+    return stmt
+
+
+def aging_count(today, client_id=None, bucket=None) -> tuple[int, float]:
+    """(orders, open balance) of one cell of the aging report."""
+    o = Order.__table__.c
+    stmt = _open_orders(o).add_columns(func.count(), func.coalesce(func.sum(_balance(o)), 0.0))
+    count, balance = db.session.execute(_aging_cell(stmt, o, today, client_id, bucket)).one()
+    return count, float(balance)
+
+
+def aging_orders(today, client_id=None, bucket=None, limit=None, offset=0) -> list[dict]:
+    """Open orders behind one cell of the aging report (any client / any age when None), oldest first."""
+    o = Order.__table__.c
+    stmt = (
+        _open_orders(o)
+        .add_columns(o.id, o.client_id, Client.name, o.status, o.created_at, o.total, o.paid, _balance(o))
+        .join(Client, Client.id == o.client_id)
+        .order_by(o.created_at, o.id)
+    )
+    stmt = _aging_cell(stmt, o, today, client_id, bucket)
+    if limit is not None:
+        stmt = stmt.limit(limit).offset(offset)
+    rows = db.session.execute(stmt).all()
+    local = timeutil.localize_many(r[4] for r in rows)
+    return [
+        {"id": oid, "client_id": cid, "client_name": name, "status": status, "created_at": created,
+         "age": (today - opened.date()).days if opened else None, "total": float(total or 0),
+         "paid": float(paid or 0), "balance": float(balance)}
+        for (oid, cid, name, status, created, total, paid, balance), opened in zip(rows, local)
+    ]
+
+
+def _money(value) -> str:
+    return f"{value:.2f}".replace(".", ",")
+
+
+def _csv(name: str, header: list, rows) -> Response:
+    out = io.StringIO()
+    # Semicolons and decimal commas: opens directly in a pt-BR spreadsheet
+    writer = csv.writer(out, delimiter=";")
+    writer.writerow(header)
+    writer.writerows(rows)
+    return Response(
+        "\ufeff" + out.getvalue(),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={name}"},
+    )
+
+
+def _int_arg(name: str, limit: int | None = None):
+    value = request.args.get(name, type=int)
+    if value is None or value < 0 or (limit is not None and value >= limit):
+        return None
+    return value
+
+
+def _period():
+    today = timeutil.today()
+    first = timeutil.parse_day(request.args.get("start")) or today - timedelta(days=DEFAULT_DAYS - 1)
+    last = timeutil.parse_day(request.args.get("end")) or today
+    if last < first:
+        first, last = last, first
+    return first, last
+
+
+@reports_bp.route("/")
+@login_required
+def movement_report():
+    app = current_app._get_current_object()
+    reporting.ensure(app)
+    first, last = _period()
+    with reporting.connection(app) as conn:
+        data = movement(conn, first, last, reporting.has_archive(app))
+    return render_template(
+        "reports/movement.html",
+        data=data,
+        start=first.isoformat(),
+        end=last.isoformat(),
+        freshness=reporting.freshness(app),
+    )
+
+
+@reports_bp.route("/analytics")
+@login_required
+def analytics_report():
+    app = current_app._get_current_object()
+    reporting.ensure(app)
+    first, last = _period()
+    return render_template(
+        "reports/analytics.html",
+        orders=analytics.report(app, "orders", first, last),
+        payments=analytics.report(app, "payments", first, last),
+        services=analytics.report(app, "services", first, last),
+        start=first.isoformat(),
+        end=last.isoformat(),
+        freshness=reporting.freshness(app),
+    )
+
+
+@reports_bp.route("/movement.csv")
+@login_required
+def movement_csv():
+    app = current_app._get_current_object()
+    reporting.ensure(app)
+    first, last = _period()
+    with reporting.connection(app) as conn:
+        data = movement(conn, first, last, reporting.has_archive(app))
+    return _csv(
+        f"movimento-{first:%Y%m%d}-{last:%Y%m%d}.csv",
+        ["dia", "ordens", "valor_ordens", "pagamentos", "recebido"],
+        ([r["day"].strftime("%d/%m/%Y"), r["orders"], _money(r["orders_total"]), r["payments"], _money(r["received"])]
+         for r in data["rows"]),
+    )
+
+
+@reports_bp.route("/aging")
+@login_required
+def aging_report():
+    first, last = _period()
+    return render_template(
+        "reports/aging.html",
+        data=aging(timeutil.today()),
+        start=first.isoformat(),
+        end=last.isoformat(),
+    )
+
+
+@reports_bp.route("/aging/orders")
+@login_required
+def aging_detail():
+    first, last = _period()
+    client_id = _int_arg("client_id")
+    bucket = _int_arg("bucket", len(AGING_BUCKETS))
+    today = timeutil.today()
+    client = db.session.get(Client, client_id) if client_id is not None else None
+    count, balance = aging_count(today, client_id, bucket)
+    pages = max(1, -(-count // AGING_PAGE_SIZE))
+    page = min(max(1, request.args.get("page", 1, type=int)), pages)
+    return render_template(
+        "reports/aging_orders.html",
+        rows=aging_orders(today, client_id, bucket, AGING_PAGE_SIZE, (page - 1) * AGING_PAGE_SIZE),
+        count=count,
+        total=balance,
+        page=page,
+        pages=pages,
+        client=client,
+        client_id=client_id,
+        bucket=bucket,
+        bucket_label=AGING_BUCKETS[bucket][0] if bucket is not None else None,
+        start=first.isoformat(),
+        end=last.isoformat(),
+    )
+
+
+@reports_bp.route("/aging.csv")
+@login_required
+def aging_csv():
+    today = timeutil.today()
+    data = aging(today)
+    return _csv(
+        f"recebiveis-{today:%Y%m%d}.csv",
+        ["cliente_id", "cliente", "ordens"] + [label for label, _min_age, _max_age in AGING_BUCKETS] + ["total"],
+        ([c["client_id"], c["name"], c["orders"], *[_money(v) for v in c["buckets"]], _money(c["total"])]
+         for c in data["clients"]),
+    )
+
+
+@reports_bp.route("/aging/orders.csv")
+@login_required
+def aging_detail_csv():
+    today = timeutil.today()
+    rows = aging_orders(today, _int_arg("client_id"), _int_arg("bucket", len(AGING_BUCKETS)))
+    opened = timeutil.format_many([r["created_at"] for r in rows], "%d/%m/%Y")
+    return _csv(
+        f"recebiveis-ordens-{today:%Y%m%d}.csv",
+        ["ordem", "cliente", "status", "abertura", "dias", "total", "pago", "saldo"],
+        ([r["id"], r["client_name"], r["status"], day, r["age"], _money(r["total"]), _money(r["paid"]),
+          _money(r["balance"])] for r, day in zip(rows, opened)),
+    )
+
+
+@reports_bp.route("/refresh", methods=["POST"])
+@login_required
+def refresh():
+    app = current_app._get_current_object()
+    if reporting.snapshot(app) is None:
+        flash("Relatórios consultam o banco principal diretamente.", "info")
+    else:
+        try:
+            if reporting.refresh(app):
+                flash("Dados dos relatórios atualizados", "success")
+            else:
+                flash("Atualização já em andamento", "info")
+        except Exception as e:
+            flash(f"Falha ao atualizar os dados dos relatórios: {e}", "danger")
+    back = "reports.analytics_report" if request.form.get("view") == "analytics" else "reports.movement_report"
+    return redirect(url_for(back, start=request.form.get("start"), end=request.form.get("end")))
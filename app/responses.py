@@ -0,0 +1,132 @@
+import gzip
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from functools import wraps
+from flask import make_response, request, session
+from flask_login import current_user
+from . import changes, timeutil
+
+# Response compression and conditional GET.
+#
+# Text responses above COMPRESS_MIN_BYTES are gzipped when the client accepts
+# it (the order list is megabytes of repetitive HTML). Pages decorated with
+# @conditional get a weak ETag built from per-model data versions that the
+# committed-change feed bumps, so an unchanged page is answered with 304 before
+# the view runs a single query or renders a template.
+
+COMPRESSIBLE_TYPES = {
+    "text/html", "text/plain", "text/css", "text/csv", "text/javascript",
+    "application/json", "application/javascript", "image/svg+xml",
+}
+
+
+class DataVersions:
+    """Monotonic per-model counters, bumped once per committed transaction."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._modified = {}
+        # Distinguishes counters of this process from a previous run's
+        self.epoch = f"{os.getpid()}-{time.time_ns()}"
+        self.started = datetime.now(timezone.utc).replace(microsecond=0)
+
+    def apply(self, change_list):
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            touched = {ch.model for ch in change_list}
+            if any(ch.op == "resync" for ch in change_list):
+                # Set-based writes behind the ORM: anything may have changed
+                touched |= set(self._versions) | {"*"}
+            for model in touched:
+                self._versions[model] = self._versions.get(model, 0) + 1
+                self._modified[model] = now
+
+    def stamp(self, models) -> tuple[str, datetime]:
+        with self._lock:
+            # Every page shows the signed-in user in the navbar
+            keys = tuple(models) + ("User", "*")
+            parts = [f"{m}:{self._versions.get(m, 0)}" for m in keys]
+            last = max((self._modified[m] for m in keys if m in self._modified), default=self.started)
+        return ";".join(parts), last
+
+
+versions = DataVersions()
+
+
+def _session_key() -> str:
+    user = getattr(current_user, "id", None) if current_user.is_authenticated else None
+    # Pages embed CSRF tokens: tie the tag to the session's token and to a time
+    # bucket shorter than their lifetime, so a revalidated page never carries an expired one
+    raw = session.get("csrf_token", "")
+    bucket = int(time.time() // 1800)
+    return f"{user}:{raw}:{bucket}"
+
+
+def conditional(*models, daily: bool = False):
+    """Answer GETs with 304 while none of `models` changed (place under @login_required)."""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != "GET" or session.get("_flashes"):
+                # Pending flash messages are consumed by the render; never skip it
+                return view(*args, **kwargs)
+            stamp, last_modified = versions.stamp(models)
+            key = [versions.epoch, stamp, request.full_path, _session_key()]
+            if daily:
+                key.append(timeutil.today().isoformat())  # "today" figures roll over at midnight
+            etag = hashlib.sha1("|".join(key).encode()).hexdigest()
+            # Only the ETag validates: Last-Modified is informative, its one-second
+            # resolution cannot tell apart two writes in the same second
+            if request.if_none_match.contains_weak(etag):
+                resp = make_response("", 304)
+            else:
+                resp = make_response(view(*args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+            resp.set_etag(etag, weak=True)
+            resp.last_modified = last_modified
+            resp.headers["Cache-Control"] = "private, no-cache"
+            return resp
+
+        return wrapper
+
+    return decorator
+
+
+def _compress(app, response):
+    if (
+        response.status_code < 200 or response.status_code in (204, 304)
+        or response.direct_passthrough or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_TYPES
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    if not request.accept_encodings["gzip"]:
+        return response
+    data = response.get_data()
+    if len(data) < app.config["COMPRESS_MIN_BYTES"]:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=app.config["COMPRESS_LEVEL"], mtime=0))
+    response.headers["Content-Encoding"] = "gzip"
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)  # the bytes differ from the identity encoding
+    return response
+
+
+def init_app(app):
+    app.config.setdefault(
+        "COMPRESS_ENABLED",
+        os.environ.get("COMPRESS_ENABLED", "1").strip().lower() in ("1", "true", "yes", "on"),
+    )
+    app.config.setdefault("COMPRESS_MIN_BYTES", int(os.environ.get("COMPRESS_MIN_BYTES", "1024")))
+    app.config.setdefault("COMPRESS_LEVEL", int(os.environ.get("COMPRESS_LEVEL", "6")))
+    changes.subscribe(versions.apply)
+    if app.config["COMPRESS_ENABLED"]:
+        app.after_request(lambda response: _compress(app, response))
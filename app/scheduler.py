@@ -0,0 +1,276 @@
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, insert, or_, select, text, update
+from . import db
+from .models import JobRun, SchedulerLock
+
+# Background jobs. Maintenance that used to run inside requests (or on its own
+# thread per feature) is a recurring job here: order reconciliation, the
+# reporting snapshot, PRAGMA optimize, incremental vacuum, backups and archival.
+#
+# Several `serve` processes may share one database, so jobs only run in the
+# process holding the lease row in scheduler_lock. A heartbeat thread renews the
+# lease every SCHEDULER_TICK_SECONDS; when a process dies its lease expires after
+# LEASE_TICKS ticks and another one takes over. Every run is recorded in job_run
+# (duration, outcome, detail) and shown at /admin/jobs.
+
+log = logging.getLogger(__name__)
+
+LOCK_NAME = "scheduler"
+LEASE_TICKS = 4
+
+
+class Job:
+    def __init__(self, name: str, title: str, interval_key: str, unit: float, func):
+        self.name = name
+        self.title = title
+        self.interval_key = interval_key
+        self.unit = unit  # seconds per unit of the config value
+        self.func = func
+        self.lock = threading.Lock()
+
+    def interval(self, app) -> float:
+        """Seconds between runs; 0 when disabled."""
+        return max(0.0, float(app.config.get(self.interval_key) or 0) * self.unit)
+
+
+_jobs: dict[str, Job] = {}
+
+
+def job(name: str, title: str, interval_key: str, unit: float = 3600.0):
+    def decorate(func):
+        _jobs[name] = Job(name, title, interval_key, unit, func)
+        return func
+    return decorate
+
+
+def jobs() -> list[Job]:
+    return list(_jobs.values())
+
+
+def get(name: str) -> Job | None:
+    return _jobs.get(name)
+
+
+# ---- Jobs -------------------------------------------------------------------
+# Each job runs inside an app context and returns a short detail for the history.
+
+@job("reconcile", "Conferir total e situação de pagamento das ordens", "RECONCILE_INTERVAL_MINUTES", 60.0)
+def _reconcile(app) -> str:
+    from . import order_service
+    counts = order_service.reconcile_orders()
+    return f"{counts['changed']} ordem(ns) corrigida(s) em {counts['chunks']} lote(s)"
+
+
+@job("reporting", "Atualizar a cópia dos relatórios", "REPORTING_REFRESH_MINUTES", 60.0)
+def _reporting(app) -> str:
+    from . import reporting
+    if reporting.snapshot(app) is None:
+        return "relatórios sem cópia (banco principal)"
+    if not reporting.refresh(app):
+        return "atualização já em andamento"
+    return f"cópia gerada em {reporting.snapshot(app).seconds:.1f}s"
+
+
+@job("optimize", "Atualizar estatísticas do SQLite (PRAGMA optimize)", "OPTIMIZE_INTERVAL_HOURS")
+def _optimize(app) -> str:
+    with db.engine.connect() as conn:
+        # Runs ANALYZE only on tables whose statistics are out of date
+        conn.execute(text("PRAGMA optimize"))
+    return "ok"
+
+
+@job("vacuum", "Devolver páginas livres ao disco (incremental_vacuum)", "VACUUM_INTERVAL_HOURS")
+def _vacuum(app) -> str:
+    with db.engine.connect() as conn:
+        mode = conn.execute(text("PRAGMA auto_vacuum")).scalar()
+        free = conn.execute(text("PRAGMA freelist_count")).scalar()
+        if mode != 2:
+            return f"auto_vacuum não incremental; {free} página(s) livre(s) (rode `archive --vacuum`)"
+        pages = min(free, int(app.config["VACUUM_STEP_PAGES"]))
+        if pages:
+            # The pragma frees one page per step; executescript steps it to the end
+            conn.connection.driver_connection.executescript(f"PRAGMA incremental_vacuum({pages});")
+    return f"{pages} de {free} página(s) livre(s) liberada(s)"
+
+
+@job("backup", "Backup online do banco", "BACKUP_INTERVAL_HOURS")
+def _backup(app) -> str:
+    from . import backup
+    results = backup.run(app)
+    return "; ".join(f"{os.path.basename(m['file'])} ({m['compressed_bytes'] // 1024} KB)" for m in results) or "nada a copiar"
+
+
+@job("archive", "Mover ordens finalizadas para o arquivo morto", "ARCHIVE_INTERVAL_HOURS")
+def _archive(app) -> str:
+    from . import archive
+    if not archive.enabled(app):
+        return "arquivo morto indisponível"
+    counts = archive.archive_orders()
+    return f"{counts['orders']} ordem(ns) arquivada(s)"
+
+
+# ---- Running ----------------------------------------------------------------
+
+def run_job(app, name: str, trigger: str = "agenda") -> dict | None:
+    """Run one job now and record it; None when it is already running in this process."""
+    entry = _jobs[name]
+    if not entry.lock.acquire(blocking=False):
+        return None
+    try:
+        with app.app_context():
+            started_at = datetime.utcnow()
+            t0 = time.perf_counter()
+            try:
+                detail, status = entry.func(app), "ok"
+            except Exception as e:
+                db.session.rollback()
+                log.exception("job %s failed", name)
+                detail, status = f"{type(e).__name__}: {e}", "error"
+            record = dict(
+                job=name, started_at=started_at, seconds=round(time.perf_counter() - t0, 3),
+                status=status, trigger=trigger, detail=(detail or "")[:500],
+            )
+            db.session.add(JobRun(**record))
+            keep_days = app.config["SCHEDULER_HISTORY_DAYS"]
+            db.session.execute(
+                delete(JobRun).where(JobRun.started_at < started_at - timedelta(days=keep_days))
+            )
+            db.session.commit()
+            return record
+    finally:
+        entry.lock.release()
+
+
+def last_runs() -> dict[str, datetime]:
+    """Start of the latest run of each job (any outcome), from the history."""
+    rows = db.session.execute(select(JobRun.job, func.max(JobRun.started_at)).group_by(JobRun.job))
+    return dict(rows.all())
+
+
+def due_jobs(app, now: datetime) -> list[Job]:
+    last = last_runs()
+    due = []
+    for entry in _jobs.values():
+        interval = entry.interval(app)
+        if interval and (entry.name not in last or (now - last[entry.name]).total_seconds() >= interval):
+            due.append(entry)
+    return due
+
+
+class Scheduler:
+    def __init__(self, app):
+        self.app = app
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.tick = float(app.config["SCHEDULER_TICK_SECONDS"])
+        self.stop_event = threading.Event()
+        self.leader = threading.Event()
+
+    def _lease(self) -> bool:
+        now = datetime.utcnow()
+        expires = now + timedelta(seconds=self.tick * LEASE_TICKS)
+        t = SchedulerLock.__table__
+        with self.app.app_context():
+            try:
+                db.session.execute(insert(t).prefix_with("OR IGNORE").values(
+                    name=LOCK_NAME, owner=self.owner, expires_at=expires))
+                taken = db.session.execute(
+                    update(t)
+                    .where(t.c.name == LOCK_NAME, or_(t.c.owner == self.owner, t.c.expires_at < now))
+                    .values(owner=self.owner, expires_at=expires)
+                ).rowcount == 1
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                log.exception("scheduler lease renewal failed")
+                taken = False
+        return taken
+
+    def _release(self):
+        t = SchedulerLock.__table__
+        with self.app.app_context():
+            try:
+                db.session.execute(
+                    update(t).where(t.c.name == LOCK_NAME, t.c.owner == self.owner)
+                    .values(expires_at=datetime.utcnow())
+                )
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+
+    def _heartbeat(self):
+        while True:
+            if self._lease():
+                if not self.leader.is_set():
+                    log.info("scheduler: %s is running the background jobs", self.owner)
+                self.leader.set()
+            else:
+                self.leader.clear()
+            if self.stop_event.wait(self.tick):
+                break
+        if self.leader.is_set():
+            self.leader.clear()
+            self._release()
+
+    def _run_loop(self):
+        # Jobs run on their own thread so a long backup does not delay lease renewal
+        while not self.stop_event.wait(self.tick if self.leader.is_set() else 1.0):
+            if not self.leader.is_set():
+                continue
+            with self.app.app_context():
+                try:
+                    due = due_jobs(self.app, datetime.utcnow())
+                except Exception:
+                    log.exception("scheduler: reading job history failed")
+                    due = []
+                db.session.remove()
+            for entry in due:
+                if self.stop_event.is_set() or not self.leader.is_set():
+                    break
+                run_job(self.app, entry.name)
+
+    def start(self):
+        self._threads = [
+            threading.Thread(target=self._heartbeat, name="scheduler-lease", daemon=True),
+            threading.Thread(target=self._run_loop, name="scheduler", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        """Stop taking jobs and hand the lease back (a job in progress is not interrupted)."""
+        self.stop_event.set()
+        self._threads[0].join(timeout)
+
+
+def start(app) -> Scheduler | None:
+    """Start the scheduler threads (SCHEDULER_ENABLED=0 disables)."""
+    if not app.config["SCHEDULER_ENABLED"]:
+        return None
+    scheduler = Scheduler(app)
+    app.extensions["scheduler"] = scheduler
+    return scheduler.start()
+
+
+def lease_holder():
+    row = db.session.get(SchedulerLock, LOCK_NAME)
+    if row is None or row.expires_at < datetime.utcnow():
+        return None
+    return row
+
+
+def init_app(app):
+    app.config.setdefault("SCHEDULER_ENABLED", os.environ.get("SCHEDULER_ENABLED", "1") not in ("0", "false", "no"))
+    app.config.setdefault("SCHEDULER_TICK_SECONDS", float(os.environ.get("SCHEDULER_TICK_SECONDS", "30")))
+    app.config.setdefault("SCHEDULER_HISTORY_DAYS", int(os.environ.get("SCHEDULER_HISTORY_DAYS", "30")))
+    app.config.setdefault("RECONCILE_INTERVAL_MINUTES", float(os.environ.get("RECONCILE_INTERVAL_MINUTES", "10")))
+    app.config.setdefault("OPTIMIZE_INTERVAL_HOURS", float(os.environ.get("OPTIMIZE_INTERVAL_HOURS", "6")))
+    app.config.setdefault("VACUUM_INTERVAL_HOURS", float(os.environ.get("VACUUM_INTERVAL_HOURS", "1")))
+    app.config.setdefault("VACUUM_STEP_PAGES", int(os.environ.get("VACUUM_STEP_PAGES", "2000")))
+    app.config.setdefault("ARCHIVE_INTERVAL_HOURS", float(os.environ.get("ARCHIVE_INTERVAL_HOURS", "24")))
+    app.extensions["scheduler"] = None
@@ -0,0 +1,205 @@
+import random
+from operator import itemgetter
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from . import db, changes
+from .models import Client, Service, Order, OrderItem, Payment
+
+# Synthetic data for benchmarks and query checks. Rows are generated in chunks
+# and written with Core executemany inserts inside a single transaction, so
+# hundreds of thousands of orders load in seconds instead of going through the
+# ORM unit of work one object at a time. The output is deterministic per seed.
+
+FIRST_NAMES = (
+    "Ana", "Beatriz", "Bruno", "Camila", "Carlos", "Daniela", "Eduardo", "Fernanda", "Gabriel", "Helena",
+    "Igor", "Juliana", "Lucas", "Marcos", "Mariana", "Natália", "Otávio", "Patrícia", "Rafael", "Sofia",
+    "Thiago", "Vanessa", "Vinícius", "Larissa", "João", "Maria", "Pedro", "Paula", "Renata", "Ricardo",
+)
+LAST_NAMES = (
+    "Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira", "Lima", "Gomes",
+    "Costa", "Ribeiro", "Martins", "Carvalho", "Almeida", "Lopes", "Soares", "Fernandes", "Vieira", "Barbosa",
+)
+STREETS = ("Rua das Flores", "Av. Brasil", "Rua XV de Novembro", "Rua São João", "Av. Paulista", "Rua da Paz")
+SERVICES = (
+    ("Lavar e passar (peça)", 8.0, "peca"),
+    ("Somente passar (peça)", 5.0, "peca"),
+    ("Lavagem por kg", 18.0, "kg"),
+    ("Camisa social", 9.5, "peca"),
+    ("Calça social", 12.0, "peca"),
+    ("Terno completo", 45.0, "peca"),
+    ("Vestido de festa", 60.0, "peca"),
+    ("Edredom solteiro", 35.0, "peca"),
+    ("Edredom casal", 45.0, "peca"),
+    ("Cortina (m²)", 22.0, "peca"),
+    ("Tapete (m²)", 28.0, "peca"),
+    ("Tênis", 30.0, "peca"),
+)
+STATUSES = ("pendente", "em andamento", "pronto", "entregue")
+METHODS = ("dinheiro", "pix", "cartao")
+
+
+def _chunks(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _ts(dt: datetime) -> str:
+    # Same text layout SQLAlchemy's SQLite DateTime type writes, so range filters compare correctly
+    return dt.isoformat(sep=" ", timespec="microseconds")
+
+
+def _insert(model, rows, chunk_size):
+    # Straight to the DB-API cursor: building SQLAlchemy parameter sets costs more
+    # than SQLite itself spends on the insert at these volumes
+    table = model.__table__
+    names = [c.name for c in table.columns]
+    sql = 'INSERT INTO "{}" ({}) VALUES ({})'.format(
+        table.name, ", ".join(f'"{n}"' for n in names), ", ".join("?" for _ in names)
+    )
+    cursor = db.session.connection().connection.cursor()
+    row_tuple = itemgetter(*names)
+    total = 0
+    try:
+        for batch in _chunks(rows, chunk_size):
+            cursor.executemany(sql, [row_tuple(r) for r in batch])
+            total += len(batch)
+    finally:
+        cursor.close()
+    return total
+
+
+def seed_database(clients: int = 200, orders: int = 1000, items_per_order: int = 4,
+                  years: int = 2, seed: int = 1, chunk_size: int = 10000) -> dict:
+    """Append synthetic clients, services, orders, items and payments; returns row counts.
+
+    items_per_order is the average (1 .. 2*avg-1 per order). About 60% of the
+    orders end up paid in full, some carry only a down payment and the rest are
+    unpaid, so payments average about one per order. Must run inside an app context.
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    span = max(1, int(years * 365 * 24 * 3600))
+    items_per_order = max(1, items_per_order)
+
+    def next_id(model):
+        return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+    first_client = next_id(Client)
+    client_rows = []
+    for n in range(clients):
+        created = now - timedelta(seconds=rng.randrange(span))
+        client_rows.append({
+            "id": first_client + n,
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "phone": f"11{rng.randrange(900000000, 999999999)}",
+            "document": None,
+            "address": f"{rng.choice(STREETS)}, {rng.randrange(1, 3000)}",
+            "created_at": _ts(created),
+        })
+    counts = {"clients": _insert(Client, client_rows, chunk_size)}
+    client_ids = [r["id"] for r in client_rows] or [
+        cid for (cid,) in db.session.query(Client.id).limit(10000)
+    ]
+    if not client_ids:
+        raise ValueError("no clients to attach orders to")
+
+    first_service = next_id(Service)
+    service_rows = [
+        {"id": first_service + n, "name": name, "price": price, "unit": unit, "created_at": _ts(now - timedelta(days=years * 365))}
+        for n, (name, price, unit) in enumerate(SERVICES)
+    ]
+    counts["services"] = _insert(Service, service_rows, chunk_size)
+    services = [(r["id"], r["price"]) for r in service_rows]
+
+    order_id = next_id(Order)
+    item_id = next_id(OrderItem)
+    payment_id = next_id(Payment)
+    counts.update(orders=0, items=0, payments=0)
+
+    # Orders are produced oldest first so ids grow with created_at, like real data
+    offsets = sorted((rng.randrange(span) for _ in range(orders)), reverse=True)
+    for batch in _chunks(offsets, chunk_size):
+        order_rows, item_rows, payment_rows = [], [], []
+        for offset in batch:
+            created = now - timedelta(seconds=offset)
+            items_sum = 0.0
+            for _ in range(rng.randint(1, 2 * items_per_order - 1)):
+                svc_id, price = rng.choice(services)
+                qty = rng.randint(1, 6)
+                subtotal = round(qty * price, 2)
+                items_sum += subtotal
+                item_rows.append({
+                    "id": item_id, "order_id": order_id, "service_id": svc_id, "description": None,
+                    "quantity": qty, "unit_price": price, "subtotal": subtotal,
+                })
+                item_id += 1
+            discount_percent = 10.0 if rng.random() < 0.1 else 0.0
+            total = round(items_sum * (1 - discount_percent / 100.0), 2)
+            roll = rng.random()
+            paid = 0.0
+            if roll < 0.85:
+                # Down payment at drop-off, the rest when the customer picks up
+                entry = round(total * rng.choice((0.3, 0.5)), 2) if rng.random() < 0.5 else 0.0
+                if entry:
+                    payment_rows.append({
+                        "id": payment_id, "order_id": order_id, "amount": entry, "method": rng.choice(METHODS),
+                        "when_type": "entrada", "note": None, "created_at": _ts(created),
+                    })
+                    payment_id += 1
+                    paid += entry
+                if roll < 0.6 and total - paid > 0:
+                    picked_up = created + timedelta(days=rng.randint(1, 7))
+                    if picked_up > now:
+                        picked_up = created + (now - created) * rng.random()
+                    payment_rows.append({
+                        "id": payment_id, "order_id": order_id, "amount": round(total - paid, 2),
+                        "method": rng.choice(METHODS), "when_type": "retirada", "note": None,
+                        "created_at": _ts(picked_up.replace(microsecond=0)),
+                    })
+                    payment_id += 1
+                    paid = total
+            order_rows.append({
+                "id": order_id,
+                "client_id": rng.choice(client_ids),
+                "status": "entregue" if paid >= total else rng.choice(STATUSES),
+                "total": total,
+                "discount": 0.0,
+                "surcharge": 0.0,
+                "discount_percent": discount_percent,
+                "surcharge_percent": 0.0,
+                "notes": None,
+                "created_at": _ts(created),
+                "delivery_date": _ts((created + timedelta(days=rng.randint(2, 5))).replace(hour=0, minute=0, second=0)),
+                "payment_status": "quitado" if total > 0 and paid >= total else "em_aberto",
+                "paid": paid,
+            })
+            order_id += 1
+        counts["orders"] += _insert(Order, order_rows, chunk_size)
+        counts["items"] += _insert(OrderItem, item_rows, chunk_size)
+        counts["payments"] += _insert(Payment, payment_rows, chunk_size)
+
+    # Core inserts bypass the mapper events; counters and caches must reload
+    changes.record(db.session, "resync", "seed")
+    db.session.commit()
+    return counts
+
+
+def scratch_app(path: str, **config):
+    """App bound to a throwaway SQLite file, for benchmarks and query checks."""
+    from . import create_app
+    settings = {
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+        "WTF_CSRF_ENABLED": False,
+        "TESTING": True,
+        "METRICS_ENABLED": False,
+        "PROFILING_ENABLED": False,
+        "AUDIT_ENABLED": False,
+    }
+    settings.update(config)
+    return create_app(settings)
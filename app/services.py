@@ -1,16 +1,19 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required
-from . import db
+from sqlalchemy.exc import IntegrityError
+from . import db, readmodels
 from .models import Service
 from .forms import ServiceForm, parse_money_to_float
+from .responses import conditional
 
 services_bp = Blueprint("services", __name__, template_folder="templates")
 
 
 @services_bp.route("/")
 @login_required
+@conditional("Service")
 def list_services():
-    services = Service.query.order_by(Service.id.desc()).all()
+    services = readmodels.service_rows()
     return render_template("services/list.html", services=services)
 
 
@@ -62,6 +65,12 @@ def edit_service(service_id):
 def delete_service(service_id):
     service = Service.query.get_or_404(service_id)
     db.session.delete(service)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # foreign_keys=ON: services used in order items cannot be removed
+        db.session.rollback()
+        flash("Serviço utilizado em ordens e não pode ser excluído.", "warning")
+        return redirect(url_for("services.list_services"))
     flash("Serviço excluído", "info")
     return redirect(url_for("services.list_services"))
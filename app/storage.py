@@ -0,0 +1,182 @@
+import logging
+import os
+import sqlite3
+from sqlalchemy import event, text
+from sqlalchemy.schema import CreateTable
+from . import db
+
+# SQLite storage profile. Every pooled connection gets the same pragmas so that
+# readers never block the writer (WAL), commits avoid a full fsync of the
+# rollback journal (synchronous=NORMAL) and a busy writer is waited on instead of
+# failing straight away with "database is locked" (busy_timeout).
+# Each setting can be overridden through an environment variable of the same name.
+
+log = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "SQLITE_JOURNAL_MODE": "WAL",
+    "SQLITE_SYNCHRONOUS": "NORMAL",
+    "SQLITE_BUSY_TIMEOUT_MS": 10000,
+    "SQLITE_CACHE_SIZE_KB": 32768,  # per connection
+    "SQLITE_MMAP_SIZE": 256 * 1024 * 1024,
+    "SQLITE_TEMP_STORE": "MEMORY",
+    "SQLITE_FOREIGN_KEYS": True,
+    # Takes effect on new databases; an existing file switches on its next VACUUM
+    "SQLITE_AUTO_VACUUM": "INCREMENTAL",
+    "SQLITE_POOL_SIZE": 10,
+    "SQLITE_POOL_MAX_OVERFLOW": 10,
+    "SQLITE_POOL_TIMEOUT": 30,
+    "SQLITE_STARTUP_QUICK_CHECK": False,
+}
+
+
+def _env_value(name, default):
+    raw = os.environ.get(name)
+    if raw is None or raw == "":
+        return default
+    if isinstance(default, bool):
+        return raw.strip().lower() in ("1", "true", "yes", "on")
+    if isinstance(default, int):
+        try:
+            return int(raw)
+        except ValueError:
+            log.warning("Ignoring invalid %s=%r", name, raw)
+            return default
+    return raw.strip().upper()
+
+
+def is_sqlite(app) -> bool:
+    return str(app.config.get("SQLALCHEMY_DATABASE_URI", "")).startswith("sqlite")
+
+
+def configure(app):
+    """Load the storage profile into app.config and set engine/pool options.
+
+    Must run before db.init_app(app), which reads SQLALCHEMY_ENGINE_OPTIONS.
+    """
+    for key, default in DEFAULTS.items():
+        app.config.setdefault(key, _env_value(key, default))
+    if not is_sqlite(app):
+        return
+    options = dict(app.config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+    connect_args = dict(options.get("connect_args") or {})
+    # Python-level lock wait, in seconds; mirrors busy_timeout
+    connect_args.setdefault("timeout", app.config["SQLITE_BUSY_TIMEOUT_MS"] / 1000.0)
+    # Pooled connections are handed to whichever worker thread checks them out
+    connect_args.setdefault("check_same_thread", False)
+    options["connect_args"] = connect_args
+    if ":memory:" not in app.config["SQLALCHEMY_DATABASE_URI"]:
+        options.setdefault("pool_size", app.config["SQLITE_POOL_SIZE"])
+        options.setdefault("max_overflow", app.config["SQLITE_POOL_MAX_OVERFLOW"])
+        options.setdefault("pool_timeout", app.config["SQLITE_POOL_TIMEOUT"])
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+
+
+def pragma_statements(config) -> list[str]:
+    stmts = [
+        f"PRAGMA auto_vacuum={config['SQLITE_AUTO_VACUUM']}",
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}",
+        # Negative value means KiB instead of pages
+        f"PRAGMA cache_size=-{int(config['SQLITE_CACHE_SIZE_KB'])}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+        f"PRAGMA temp_store={config['SQLITE_TEMP_STORE']}",
+        f"PRAGMA foreign_keys={'ON' if config['SQLITE_FOREIGN_KEYS'] else 'OFF'}",
+    ]
+    return stmts
+
+
+def init_app(app):
+    """Apply the pragmas on every new connection and run the startup check."""
+    if not is_sqlite(app):
+        return
+    stmts = pragma_statements(app.config)
+    with app.app_context():
+        engine = db.engine
+
+        @event.listens_for(engine, "connect")
+        def _apply_pragmas(dbapi_conn, _record):
+            cur = dbapi_conn.cursor()
+            try:
+                for stmt in stmts:
+                    cur.execute(stmt)
+            finally:
+                cur.close()
+
+        startup_check(app)
+
+
+def ensure_autoincrement(engine, table) -> bool:
+    """Rebuild `table` with AUTOINCREMENT when the file predates it; True when rebuilt.
+
+    Follows SQLite's table-rebuild procedure (new table, copy, drop, rename) in one
+    transaction with foreign keys off, then recreates the table's indexes.
+    """
+    raw = engine.raw_connection()
+    conn = raw.driver_connection
+    isolation = conn.isolation_level
+    conn.isolation_level = None  # explicit BEGIN/COMMIT below
+    cur = conn.cursor()
+    try:
+        row = cur.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table.name,)).fetchone()
+        if row is None or "AUTOINCREMENT" in row[0].upper():
+            return False
+        quote = engine.dialect.identifier_preparer
+        name, temp = quote.format_table(table), quote.quote(f"_rebuild_{table.name}")
+        ddl = str(CreateTable(table).compile(dialect=engine.dialect)).strip()
+        ddl = ddl.replace(f"CREATE TABLE {name}", f"CREATE TABLE {temp}", 1)
+        existing = {r[1] for r in cur.execute(f"PRAGMA table_info({name})")}
+        columns = ", ".join(quote.quote(c.name) for c in table.columns if c.name in existing)
+        indexes = [r[0] for r in cur.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table.name,)
+        )]
+        foreign_keys = cur.execute("PRAGMA foreign_keys").fetchone()[0]
+        cur.execute("PRAGMA foreign_keys=OFF")
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                cur.execute(ddl)
+                cur.execute(f"INSERT INTO {temp} ({columns}) SELECT {columns} FROM {name}")
+                cur.execute(f"DROP TABLE {name}")
+                cur.execute(f"ALTER TABLE {temp} RENAME TO {name}")
+                for stmt in indexes:
+                    cur.execute(stmt)
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+        finally:
+            cur.execute(f"PRAGMA foreign_keys={'ON' if foreign_keys else 'OFF'}")
+        log.info("Table %s rebuilt with AUTOINCREMENT", table.name)
+        return True
+    finally:
+        cur.close()
+        conn.isolation_level = isolation
+        raw.close()
+
+
+def startup_check(app) -> dict:
+    """Verify the profile actually took effect; WAL is refused on some network drives."""
+    with db.engine.connect() as conn:
+        status = {
+            "sqlite_version": sqlite3.sqlite_version,
+            "journal_mode": conn.execute(text("PRAGMA journal_mode")).scalar(),
+            "synchronous": conn.execute(text("PRAGMA synchronous")).scalar(),
+            "foreign_keys": conn.execute(text("PRAGMA foreign_keys")).scalar(),
+            "busy_timeout": conn.execute(text("PRAGMA busy_timeout")).scalar(),
+            "auto_vacuum": conn.execute(text("PRAGMA auto_vacuum")).scalar(),
+        }
+        if app.config["SQLITE_STARTUP_QUICK_CHECK"]:
+            status["quick_check"] = conn.execute(text("PRAGMA quick_check")).scalar()
+    wanted = str(app.config["SQLITE_JOURNAL_MODE"]).lower()
+    if str(status["journal_mode"]).lower() != wanted:
+        log.warning(
+            "SQLite journal_mode is %s (wanted %s); concurrent terminals may see lock errors",
+            status["journal_mode"], wanted,
+        )
+    if status.get("quick_check", "ok") != "ok":
+        log.error("SQLite quick_check failed: %s", status["quick_check"])
+    log.info("SQLite storage profile: %s", status)
+    app.extensions["sqlite_storage"] = status
+    return status
@@ -0,0 +1,128 @@
+from bisect import bisect_right
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+
+# Local time for the whole app. Timestamps (created_at) are stored UTC-naive;
+# dates typed by the user and "today" are Sao Paulo calendar days. The zone is
+# loaded once at import, day boundaries are cached per local day and the
+# offset changes are tabulated on first use, so formatting thousands of
+# timestamps in a list does not go through the zone rules for each one.
+
+LOCAL_TZ_NAME = "America/Sao_Paulo"
+FALLBACK_OFFSET = timedelta(hours=-3)
+TABLE_YEARS = (2000, 2050)
+_TABLE_START = datetime(TABLE_YEARS[0], 1, 1)
+_TABLE_END = datetime(TABLE_YEARS[1], 1, 1)
+
+
+def _load_zone():
+    try:
+        from zoneinfo import ZoneInfo
+        return ZoneInfo(LOCAL_TZ_NAME)
+    except Exception:
+        # No tz database available: fixed -03:00 (no DST handling)
+        return timezone(FALLBACK_OFFSET)
+
+
+LOCAL_TZ = _load_zone()
+
+
+def now_local() -> datetime:
+    return datetime.now(LOCAL_TZ)
+
+
+def today() -> date:
+    return now_local().date()
+
+
+def to_utc_naive(dt_local: datetime) -> datetime:
+    """Local wall time (naive or aware) -> UTC-naive, the storage format."""
+    if dt_local.tzinfo is None:
+        dt_local = dt_local.replace(tzinfo=LOCAL_TZ)
+    return dt_local.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+@lru_cache(maxsize=None)
+def _transitions() -> tuple[list[datetime], list[timedelta]]:
+    """UTC-naive instants where the local offset changes, and the offset from each one on.
+
+    Built once (tens of ms) by sampling the zone daily and refining to the hour;
+    converting a timestamp is then a bisect instead of a zone lookup.
+    """
+    def offset(dt):
+        return dt.replace(tzinfo=timezone.utc).astimezone(LOCAL_TZ).utcoffset()
+
+    day, end = _TABLE_START, _TABLE_END
+    bounds, offsets = [], [offset(day)]
+    while day < end:
+        nxt = day + timedelta(days=1)
+        if offset(nxt) != offsets[-1]:
+            hour = day
+            while offset(hour) == offsets[-1]:
+                hour += timedelta(hours=1)
+            bounds.append(hour)
+            offsets.append(offset(hour))
+        day = nxt
+    return bounds, offsets
+
+
+def to_local_naive(dt: datetime) -> datetime:
+    """Stored timestamp (UTC if naive) -> local wall time, naive."""
+    if dt.tzinfo is None and _TABLE_START <= dt < _TABLE_END:
+        bounds, offsets = _transitions()
+        return dt + offsets[bisect_right(bounds, dt)]
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(LOCAL_TZ).replace(tzinfo=None)
+
+
+DEFAULT_FORMAT = "%d/%m/%Y %H:%M"
+
+
+def format_local(dt: datetime, fmt: str = DEFAULT_FORMAT) -> str:
+    d = to_local_naive(dt)
+    if fmt == DEFAULT_FORMAT:
+        # strftime is most of the cost per cell; the default layout is built directly
+        return f"{d.day:02d}/{d.month:02d}/{d.year:04d} {d.hour:02d}:{d.minute:02d}"
+    return d.strftime(fmt)
+
+
+def localize_many(values) -> list:
+    """to_local_naive over a list; None/empty values stay None."""
+    return [to_local_naive(v) if v else None for v in values]
+
+
+def format_many(values, fmt: str = DEFAULT_FORMAT) -> list[str]:
+    return [format_local(v, fmt) if v else "" for v in values]
+
+
+@lru_cache(maxsize=1024)
+def day_bounds(day: date) -> tuple[datetime, datetime]:
+    """UTC-naive [start, end) of a local calendar day, for created_at filters."""
+    start = datetime(day.year, day.month, day.day)
+    return to_utc_naive(start), to_utc_naive(start + timedelta(days=1))
+
+
+def range_bounds(first: date | None, last: date | None) -> tuple[datetime | None, datetime | None]:
+    """UTC-naive [start, end) covering local days first..last (either may be open)."""
+    return (
+        day_bounds(first)[0] if first else None,
+        day_bounds(last)[1] if last else None,
+    )
+
+
+def sqlite_day_modifier(day: date) -> str:
+    """date() modifier turning a UTC timestamp into the local day, valid around `day`."""
+    start_utc, _ = day_bounds(day)
+    offset = datetime(day.year, day.month, day.day) - start_utc
+    return f"{int(offset.total_seconds() // 60):+d} minutes"
+
+
+def parse_day(value: str | None) -> date | None:
+    """YYYY-MM-DD from a form/query string; None when empty or invalid."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        return None
@@ -1,17 +1,20 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required
+from sqlalchemy.exc import IntegrityError
 from werkzeug.security import generate_password_hash
-from . import db
+from . import db, readmodels
 from .models import User
 from .forms import UserCreateForm, UserEditForm
+from .responses import conditional
 
 users_bp = Blueprint("users", __name__, template_folder="templates")
 
 
 @users_bp.route("/")
 @login_required
+@conditional()
 def list_users():
-    users = User.query.order_by(User.id.desc()).all()
+    users = readmodels.user_rows()
     return render_template("users/list.html", users=users)
 
 
@@ -58,6 +61,12 @@ def edit_user(user_id):
 def delete_user(user_id):
     user = User.query.get_or_404(user_id)
     db.session.delete(user)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # foreign_keys=ON: users who closed or reopened a cash day cannot be removed
+        db.session.rollback()
+        flash("Usuário registrado em fechamentos de caixa e não pode ser excluído.", "warning")
+        return redirect(url_for("users.list_users"))
     flash("Usuário excluído", "info")
     return redirect(url_for("users.list_users"))
@@ -3,4 +3,5 @@ from app import create_app
 app = create_app()
 
 if __name__ == "__main__":
+    # Development server only (debug + reloader). In the shop use: flask --app run serve
     app.run(host="127.0.0.1", port=5000, debug=True)
@@ -43,9 +43,15 @@ try {
         Write-Warn "requirements.txt não encontrado. Pulando instalação de dependências."
     }
 
-    # Start the Flask server
-    Write-Info "Iniciando o servidor Flask (http://127.0.0.1:5000)..."
-    & $venvPython run.py
+    # Local copies of CSS/JS/fonts (downloaded once) with hashed names and .gz/.br variants
+    Write-Info "Preparando arquivos estáticos..."
+    & $venvPython -m flask --app run assets vendor | Out-Host
+    if ($LASTEXITCODE -ne 0) { Write-Warn "Alguns arquivos não foram baixados; as páginas usarão a CDN para eles." }
+    & $venvPython -m flask --app run assets build | Out-Host
+
+    # Start the production server (waitress, multi-thread). Use "python run.py" for development.
+    Write-Info "Iniciando o servidor (http://127.0.0.1:5000)..."
+    & $venvPython -m flask --app run serve
 }
 catch {
     Write-Err $_
@@ -0,0 +1,20 @@
+import pytest
+from app import db
+from app.seed import scratch_app
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = scratch_app(str(tmp_path / "lavanderia.db"))
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    response = client.post("/login", data={"username": "admin", "password": "admin"})
+    assert response.status_code == 302
+    return client
@@ -0,0 +1,31 @@
+import threading
+from app import analytics
+
+
+class _Conn:
+    def exec_driver_sql(self, _sql):
+        return self
+
+    def scalar(self):
+        return 1
+
+
+class _SwitchingLock:
+    """Lock after whose release another request caches a newer snapshot generation."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self._lock.acquire()
+
+    def __exit__(self, *exc):
+        self._lock.release()
+        analytics._has_rollups.clear()
+        analytics._has_rollups["next"] = False
+
+
+def test_rollup_check_survives_a_generation_switch(monkeypatch):
+    monkeypatch.setattr(analytics, "_has_rollups", {})
+    monkeypatch.setattr(analytics, "_lock", _SwitchingLock())
+    assert analytics._rollups_available(_Conn(), "current") is True
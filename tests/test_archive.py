@@ -0,0 +1,93 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import select, text
+from app import archive, db
+from app.models import Client, Order, OrderItem, Payment, Service
+
+DELIVERED = datetime(2020, 1, 10)
+NOW = datetime(2021, 1, 1)
+
+
+def _order(client, service, total=10.0) -> tuple[int, int, int]:
+    """Order, item and payment ids of a new order old enough to archive."""
+    order = Order(client=client, status="entregue", total=total, paid=total, payment_status="quitado",
+                  delivery_date=DELIVERED, created_at=DELIVERED)
+    order.items.append(OrderItem(service=service, quantity=1, unit_price=total, subtotal=total))
+    order.payments.append(Payment(amount=total, method="pix"))
+    db.session.add(order)
+    db.session.commit()
+    return order.id, order.items[0].id, order.payments[0].id
+
+
+@pytest.fixture
+def catalog(app):
+    with app.app_context():
+        client, service = Client(name="Ana"), Service(name="Lavar", price=10.0)
+        db.session.add_all([client, service])
+        db.session.commit()
+        yield client, service
+
+
+def test_deleted_newest_order_does_not_reuse_archived_id(app, client, catalog):
+    first = _order(*catalog, total=10.0)
+    newest = _order(*catalog, total=20.0)
+    assert archive.archive_orders(after_days=30, now=NOW)["orders"] == 2
+    assert db.session.execute(select(Order.id)).first() is None
+
+    # The newest order is created after the archive run and then deleted
+    later = _order(*catalog, total=30.0)
+    assert later[0] == newest[0] + 1
+    db.session.delete(db.session.get(Order, later[0]))
+    db.session.commit()
+    again = _order(*catalog, total=40.0)
+    assert again == (later[0] + 1, later[1] + 1, later[2] + 1)
+
+    counts = archive.archive_orders(after_days=30, now=NOW)
+    assert counts["orders"] == 1
+    rows = db.session.execute(select(archive.orders.c.id, archive.orders.c.total).order_by(archive.orders.c.id)).all()
+    assert rows == [(first[0], 10.0), (newest[0], 20.0), (again[0], 40.0)]
+    assert archive.stats() == {"orders": 3, "items": 3, "payments": 3}
+
+    page = client.get("/orders/?archive=1").get_data(as_text=True)
+    assert [page.count(f"<td>{ids[0]}</td>") for ids in (first, newest, again)] == [1, 1, 1]
+
+
+def test_archive_fails_on_key_conflict(app, catalog):
+    kept = _order(*catalog, total=10.0)
+    archive.archive_orders(after_days=30, now=NOW)
+    # A hot row with an archived id (written past the sequence)
+    db.session.execute(text(
+        "INSERT INTO \"order\" (id, client_id, status, total, paid, payment_status, delivery_date, created_at) "
+        "VALUES (:id, :client, 'entregue', 99.0, 99.0, 'quitado', :day, :day)"
+    ), {"id": kept[0], "client": catalog[0].id, "day": DELIVERED})
+    db.session.commit()
+
+    with pytest.raises(archive.ArchiveConflict):
+        archive.archive_orders(after_days=30, now=NOW)
+    assert db.session.execute(select(archive.orders.c.total)).scalars().all() == [10.0]
+    assert db.session.get(Order, kept[0]).total == 99.0
+
+
+def test_interrupted_batch_is_finished(app, catalog):
+    order_id = _order(*catalog)[0]
+    # Copied by a run that stopped before deleting the hot rows
+    conn = db.session.connection()
+    for hot, cold in ((Order, archive.orders), (OrderItem, archive.items), (Payment, archive.payments)):
+        names = [c.name for c in cold.columns]
+        conn.execute(cold.insert().from_select(names, select(*[hot.__table__.c[n] for n in names])))
+    db.session.commit()
+
+    assert archive.archive_orders(after_days=30, now=NOW)["orders"] == 1
+    assert db.session.get(Order, order_id) is None
+    assert archive.stats() == {"orders": 1, "items": 1, "payments": 1}
+
+
+def test_id_floor_follows_archive(app, catalog):
+    archived = _order(*catalog)
+    archive.archive_orders(after_days=30, now=NOW)
+    # A file whose sequence lags the archive (archived before AUTOINCREMENT)
+    db.session.execute(text("DELETE FROM sqlite_sequence"))
+    db.session.commit()
+
+    assert archive.raise_id_floor() == dict(zip(("order", "order_item", "payment"), archived))
+    assert _order(*catalog)[0] == archived[0] + 1
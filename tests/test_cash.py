@@ -0,0 +1,62 @@
+from datetime import date, datetime
+import pytest
+from app import cash, db
+from app.models import CashClosing, Client, Order, Payment
+
+DAY = date(2024, 3, 1)
+
+
+@pytest.fixture
+def payments(app):
+    with app.app_context():
+        order = Order(client=Client(name="Ana"), total=50.0)
+        # Local day 2024-03-01 (UTC-3)
+        order.payments.append(Payment(amount=20.0, method="pix", created_at=datetime(2024, 3, 1, 15)))
+        order.payments.append(Payment(amount=30.0, method="dinheiro", created_at=datetime(2024, 3, 1, 18)))
+        db.session.add(order)
+        db.session.commit()
+
+
+def test_close_freezes_the_day(app, payments):
+    with app.app_context():
+        closing = cash.close_day(DAY, 1, counted=50.0)
+        assert (closing.version, closing.payments, closing.total) == (1, 2, 50.0)
+        # Later changes to the day's payments leave the closing as it was
+        db.session.add(Payment(order_id=1, amount=5.0, created_at=datetime(2024, 3, 1, 19)))
+        db.session.commit()
+        assert cash.current_closing(DAY).total == 50.0
+        with pytest.raises(cash.CashError):
+            cash.close_day(DAY, 1)
+
+
+def test_concurrent_close_of_the_same_day(app, client, payments, monkeypatch):
+    with app.app_context():
+        cash.close_day(DAY, 1)
+    # The second request read the day before the first one committed
+    monkeypatch.setattr(cash, "current_closing", lambda day: None)
+    response = client.post("/cash/close", data={"day": DAY.isoformat()}, follow_redirects=True)
+    assert response.status_code == 200
+    assert "já está fechado" in response.get_data(as_text=True)
+    with app.app_context():
+        assert CashClosing.query.count() == 1
+
+
+def test_reopen_adjust_and_history(app, client, payments):
+    with app.app_context():
+        cash.close_day(DAY, 1)
+        with pytest.raises(cash.CashError):
+            cash.reopen_day(DAY, 1, "")
+        assert cash.adjust_day(DAY, 1, -2.5, "troco").amount == -2.5
+        cash.reopen_day(DAY, 1, "pagamento esquecido")
+        with pytest.raises(cash.CashError):
+            cash.adjust_day(DAY, 1, 1.0, "depois de reaberto")
+        closing = cash.close_day(DAY, 1)
+        assert closing.version == 2
+
+        data = cash.history(DAY, DAY)
+        assert [row["closing"].version for row in data["rows"]] == [2]
+        assert data["total"] == 50.0
+        assert data["rows"][0]["methods"] == {"dinheiro": 30.0, "pix": 20.0}
+
+    assert client.get(f"/cash/?day={DAY.isoformat()}").status_code == 200
+    assert client.get("/cash/history?start=2024-03-01&end=2024-03-31").status_code == 200
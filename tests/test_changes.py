@@ -0,0 +1,68 @@
+import sqlite3
+import click
+from app import changes, db
+from app.models import Client
+
+
+def _watcher(app):
+    watcher = changes.external_writes(app)
+    watcher.interval = 0
+    return watcher
+
+
+def _other_process(app, sql: str):
+    """A write by another process: its own connection, then the command's announcement."""
+    conn = sqlite3.connect(changes.external_writes(app).path)
+    with conn:
+        conn.execute(sql)
+    conn.close()
+    with app.app_context(), click.Context(click.Command("reconcile")):
+        changes._announce([changes.Change("resync", "reconcile", None)])
+
+
+def test_cached_responses_follow_other_processes(app, client):
+    _watcher(app)
+    client.get("/")  # consumes the login flash
+    first = client.get("/dashboard/data.json")
+    etag = first.headers["ETag"]
+    assert client.get("/dashboard/data.json", headers={"If-None-Match": etag}).status_code == 304
+
+    _other_process(app, "INSERT INTO client (name, created_at) VALUES ('Outra', datetime('now'))")
+    changed = client.get("/dashboard/data.json", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json["metrics"]["new_clients_7d"] == first.json["metrics"]["new_clients_7d"] + 1
+
+
+def test_servers_do_not_announce(app):
+    watcher = _watcher(app)
+    before = watcher.read()
+    with app.app_context(), click.Context(click.Command("serve")):
+        db.session.add(Client(name="Ana"))
+        db.session.commit()
+    assert watcher.read() == before
+    assert watcher.check() is False
+
+
+def test_commands_announce_their_commits(app):
+    watcher = _watcher(app)
+    before = watcher.read()
+    with app.app_context(), click.Context(click.Command("seed")):
+        db.session.add(Client(name="Ana"))
+        db.session.commit()
+    assert watcher.read() == before + 1
+    assert watcher.check() is True
+
+
+def test_insert_changes_carry_the_new_key(app):
+    seen = []
+    changes.subscribe(seen.extend)
+    try:
+        with app.app_context():
+            client = Client(name="Ana")
+            db.session.add(client)
+            db.session.commit()
+            client_id = client.id
+    finally:
+        changes._subscribers.remove(seen.extend)
+    inserts = [ch for ch in seen if ch.op == "insert" and ch.model == "Client"]
+    assert [ch.pk for ch in inserts] == [client_id]
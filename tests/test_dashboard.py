@@ -0,0 +1,23 @@
+from app import db
+from app.models import Client
+
+
+def test_data_polling_is_conditional(app, client):
+    client.get("/")  # shows the login flash; pages with pending flashes skip the ETag
+    first = client.get("/dashboard/data.json")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert client.get("/dashboard/data.json", headers={"If-None-Match": etag}).status_code == 304
+
+    with app.app_context():
+        db.session.add(Client(name="Bia"))
+        db.session.commit()
+    changed = client.get("/dashboard/data.json", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json["metrics"]["new_clients_7d"] == first.json["metrics"]["new_clients_7d"] + 1
+
+
+def test_page_polls_when_stream_refused(app, client):
+    app.config["DASHBOARD_POLL_SECONDS"] = 5
+    page = client.get("/").get_data(as_text=True)
+    assert "const pollMs = 5000;" in page
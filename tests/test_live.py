@@ -0,0 +1,13 @@
+from app import live
+
+
+def test_stream_max_keeps_reserved_threads():
+    assert live.stream_max(16, 4) == 12
+    assert live.stream_max(3, 4) == 0
+
+
+def test_stream_refused_at_cap(app, client):
+    app.config["LIVE_STREAM_MAX"] = 0
+    response = client.get("/board/events")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"]
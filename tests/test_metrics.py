@@ -0,0 +1,25 @@
+from app import changes, db, metrics
+from app.models import Client, Order
+
+
+def test_resync_redone_when_a_commit_lands_meanwhile(app, monkeypatch):
+    business = metrics.BusinessCounters(app)
+    with app.app_context():
+        client = Client(name="Ana")
+        db.session.add(Order(client=client, total=10.0))
+        db.session.commit()
+    remove = db.session.remove
+    raced = []
+
+    def commit_during_resync():
+        # Another request commits a new open order after the counts were read
+        if not raced:
+            raced.append(True)
+            with app.app_context():
+                db.session.add(Order(client_id=1, total=5.0))
+                db.session.commit()
+            business.apply([changes.Change("insert", "Order", 2, {"payment_status": "em_aberto"})])
+        remove()
+
+    monkeypatch.setattr(db.session, "remove", commit_during_resync)
+    assert business.read_open_orders() == 2
@@ -0,0 +1,11 @@
+from app import querybudget
+
+
+def test_routes_within_query_budget():
+    results = querybudget.check_seeded()
+    assert {r.name for r in results} == {name for name, _budget, _target in querybudget.BUDGETS}
+    failures = [
+        f"{r.name}: {r.count}/{r.budget} consultas, HTTP {r.status}, {len(r.repeated)} repetida(s)"
+        for r in results if not r.ok
+    ]
+    assert not failures, failures
@@ -0,0 +1,31 @@
+from datetime import date
+from app import db
+from app.cash import close_day
+from app.models import User
+
+
+def _user(username: str) -> int:
+    user = User(username=username, full_name=username.title(), password_hash="x")
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def test_delete_user_without_history(app, client):
+    with app.app_context():
+        user_id = _user("caixa")
+    response = client.post(f"/users/{user_id}/delete")
+    assert response.status_code == 302
+    with app.app_context():
+        assert db.session.get(User, user_id) is None
+
+
+def test_delete_user_who_closed_cash_day(app, client):
+    with app.app_context():
+        user_id = _user("caixa")
+        close_day(date(2024, 3, 1), user_id)
+    response = client.post(f"/users/{user_id}/delete", follow_redirects=True)
+    assert response.status_code == 200
+    assert "não pode ser excluído" in response.get_data(as_text=True)
+    with app.app_context():
+        assert db.session.get(User, user_id) is not None